@@ -243,6 +243,16 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+}
+
 ELASTICSEARCH_DSL = {
     "default": {
         "hosts": "http://localhost:9200"
@@ -250,12 +260,77 @@ ELASTICSEARCH_DSL = {
 }
 
 ELASTICSEARCH_DSL_AUTOSYNC = True
-ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = "django_elasticsearch_dsl.signals.RealTimeSignalProcessor"
+# Index changes are queued on commit and flushed by `manage.py process_search_queue`
+ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = "media_manager.search.signals.QueuedSignalProcessor"
+MEDIA_MANAGER_SEARCH_QUEUE_BATCH_SIZE = 500
+MEDIA_MANAGER_SEARCH_QUEUE_INTERVAL = 2  # seconds between polls of an empty queue
+# Search backends (media_manager/search/backends.py); the fallback serves
+# queries while the primary is unavailable, None disables it
+MEDIA_MANAGER_SEARCH_BACKEND = 'media_manager.search.backends.ElasticsearchBackend'
+MEDIA_MANAGER_SEARCH_FALLBACK_BACKEND = 'media_manager.search.backends.DatabaseBackend'
+# Per-user cache of search results, facets and suggestions (media_manager/search/cache.py):
+# an in-process LRU in front of the shared cache below, invalidated whenever the
+# user's media, tags or folders change
+MEDIA_MANAGER_SEARCH_CACHE_ALIAS = 'search'
+MEDIA_MANAGER_SEARCH_CACHE_TTL = 300  # seconds
+MEDIA_MANAGER_SEARCH_CACHE_LOCAL_ENTRIES = 500  # per process
+MEDIA_MANAGER_SEARCH_CACHE_GENERATION_TTL = 1  # seconds a process trusts its copy of a user's generation
+# Per-user cache of /search/suggest/ results (media_manager/search/suggest.py)
+MEDIA_MANAGER_SUGGEST_CACHE_TTL = 30  # seconds
 
 # ============================================================================
 # FILE UPLOAD CONFIGURATION
 # ============================================================================
 
 DATA_UPLOAD_MAX_MEMORY_SIZE = 524288000  # 500MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 524288000  # 500MB
-FILE_UPLOAD_PERMISSIONS = 0o644
\ No newline at end of file
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB, larger uploads are spooled to a temp file
+FILE_UPLOAD_PERMISSIONS = 0o644
+
+# Resumable chunked uploads (media_manager/uploads.py)
+MEDIA_MANAGER_MAX_UPLOAD_SIZE = 524288000  # 500MB
+MEDIA_MANAGER_UPLOAD_CHUNK_SIZE = 8388608  # 8MB
+MEDIA_MANAGER_UPLOAD_TEMP_DIR = BASE_DIR / 'tmp' / 'uploads'
+MEDIA_MANAGER_UPLOAD_SESSION_TTL = 86400  # idle seconds before `manage.py expire_uploads` removes a session
+MEDIA_MANAGER_UPLOAD_CLAIM_TIMEOUT = 600  # seconds a chunk write may block its session
+MEDIA_MANAGER_BATCH_UPLOAD_WORKERS = 4  # concurrent storage writes per batch upload
+MEDIA_MANAGER_PAGE_SIZE = 100  # list endpoints, keyset paginated (media_manager/pagination.py)
+
+# Storage quota per user in bytes (media_manager/quotas.py); None is unlimited.
+# StorageQuota.limit overrides it per user; `manage.py reconcile_quotas` fixes drift
+MEDIA_MANAGER_DEFAULT_QUOTA = 10737418240  # 10GB
+
+# Upload layout without deduplication: 'sharded' (media/ab/cd/<key>_<name>) or
+# 'folder' (mirrors the folder path); `manage.py relocate_media` converts to sharded
+MEDIA_MANAGER_UPLOAD_LAYOUT = 'sharded'
+
+# Store identical uploads once under media/cas/ab/cd/<sha256> (media_manager/storage.py)
+MEDIA_MANAGER_DEDUPLICATE_UPLOADS = True
+
+# Storage deletion queue (media_manager/deletion.py), drained by `manage.py process_deletions`
+MEDIA_MANAGER_DELETION_WORKERS = 8
+# Blobs reused by an upload this recently are not deleted yet: its Media row may not have committed
+MEDIA_MANAGER_DELETION_GRACE_SECONDS = 300
+
+# Deleted media and folders stay in the trash this long (media_manager/trash.py)
+# before `manage.py purge_trash` removes them for good
+MEDIA_MANAGER_TRASH_RETENTION_DAYS = 30
+
+# Post-upload processing (media_manager/processing.py), 0 runs inline
+MEDIA_MANAGER_PROCESSING_WORKERS = 2
+# True: uploads are only marked pending and `manage.py process_media --pending --loop` processes them
+MEDIA_MANAGER_PROCESSING_DEFERRED = False
+MEDIA_MANAGER_RENDITION_SIZES = {'thumb': 160, 'small': 480, 'medium': 1024}
+MEDIA_MANAGER_RENDITION_FORMATS = ('webp', 'jpeg')
+
+# Near-duplicate images by perceptual hash (media_manager/similarity.py)
+MEDIA_MANAGER_SIMILAR_MAX_DISTANCE = 6  # default bits of 64 for /similar/
+
+# On-demand image variants (media_manager/transforms.py)
+MEDIA_MANAGER_VARIANT_CACHE_DIR = BASE_DIR / 'tmp' / 'variants'
+MEDIA_MANAGER_VARIANT_CACHE_MAX_SIZE = 2147483648  # 2GB
+
+# Media delivery (media_manager/delivery.py): None streams from Python,
+# 'x-accel-redirect' (nginx internal location) or 'x-sendfile' (Apache/lighttpd)
+# hand the file off to the web server
+MEDIA_MANAGER_SENDFILE_BACKEND = None
+MEDIA_MANAGER_SENDFILE_PREFIX = '/protected-media/'
\ No newline at end of file
@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from media_manager.models import Media, Folder, Tag
+from media_manager.models import (
+    Media, Folder, Tag, MediaBlob, StorageDeletion, SearchIndexQueue, SearchIndexRebuild, StorageQuota,
+)
+from media_manager.search.reindex import finish_rebuild
 
 
 @admin.register(Folder)
@@ -70,11 +73,23 @@ class MediaAdmin(admin.ModelAdmin):
         "tags_display",
         "created_at",
     )
-    list_filter = ("file_type", "created_at", "uploaded_by", "folder")
-    search_fields = ("title", "file", "alt_text", "uploaded_by__username")
+    list_filter = ("file_type", "orientation", "processing_status", "created_at", "uploaded_by", "folder")
+    search_fields = ("title", "original_filename", "file", "alt_text", "uploaded_by__username")
     readonly_fields = (
         "file",
+        "original_filename",
+        "content_hash",
+        "mime_type",
         "size",
+        "width",
+        "height",
+        "orientation",
+        "captured_at",
+        "camera_make",
+        "camera_model",
+        "page_count",
+        "perceptual_hash",
+        "processing_status",
         "uploaded_by",
         "created_at",
         "updated_at",
@@ -84,11 +99,22 @@ class MediaAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ("File Information", {
-            "fields": ("file", "file_type", "size", "file_preview"),
+            "fields": ("file", "original_filename", "content_hash", "file_type", "mime_type", "size", "file_preview"),
         }),
         ("Metadata", {
             "fields": ("title", "description", "alt_text"),
         }),
+        ("Extracted Metadata", {
+            "fields": (
+                ("width", "height", "orientation"),
+                "captured_at",
+                ("camera_make", "camera_model"),
+                "page_count",
+                "perceptual_hash",
+                "processing_status",
+            ),
+            "classes": ("collapse",),
+        }),
         ("Organization", {
             "fields": ("folder", "tags"),
         }),
@@ -99,7 +125,7 @@ class MediaAdmin(admin.ModelAdmin):
     )
 
     def title_or_filename(self, obj):
-        return obj.title or obj.file.name
+        return obj.title or obj.get_filename()
     title_or_filename.short_description = "Title"
 
     def size_mb_display(self, obj):
@@ -139,9 +165,11 @@ class MediaAdmin(admin.ModelAdmin):
             ext = obj.get_file_extension().lower()
             
             if ext in [".jpg", ".jpeg", ".png", ".gif", ".webp"]:
+                # Prefer a generated preview over the full-resolution original
+                rendition = obj.renditions.filter(name="small", format="webp").first()
                 return format_html(
                     '<img src="{}" style="max-width: 300px; max-height: 300px;" />',
-                    url
+                    rendition.file.url if rendition else url
                 )
             elif ext in [".mp4", ".webm", ".mov"]:
                 return format_html(
@@ -163,6 +191,53 @@ class MediaAdmin(admin.ModelAdmin):
         return tuple(set(self.readonly_fields) - {"file"})
 
 
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ("name", "ref_count", "size", "created_at")
+    search_fields = ("name", "sha256")
+    readonly_fields = ("name", "sha256", "size", "ref_count", "created_at")
+
+
+@admin.register(StorageDeletion)
+class StorageDeletionAdmin(admin.ModelAdmin):
+    list_display = ("name", "storage", "attempts", "next_attempt_at", "created_at")
+    list_filter = ("storage",)
+    search_fields = ("name", "last_error")
+    readonly_fields = ("name", "storage", "attempts", "last_error", "created_at")
+
+
+@admin.register(StorageQuota)
+class StorageQuotaAdmin(admin.ModelAdmin):
+    list_display = ("user", "limit", "used", "reserved")
+    search_fields = ("user__username",)
+    readonly_fields = ("used", "reserved")
+
+
+@admin.register(SearchIndexQueue)
+class SearchIndexQueueAdmin(admin.ModelAdmin):
+    list_display = ("model", "object_id", "op", "enqueued_at", "updated_at", "attempts", "next_attempt_at", "flushed_at")
+    list_filter = ("model", "op")
+    search_fields = ("object_id",)
+    readonly_fields = (
+        "model", "object_id", "op", "enqueued_at", "updated_at", "attempts", "last_error", "next_attempt_at",
+        "flushed_at",
+    )
+
+
+# Delete a rebuild left behind by a killed reindex_media to release its queue entries
+@admin.register(SearchIndexRebuild)
+class SearchIndexRebuildAdmin(admin.ModelAdmin):
+    list_display = ("index_name", "queue_mark", "started_at")
+    readonly_fields = ("index_name", "queue_mark", "started_at")
+
+    def delete_model(self, request, obj):
+        finish_rebuild(obj)
+
+    def delete_queryset(self, request, queryset):
+        for rebuild in queryset:
+            finish_rebuild(rebuild)
+
+
 class MediaInline(admin.StackedInline):
     """Inline admin for displaying media within folder admin."""
     model = Media
@@ -0,0 +1,158 @@
+"""
+Streaming ZIP export of folders and media selections.
+
+The archive is built while it is sent: zipfile writes into a small buffer
+that is drained after every block read from storage, so neither the archive
+nor a whole file is ever held in memory or written to disk. The output is
+not seekable, so each entry's sizes and CRC follow it in a data descriptor,
+and zipfile switches to ZIP64 records for entries and archives over 4 GB.
+Media that is already compressed is STORED; deflating it again only costs
+CPU.
+"""
+import logging
+import zipfile
+from pathlib import PurePosixPath
+
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from media_manager.models import Folder, Media
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 1024 * 1024
+# Compressed containers among documents and other files
+COMPRESSED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar",
+    ".pdf", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub",
+}
+# Raw formats among images and audio
+UNCOMPRESSED_EXTENSIONS = {".bmp", ".tif", ".tiff", ".svg", ".wav", ".aif", ".aiff"}
+MIN_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+class _Buffer:
+    """Write-only, unseekable file object collecting zipfile output."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def compress_type(name, file_type):
+    extension = PurePosixPath(name).suffix.lower()
+    if extension in UNCOMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_DEFLATED
+    if file_type in ("image", "video", "audio") or extension in COMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _arcnames(entries):
+    """Make archive paths unique: photo.jpg, photo (2).jpg, ..."""
+    seen = set()
+    for arcname, *rest in entries:
+        path = PurePosixPath(arcname)
+        candidate, counter = arcname, 1
+        while candidate.lower() in seen:
+            counter += 1
+            candidate = str(path.with_name(f"{path.stem} ({counter}){path.suffix}"))
+        seen.add(candidate.lower())
+        yield (candidate, *rest)
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of `entries`: (archive path, storage name, file
+    type, modified datetime). Files missing from storage are skipped.
+    """
+    storage = Media._meta.get_field("file").storage
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, "w", allowZip64=True) as archive:
+        for arcname, name, file_type, modified in _arcnames(entries):
+            try:
+                source = storage.open(name, "rb")
+            except FileNotFoundError:
+                logger.warning("Skipping %s in archive: %s is missing from storage", arcname, name)
+                continue
+            with source:
+                info = zipfile.ZipInfo(arcname, date_time=max(timezone.localtime(modified).timetuple()[:6], MIN_DATE))
+                info.compress_type = compress_type(arcname, file_type)
+                # Known up front so zipfile picks ZIP64 for entries over 4 GB
+                info.file_size = source.size
+                with archive.open(info, "w") as target:
+                    for block in iter(lambda: source.read(READ_BLOCK_SIZE), b""):
+                        target.write(block)
+                        yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def folder_entries(folder):
+    """
+    Archive entries for every file in `folder` and its subfolders (trash
+    left out), paths starting at `folder`, from a single recursive query.
+    """
+    folders = connection.ops.quote_name(Folder._meta.db_table)
+    media = connection.ops.quote_name(Media._meta.db_table)
+    rows = Media.objects.raw(
+        f"""
+        WITH RECURSIVE tree(id, path) AS (
+            SELECT id, CAST(name AS TEXT) FROM {folders} WHERE id = %s
+            UNION ALL
+            SELECT f.id, tree.path || '/' || f.name FROM {folders} f JOIN tree ON f.parent_id = tree.id
+            WHERE f.deleted_at IS NULL
+        )
+        SELECT m.id, m.file, m.original_filename, m.title, m.file_type, m.updated_at, tree.path AS folder_path
+        FROM {media} m JOIN tree ON m.folder_id = tree.id
+        WHERE m.uploaded_by_id = %s AND m.deleted_at IS NULL
+        ORDER BY tree.path, m.id
+        """,
+        [folder.pk, folder.owner_id],
+    )
+    return [
+        (f"{row.folder_path}/{row.get_filename()}", row.file.name, row.file_type, row.updated_at)
+        for row in rows
+    ]
+
+
+def selection_entries(queryset):
+    """Archive entries for a Media queryset, under their folder paths."""
+    rows = list(
+        queryset.order_by("folder_id", "pk")
+        .only("folder_id", "file", "original_filename", "title", "file_type", "updated_at")
+    )
+    paths = Folder.get_full_paths({media.folder_id for media in rows if media.folder_id})
+    return [
+        (
+            f"{paths[media.folder_id]}/{media.get_filename()}" if media.folder_id in paths else media.get_filename(),
+            media.file.name, media.file_type, media.updated_at,
+        )
+        for media in rows
+    ]
+
+
+def zip_response(entries, filename):
+    response = StreamingHttpResponse(stream_zip(entries), content_type="application/zip")
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    # The archive is generated per request
+    response["Cache-Control"] = "private, no-store"
+    return response
@@ -0,0 +1,235 @@
+"""
+Set-based media operations.
+
+These bypass per-instance model signals for throughput, so they do the
+signal bookkeeping (blob references, post-processing, search index)
+themselves, once per batch.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from media_manager import quotas
+from media_manager.deletion import enqueue_deletions
+from media_manager.models import Media, MediaBlob, MediaRendition
+from media_manager.processing import schedule_processing
+from media_manager.search.cache import invalidate_on_commit
+from media_manager.search.indexing import delete_media_documents, index_media
+from media_manager.signals import bulk_operation, detect_file_type
+from media_manager.sniffing import detect_mime_type, read_header
+from media_manager.storage import hash_from_blob_name, is_blob_name
+from media_manager.uploads import get_max_upload_size
+
+BATCH_SIZE = 1000
+
+
+def _batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _store_file(field, media, uploaded):
+    """Write one upload to storage and return its final name."""
+    name = field.generate_filename(media, uploaded.name)
+    return field.storage.save(name, uploaded, max_length=field.max_length)
+
+
+def create_media_batch(user, files, folder=None, tags=(), workers=None):
+    """
+    Store `files` concurrently and insert their Media rows in bulk.
+
+    Returns one result dict per file, in input order.
+    """
+    field = Media._meta.get_field("file")
+    max_size = get_max_upload_size()
+    workers = workers or getattr(settings, "MEDIA_MANAGER_BATCH_UPLOAD_WORKERS", 4)
+
+    results = [{"file": uploaded.name} for uploaded in files]
+    pending = []
+    reserved = 0
+    try:
+        for index, uploaded in enumerate(files):
+            if uploaded.size > max_size:
+                results[index].update(
+                    status="error",
+                    error=f"File size ({uploaded.size / (1024*1024):.2f}MB) exceeds maximum of {max_size // (1024*1024)}MB.",
+                )
+                continue
+            try:
+                quotas.reserve(user.pk, uploaded.size)
+            except quotas.QuotaExceeded as exc:
+                results[index].update(status="error", error=str(exc))
+                continue
+            reserved += uploaded.size
+            pending.append((index, uploaded, Media(folder=folder, uploaded_by=user)))
+
+        return _store_batch(user, pending, results, field, tags, workers)
+    finally:
+        # Stored files are counted in the user's usage by now
+        if reserved:
+            quotas.release(user.pk, reserved)
+
+
+def _store_batch(user, pending, results, field, tags, workers):
+    """Store the files that passed validation and insert their rows."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (index, uploaded, media, executor.submit(_store_file, field, media, uploaded))
+            for index, uploaded, media in pending
+        ]
+
+    stored = []
+    for index, uploaded, media, future in futures:
+        try:
+            name = future.result()
+        except Exception as exc:
+            results[index].update(status="error", error=f"Storage failed: {exc}")
+            continue
+        media.file.name = name
+        media.original_filename = Path(uploaded.name).name[:255]
+        media.size = uploaded.size
+        header = read_header(uploaded)
+        media.file_type = detect_file_type(uploaded.name, header=header)
+        media.mime_type = detect_mime_type(uploaded.name, header)
+        media.content_hash = hash_from_blob_name(name)
+        stored.append((index, media))
+
+    if not stored:
+        return results
+
+    with transaction.atomic():
+        created = Media.objects.bulk_create([media for _, media in stored])
+        quotas.add_usage({user.pk: sum(media.size for media in created)})
+
+        if tags:
+            through = Media.tags.through
+            through.objects.bulk_create(
+                [through(media_id=media.pk, tag_id=tag.pk) for media in created for tag in tags],
+                ignore_conflicts=True,
+            )
+
+        blob_refs = Counter(media.file.name for media in created if is_blob_name(media.file.name))
+        sizes = {media.file.name: media.size for media in created}
+        for name, count in blob_refs.items():
+            MediaBlob.retain(name, hash_from_blob_name(name), sizes[name], count=count)
+
+        schedule_processing(created)
+        created_ids = [media.pk for media in created]
+        transaction.on_commit(lambda: index_media(created_ids))
+
+    for index, media in stored:
+        results[index].update(status="created", id=media.pk)
+    return results
+
+
+def select_media(user, selection):
+    """`user`'s media picked by MediaSelectionSerializer data (ids or filter)."""
+    queryset = Media.objects.filter(uploaded_by=user)
+    if "ids" in selection:
+        return queryset.filter(pk__in=selection["ids"])
+    return filter_media(queryset, selection["filter"])
+
+
+def filter_media(queryset, filters):
+    """
+    Apply a filter expression from the bulk API.
+
+    Supported keys: file_type, folder_id (null for root), tag_id, q,
+    created_from, created_to, size_from, size_to.
+    """
+    if "file_type" in filters:
+        queryset = queryset.filter(file_type=filters["file_type"])
+    if "folder_id" in filters:
+        queryset = queryset.filter(folder_id=filters["folder_id"])
+    if "tag_id" in filters:
+        queryset = queryset.filter(tags__id=filters["tag_id"])
+    if filters.get("q"):
+        queryset = queryset.filter(
+            Q(title__icontains=filters["q"]) | Q(description__icontains=filters["q"])
+        )
+    if "created_from" in filters:
+        queryset = queryset.filter(created_at__gte=filters["created_from"])
+    if "created_to" in filters:
+        queryset = queryset.filter(created_at__lte=filters["created_to"])
+    if "size_from" in filters:
+        queryset = queryset.filter(size__gte=filters["size_from"])
+    if "size_to" in filters:
+        queryset = queryset.filter(size__lte=filters["size_to"])
+    return queryset.distinct()
+
+
+def add_tags(media_ids, tags):
+    """Attach `tags` to every media id; returns the number of new links."""
+    through = Media.tags.through
+    existing = 0
+    with transaction.atomic():
+        for batch in _batches(media_ids):
+            existing += through.objects.filter(media_id__in=batch, tag__in=tags).count()
+            through.objects.bulk_create(
+                [through(media_id=media_id, tag_id=tag.pk) for media_id in batch for tag in tags],
+                ignore_conflicts=True,
+            )
+    transaction.on_commit(lambda: index_media(media_ids))
+    return len(media_ids) * len(tags) - existing
+
+
+def remove_tags(media_ids, tags):
+    """Detach `tags` from every media id; returns the number of removed links."""
+    through = Media.tags.through
+    removed = 0
+    with transaction.atomic():
+        for batch in _batches(media_ids):
+            removed += through.objects.filter(media_id__in=batch, tag__in=tags).delete()[0]
+    transaction.on_commit(lambda: index_media(media_ids))
+    return removed
+
+
+def move_to_folder(media_ids, folder):
+    """Move every media id into `folder` (None for root)."""
+    moved = 0
+    with transaction.atomic():
+        for batch in _batches(media_ids):
+            moved += Media.objects.filter(pk__in=batch).update(folder=folder, updated_at=timezone.now())
+    transaction.on_commit(lambda: index_media(media_ids))
+    return moved
+
+
+def delete_media(media_ids):
+    """
+    Delete media rows in batches, then their files and index documents.
+
+    Blob references are released with one update per distinct blob; the
+    files are handed to the storage deletion queue in a single insert.
+    Trashed rows are included, so trash.purge() deletes through here too.
+    """
+    doomed = []
+    deleted = 0
+    usage = Counter()
+    with transaction.atomic(), bulk_operation():
+        invalidate_on_commit(
+            Media.all_objects.filter(pk__in=media_ids).values_list("uploaded_by_id", flat=True).distinct()
+        )
+        for batch in _batches(media_ids):
+            rows = list(Media.all_objects.filter(pk__in=batch).values_list("file", "uploaded_by_id", "size"))
+            names = [name for name, _, _ in rows]
+            for _, user_id, size in rows:
+                usage[user_id] -= size
+            doomed.extend(
+                ("default", name)
+                for name in MediaRendition.objects.filter(media_id__in=batch).values_list("file", flat=True)
+            )
+            deleted += Media.all_objects.filter(pk__in=batch).delete()[1].get(Media._meta.label, 0)
+
+            for name, count in Counter(name for name in names if name).items():
+                if not is_blob_name(name) or MediaBlob.release(name, count=count):
+                    doomed.append(("media", name))
+
+        enqueue_deletions(doomed)
+        quotas.add_usage(usage)
+        transaction.on_commit(lambda: delete_media_documents(media_ids))
+    return deleted
@@ -0,0 +1,148 @@
+"""
+Asynchronous, batched removal of files from storage.
+
+Deletes only enqueue StorageDeletion rows (after the surrounding transaction
+commits); `manage.py process_deletions` drains the queue in batches with a
+thread pool and retries failures with exponential backoff.
+
+A deduplicated blob can be reused by an upload whose Media row has not
+committed yet. MediaStorage touches a blob it reuses, and blobs modified
+within the grace period are postponed rather than deleted; once it has
+passed, the upload's references are checked again.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+
+from media_manager.models import Media, MediaBlob, MediaRendition, StorageDeletion
+from media_manager.storage import is_blob_name, media_storage
+
+logger = logging.getLogger(__name__)
+
+STORAGES = {
+    "media": media_storage,
+    "default": default_storage,
+}
+MAX_BACKOFF = timedelta(hours=1)
+
+
+def get_grace_period():
+    return timedelta(seconds=getattr(settings, "MEDIA_MANAGER_DELETION_GRACE_SECONDS", 300))
+
+
+def enqueue_deletions(files):
+    """
+    Queue (storage key, name) pairs for deletion once the transaction commits.
+    """
+    rows = [StorageDeletion(storage=storage, name=name) for storage, name in files if name]
+    if rows:
+        transaction.on_commit(lambda: StorageDeletion.objects.bulk_create(rows, batch_size=1000))
+
+
+def _foreign_file_fields():
+    """(model, field name) of the FileFields of other apps, which share MEDIA_ROOT."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        if model._meta.app_label != "media_manager"
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def _referenced_names(batch):
+    """
+    Names in `batch` that are in use again and must be kept.
+
+    A blob can be re-uploaded between being queued and being deleted, and
+    a name queued by mistake may belong to another app's upload.
+    """
+    media_names = [item.name for item in batch if item.storage == "media"]
+    rendition_names = [item.name for item in batch if item.storage == "default"]
+    referenced = set()
+    if media_names:
+        # Waits for uploads that retained one of these blobs to commit
+        referenced.update(
+            MediaBlob.objects.select_for_update().filter(name__in=media_names).values_list("name", flat=True)
+        )
+        referenced.update(Media.all_objects.filter(file__in=media_names).values_list("file", flat=True))
+    if rendition_names:
+        referenced.update(MediaRendition.objects.filter(file__in=rendition_names).values_list("file", flat=True))
+    names = [item.name for item in batch]
+    for model, field in _foreign_file_fields():
+        referenced.update(model._base_manager.filter(**{f"{field}__in": names}).values_list(field, flat=True))
+    return referenced
+
+
+def _reused_until(item, now):
+    """When a blob touched by a recent upload may be deleted, or None if it may go now."""
+    if item.storage != "media" or not is_blob_name(item.name):
+        return None
+    try:
+        modified = media_storage.get_modified_time(item.name)
+    except FileNotFoundError:
+        return None
+    until = modified + get_grace_period()
+    return until if until > now else None
+
+
+def _delete(item, now):
+    """Returns (item, error, postponed until)."""
+    try:
+        until = _reused_until(item, now)
+        if until is None:
+            STORAGES[item.storage].delete(item.name)
+        return item, None, until
+    except Exception as exc:
+        return item, exc, None
+
+
+def process_deletions(batch_size=500, workers=None):
+    """
+    Delete one batch of due files. Returns (deleted, failed); postponed
+    blobs count as neither.
+    """
+    workers = workers or getattr(settings, "MEDIA_MANAGER_DELETION_WORKERS", 8)
+    now = timezone.now()
+
+    with transaction.atomic():
+        batch = list(
+            StorageDeletion.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        referenced = _referenced_names(batch)
+        outcomes = [(item, None, None) for item in batch if item.name in referenced]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes.extend(executor.map(
+                lambda item: _delete(item, now), [item for item in batch if item.name not in referenced],
+            ))
+
+        done, failed, postponed = [], [], []
+        for item, error, until in outcomes:
+            if until is not None:
+                item.next_attempt_at = until
+                postponed.append(item)
+                continue
+            if error is None:
+                done.append(item.pk)
+                continue
+            item.attempts += 1
+            item.last_error = f"{type(error).__name__}: {error}"
+            item.next_attempt_at = now + min(timedelta(seconds=30 * 2 ** item.attempts), MAX_BACKOFF)
+            failed.append(item)
+            logger.warning("Deleting %s failed (attempt %d): %s", item, item.attempts, item.last_error)
+
+        StorageDeletion.objects.filter(pk__in=done).delete()
+        StorageDeletion.objects.bulk_update(failed + postponed, ["attempts", "last_error", "next_attempt_at"])
+
+    return len(done), len(failed)
@@ -0,0 +1,167 @@
+"""
+Efficient delivery of Media files.
+
+Supports conditional requests (ETag / If-None-Match / If-Range) and single
+byte ranges. Bytes are streamed through FileResponse, which lets the WSGI
+server's file_wrapper (e.g. gunicorn) use os.sendfile for the selected range.
+With MEDIA_MANAGER_SENDFILE_BACKEND set, the worker only returns an
+X-Accel-Redirect / X-Sendfile header and the web server sends the bytes.
+
+Uploads are served from the API origin, so every response is sandboxed and
+never sniffed, and types a browser would run script from are only ever
+sent as downloads.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header, http_date, parse_etags, quote_etag
+
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_BLOCK_SIZE = 512 * 1024
+ACTIVE_CONTENT_TYPES = {
+    "text/html",
+    "image/svg+xml",
+    "application/xhtml+xml",
+    "application/xml",
+    "text/xml",
+    "text/javascript",
+    "application/javascript",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangeFile:
+    """Read-only view of `length` bytes of `fh` starting at `start`."""
+
+    def __init__(self, fh, start, length):
+        fh.seek(start)
+        self._fh = fh
+        self._remaining = length
+        self.name = fh.name
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fh.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # The descriptor is positioned at `start`; sendfile() picks it up from there
+        return self._fh.fileno()
+
+    def close(self):
+        self._fh.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range` header.
+
+    Returns (start, end) inclusive, None when the header should be ignored
+    (absent, malformed or multi-range) and raises RangeNotSatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+def get_etag(media, stat):
+    if media.content_hash:
+        return quote_etag(media.content_hash)
+    return quote_etag(f"{int(stat.st_mtime)}-{stat.st_size}")
+
+
+def get_download_name(media):
+    ext = media.get_file_extension()
+    if media.title:
+        return media.title if media.title.lower().endswith(ext) else f"{media.title}{ext}"
+    return media.get_filename()
+
+
+def is_active_content(content_type):
+    """Whether a browser rendering `content_type` inline could run script."""
+    return content_type.split(";")[0].strip().lower() in ACTIVE_CONTENT_TYPES
+
+
+def _sandbox(response):
+    response["X-Content-Type-Options"] = "nosniff"
+    response["Content-Security-Policy"] = "sandbox"
+    return response
+
+
+def serve_media(request, media, as_attachment=False):
+    """Build the response delivering `media.file` for `request`."""
+    path = media.file.path
+    stat = os.stat(path)
+    etag = get_etag(media, stat)
+    content_type = media.mime_type or mimetypes.guess_type(media.file.name)[0] or "application/octet-stream"
+    as_attachment = as_attachment or is_active_content(content_type)
+
+    if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return _sandbox(response)
+
+    backend = getattr(settings, "MEDIA_MANAGER_SENDFILE_BACKEND", None)
+    if backend:
+        response = HttpResponse(content_type=content_type)
+        if backend == "x-accel-redirect":
+            prefix = getattr(settings, "MEDIA_MANAGER_SENDFILE_PREFIX", "/protected-media/")
+            response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(media.file.name)
+        else:
+            response["X-Sendfile"] = path
+    else:
+        byte_range = None
+        if_range = request.META.get("HTTP_IF_RANGE", "")
+        if not if_range or if_range in (etag, http_date(stat.st_mtime)):
+            try:
+                byte_range = parse_range(request.META.get("HTTP_RANGE", ""), stat.st_size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{stat.st_size}"
+                return _sandbox(response)
+
+        fh = open(path, "rb")
+        if byte_range:
+            start, end = byte_range
+            response = FileResponse(RangeFile(fh, start, end - start + 1), content_type=content_type, status=206)
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            response["Content-Length"] = end - start + 1
+        else:
+            response = FileResponse(fh, content_type=content_type)
+        response.block_size = STREAM_BLOCK_SIZE
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = "private, no-cache"
+    if disposition := content_disposition_header(as_attachment, get_download_name(media)):
+        response["Content-Disposition"] = disposition
+    return _sandbox(response)
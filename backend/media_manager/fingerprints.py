@@ -0,0 +1,74 @@
+"""
+Perceptual image hashes for near-duplicate detection.
+
+A 64-bit difference hash (dHash) compares the brightness of neighbouring
+pixels in a 9x8 grayscale thumbnail, so re-encoding, resizing and mild
+colour changes flip few bits. Similar images are found by Hamming distance
+with multi-index hashing: the hash is stored as four 16-bit chunks in
+indexed columns, and by the pigeonhole principle two hashes within distance
+d agree on at least one chunk to within d // 4 bits. Lookups are therefore
+a handful of index probes instead of a scan (see media_manager/similarity.py).
+
+Like metadata.py this does not touch Django models so it can run in
+worker processes.
+"""
+from itertools import combinations
+
+from PIL import Image, ImageOps
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+HASH_WIDTH, HASH_HEIGHT = 9, 8
+
+
+def dhash(image):
+    """64-bit difference hash of a Pillow image."""
+    image = ImageOps.exif_transpose(image)
+    pixels = list(image.convert("L").resize((HASH_WIDTH, HASH_HEIGHT), Image.Resampling.BOX).getdata())
+    value = 0
+    for row in range(HASH_HEIGHT):
+        offset = row * HASH_WIDTH
+        for col in range(HASH_WIDTH - 1):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_file(source_path):
+    with Image.open(source_path) as image:
+        # JPEGs decode straight to a small grayscale image
+        image.draft("L", (HASH_WIDTH * 8, HASH_HEIGHT * 8))
+        return dhash(image)
+
+
+def chunks(value):
+    """The four 16-bit chunks of a hash, most significant first."""
+    return [(value >> (CHUNK_BITS * (CHUNKS - 1 - position))) & CHUNK_MASK for position in range(CHUNKS)]
+
+
+def hash_fields(value):
+    """Media column values for a hash (see Media.perceptual_hash)."""
+    fields = {"perceptual_hash": f"{value:016x}"}
+    fields.update({f"phash_{position}": chunk for position, chunk in enumerate(chunks(value))})
+    return fields
+
+
+def parse_hash(text):
+    return int(text, 16)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def neighbours(chunk, radius):
+    """Every chunk value within `radius` bits of `chunk`, itself included."""
+    values = [chunk]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), distance):
+            flipped = chunk
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
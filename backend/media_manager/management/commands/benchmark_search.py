@@ -0,0 +1,99 @@
+"""
+Management command to benchmark the search backends against each other
+Run: python manage.py benchmark_search --user alice [--queries "sunset,beach trip"] [--runs 5] [--size 20]
+
+Every backend answers the same queries for the same user, so latency and
+top-k overlap with the first backend are directly comparable.
+"""
+import random
+import re
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from media_manager.models import Media
+from media_manager.search.backends import DatabaseBackend, ElasticsearchBackend, SearchUnavailable
+
+
+class Command(BaseCommand):
+    help = 'Compare latency and result overlap of the Elasticsearch and database search backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to search as (default: the user with most media)')
+        parser.add_argument('--queries', help='Comma separated queries (default: words sampled from titles)')
+        parser.add_argument('--sample', type=int, default=20, help='Queries to sample when --queries is not given')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per query')
+        parser.add_argument('--size', type=int, default=20, help='Results per query')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        queries = self.get_queries(user, options)
+        if not queries:
+            raise CommandError(f'{user} has no titled media to sample queries from; pass --queries')
+        self.stdout.write(f'{len(queries)} queries as {user}, {options["runs"]} runs each, top {options["size"]}')
+
+        baseline = None
+        for backend in (ElasticsearchBackend(), DatabaseBackend()):
+            try:
+                timings, top = self.run(backend, user, queries, options)
+            except SearchUnavailable as exc:
+                self.stdout.write(self.style.WARNING(f'  {backend.name:<14} unavailable: {exc}'))
+                continue
+
+            line = (
+                f'  {backend.name:<14} p50 {self.percentile(timings, 50):7.1f} ms'
+                f'  p95 {self.percentile(timings, 95):7.1f} ms'
+                f'  mean {statistics.mean(timings):7.1f} ms'
+            )
+            if baseline is None:
+                baseline = top
+            else:
+                line += f'  overlap@{options["size"]} {self.overlap(baseline, top):.0%}'
+            self.stdout.write(line)
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark finished'))
+
+    def get_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.annotate(media_count=Count('uploaded_media')).order_by('-media_count').first()
+        if user is None:
+            raise CommandError('No users to search as')
+        return user
+
+    def get_queries(self, user, options):
+        if options['queries']:
+            return [query.strip() for query in options['queries'].split(',') if query.strip()]
+        titles = Media.objects.filter(uploaded_by=user).exclude(title='').values_list('title', flat=True)[:5000]
+        words = sorted({word.lower() for title in titles for word in re.findall(r'\w{3,}', title)})
+        return random.Random(0).sample(words, min(options['sample'], len(words)))
+
+    def run(self, backend, user, queries, options):
+        """Latencies in ms over all runs, and the top ids per query."""
+        timings = []
+        top = {}
+        for query in queries:
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                page = backend.search(user, query, source_fields=['id'], size=options['size'])
+                timings.append((time.perf_counter() - started) * 1000)
+            top[query] = [row['id'] for row in page['results']]
+        return timings, top
+
+    def percentile(self, values, percent):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def overlap(self, baseline, top):
+        shared = total = 0
+        for query, ids in baseline.items():
+            shared += len(set(ids) & set(top.get(query, ())))
+            total += len(ids)
+        return shared / total if total else 1.0
@@ -0,0 +1,84 @@
+"""
+Management command to move existing media files into content-addressed storage
+Run: python manage.py dedup_media [--batch-size 500] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from media_manager.models import Media, MediaBlob
+from media_manager.storage import BLOB_PREFIX, hash_from_blob_name, media_storage, original_filename
+
+
+class Command(BaseCommand):
+    help = 'Deduplicate existing media files into the sharded content-addressed layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        names = (
+            Media.all_objects.exclude(file="")
+            .exclude(file__startswith=f"{BLOB_PREFIX}/")
+            .values_list("file", flat=True)
+            .distinct()
+            .order_by("file")
+        )
+
+        moved = missing = 0
+        freed_bytes = 0
+        batch = []
+        for name in names.iterator(chunk_size=batch_size):
+            batch.append(name)
+            if len(batch) >= batch_size:
+                result = self.process_batch(batch, dry_run)
+                moved, missing, freed_bytes = moved + result[0], missing + result[1], freed_bytes + result[2]
+                batch = []
+        if batch:
+            result = self.process_batch(batch, dry_run)
+            moved, missing, freed_bytes = moved + result[0], missing + result[1], freed_bytes + result[2]
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ {moved} files {"would be " if dry_run else ""}moved into content-addressed storage, '
+                f'{freed_bytes / (1024 * 1024):.2f} MB reclaimed by deduplication'
+            )
+        )
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} media rows point at missing files'))
+
+    def process_batch(self, names, dry_run):
+        """Move each legacy file into a blob and repoint its Media rows."""
+        moved = missing = freed_bytes = 0
+        for name in names:
+            if not media_storage.exists(name):
+                missing += 1
+                continue
+            if dry_run:
+                moved += 1
+                continue
+
+            with media_storage.open(name, "rb") as fh:
+                new_name = media_storage.save(name, fh)
+            size = media_storage.size(new_name)
+
+            with transaction.atomic():
+                # The blob is named by hash; keep the name users know the file by
+                Media.all_objects.filter(file=name, original_filename="").update(
+                    original_filename=original_filename(name)[:255]
+                )
+                rows = Media.all_objects.filter(file=name).update(
+                    file=new_name,
+                    content_hash=hash_from_blob_name(new_name),
+                )
+                already_stored = MediaBlob.objects.filter(name=new_name).exists()
+                MediaBlob.retain(new_name, hash_from_blob_name(new_name), size, count=rows)
+
+            media_storage.delete(name)
+            moved += 1
+            if already_stored:
+                freed_bytes += size
+        return moved, missing, freed_bytes
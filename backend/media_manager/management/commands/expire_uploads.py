@@ -0,0 +1,29 @@
+"""
+Management command to remove chunked upload sessions left idle past their expiry
+Run: python manage.py expire_uploads [--batch-size 500]
+"""
+from django.core.management.base import BaseCommand
+
+from media_manager.uploads import expire_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired upload sessions with their temp files, releasing their quota reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        expired = released = 0
+        while True:
+            sessions = expire_sessions(options['batch_size'])
+            if not sessions:
+                break
+            expired += len(sessions)
+            released += sum(session.total_size for session in sessions)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Expired {expired} upload sessions, released {released / (1024 * 1024):.2f} MB of reserved quota'
+            )
+        )
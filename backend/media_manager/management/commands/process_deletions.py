@@ -0,0 +1,36 @@
+"""
+Management command to drain the storage deletion queue
+Run: python manage.py process_deletions [--loop] [--interval 10] [--batch-size 500] [--workers 8]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from media_manager.deletion import process_deletions
+
+
+class Command(BaseCommand):
+    help = 'Delete queued files from storage in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting when empty')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        total_deleted = total_failed = 0
+        while True:
+            deleted, failed = process_deletions(options['batch_size'], options['workers'])
+            total_deleted += deleted
+            total_failed += failed
+            if deleted or failed:
+                self.stdout.write(f'  {deleted} deleted, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {total_deleted} files'))
+        if total_failed:
+            self.stdout.write(self.style.WARNING(f'{total_failed} deletions failed and will be retried'))
@@ -0,0 +1,95 @@
+"""
+Management command to backfill post-processing (metadata, perceptual hashes, renditions) for existing media
+Run: python manage.py process_media [--workers 4] [--batch-size 200] [--force | --pending [--loop]]
+
+--pending processes the media uploads marked pending: work lost when the web
+process restarted, or all of it with MEDIA_MANAGER_PROCESSING_DEFERRED.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+from media_manager.models import Media
+from media_manager.processing import apply_results, build_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Extract missing metadata and generate missing renditions in parallel worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true', help='Reprocess media that was already processed')
+        parser.add_argument('--pending', action='store_true', help='Only process media uploads marked pending')
+        parser.add_argument('--loop', action='store_true', help='With --pending, keep polling for new uploads')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when nothing is pending')
+
+    def get_queryset(self, force, pending=False):
+        if pending:
+            return Media.objects.filter(processing_status="pending").order_by("pk")
+        images = Q(file_type="image")
+        pdfs = Q(mime_type="application/pdf") | Q(file__iendswith=".pdf")
+        if not force:
+            images &= Q(renditions__isnull=True) | Q(width__isnull=True) | Q(perceptual_hash="")
+            pdfs &= Q(page_count__isnull=True)
+        return Media.objects.filter(images | pdfs).exclude(file="").distinct().order_by("pk")
+
+    def handle(self, *args, **options):
+        if options['loop'] and not options['pending']:
+            raise CommandError('--loop requires --pending')
+        while True:
+            processed = self.process(options)
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
+
+    def process(self, options):
+        """Process one round of media; returns how many were processed."""
+        batch_size = options['batch_size']
+        queryset = self.get_queryset(options['force'], options['pending'])
+        if options['pending']:
+            queryset = queryset[:batch_size * max(options['workers'], 1)]
+        media = list(queryset.iterator(chunk_size=batch_size))
+        jobs = [job for job in map(build_job, media) if job is not None]
+        if options['pending']:
+            # Files that cannot be processed (any more) must not stay pending
+            queued = {job["media_id"] for job in jobs}
+            Media.objects.filter(pk__in=[item.pk for item in media if item.pk not in queued]).update(
+                processing_status=""
+            )
+        if not jobs:
+            if not options['loop']:
+                self.stdout.write(self.style.SUCCESS('✓ Nothing to process'))
+            return 0
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+
+        started = time.monotonic()
+        processed = failed = 0
+        batch = []
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for result in executor.map(run_job, jobs, chunksize=4):
+                batch.append(result)
+                failed += bool(result["error"])
+                if len(batch) >= batch_size:
+                    apply_results(batch)
+                    processed += len(batch)
+                    batch = []
+                    self.stdout.write(f'  {processed}/{len(jobs)} processed')
+        if batch:
+            apply_results(batch)
+            processed += len(batch)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Processed {processed} media in {elapsed:.1f}s ({processed / elapsed:.1f}/s)')
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} files could not be processed'))
+        return processed
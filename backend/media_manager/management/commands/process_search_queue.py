@@ -0,0 +1,66 @@
+"""
+Management command to flush queued search index changes to Elasticsearch
+Run: python manage.py process_search_queue [--once] [--interval 2] [--batch-size 500] [--stats]
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from media_manager.search.queue import flush, queue_stats
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = 'Send queued index changes to Elasticsearch with the bulk API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=getattr(settings, 'MEDIA_MANAGER_SEARCH_QUEUE_BATCH_SIZE', 500),
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            default=getattr(settings, 'MEDIA_MANAGER_SEARCH_QUEUE_INTERVAL', 2),
+            help='Seconds to wait when the queue is drained',
+        )
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--stats', action='store_true', help='Print queue depth and lag and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = queue_stats()
+            self.stdout.write(f'depth={stats["depth"]} failing={stats["failing"]} lag={stats["lag_seconds"]}s')
+            return
+
+        batch_size = options['batch_size']
+        backoff = options['interval']
+        total_sent = total_failed = 0
+        while True:
+            try:
+                sent, failed = flush(batch_size)
+            except Exception:
+                # Elasticsearch unreachable: the batch stays queued
+                logger.exception('Flushing the search queue failed')
+                if options['once']:
+                    raise
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            backoff = options['interval']
+            total_sent += sent
+            total_failed += failed
+            if sent == batch_size:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Flushed {total_sent} queued changes'))
+        if total_failed:
+            self.stdout.write(self.style.WARNING(f'{total_failed} documents were rejected by Elasticsearch and will be retried'))
@@ -0,0 +1,56 @@
+"""
+Management command to delete expired trash for good
+Run: python manage.py purge_trash [--loop] [--interval 3600] [--batch-size 500] [--workers 8] [--days 30]
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from media_manager.deletion import process_deletions
+from media_manager.trash import get_retention, purge
+
+
+class Command(BaseCommand):
+    help = 'Hard-delete media and folders trashed longer than the retention period, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None, help='Threads removing files from storage')
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention in days (default MEDIA_MANAGER_TRASH_RETENTION_DAYS)')
+        parser.add_argument('--loop', action='store_true', help='Keep purging instead of exiting when done')
+        parser.add_argument('--interval', type=float, default=3600, help='Seconds to sleep when nothing expired')
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['days']) if options['days'] is not None else get_retention()
+        total_media = total_folders = total_files = 0
+        while True:
+            media, folders = purge(options['batch_size'], before=timezone.now() - retention)
+            total_media += media
+            total_folders += folders
+            if media:
+                # Files of the batch are queued; remove them with the bounded worker pool
+                total_files += self.drain(options)
+            if media or folders:
+                self.stdout.write(f'  {total_media} media, {total_folders} folders purged')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Purged {total_media} media and {total_folders} folders, removed {total_files} files'
+            )
+        )
+
+    def drain(self, options):
+        """Delete queued files until the queue is empty; failures are retried by process_deletions."""
+        removed = 0
+        while True:
+            deleted, _ = process_deletions(options['batch_size'], options['workers'])
+            removed += deleted
+            if not deleted:
+                return removed
@@ -0,0 +1,25 @@
+"""
+Management command to recompute per-user storage usage from the media table
+Run: python manage.py reconcile_quotas [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+
+from media_manager.quotas import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute storage quota usage and reservations with grouped aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report counters that drifted')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        changes = reconcile(dry_run=dry_run)
+        for user_id, (used, reserved), (new_used, new_reserved) in changes:
+            self.stdout.write(
+                f'user {user_id}: used {used} -> {new_used}, reserved {reserved} -> {new_reserved}'
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {len(changes)} quota counters {"would be " if dry_run else ""}corrected')
+        )
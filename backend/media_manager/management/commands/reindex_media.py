@@ -0,0 +1,148 @@
+"""
+Management command to rebuild the media search index without downtime
+Run: python manage.py reindex_media [--workers 4] [--chunk-size 500] [--bulk-threads 4] [--keep-old]
+
+Documents are written into a new versioned index (media-<timestamp>); the
+`media` alias is switched to it atomically once it is complete, so search
+keeps serving the old index during the rebuild. Changes queued while it
+loads (including tag and folder renames) are replayed into the new index
+before the swap.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from elasticsearch.helpers import bulk, parallel_bulk
+
+from media_manager.models import Media
+from media_manager.search.documents import MediaDocument
+from media_manager.search.indexing import delete_media_documents, index_media
+from media_manager.search.reindex import (
+    bounded_map,
+    finish_rebuild,
+    replay_actions,
+    serialize_chunk,
+    start_rebuild,
+    swap_alias,
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the media index into a new versioned index and swap the alias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Processes serializing documents')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Media rows per serialization job')
+        parser.add_argument('--bulk-threads', type=int, default=4, help='Concurrent bulk requests')
+        parser.add_argument('--bulk-size', type=int, default=1000, help='Documents per bulk request')
+        parser.add_argument('--keep-old', action='store_true', help='Do not delete the previous index')
+        parser.add_argument('--allow-errors', action='store_true',
+                            help='Swap the alias even if some documents were rejected')
+
+    def handle(self, *args, **options):
+        client = MediaDocument._get_connection()
+        alias = MediaDocument._index._name
+        new_index = f'{alias}-{timezone.now():%Y%m%d%H%M%S}'
+        index = MediaDocument._index.clone(name=new_index)
+        replicas = index._settings.get('number_of_replicas', 1)
+
+        # Bulk loading is faster without refreshes and replicas
+        index.create()
+        index.put_settings(settings={'index': {'refresh_interval': '-1', 'number_of_replicas': 0}})
+
+        rebuild = start_rebuild(new_index)
+        started_at = timezone.now()
+        ids = list(Media.objects.order_by('pk').values_list('pk', flat=True))
+        self.stdout.write(f'Indexing {len(ids)} media into {new_index}')
+
+        try:
+            indexed, failed, elapsed = self.load(client, new_index, ids, options)
+            if failed and not options['allow_errors']:
+                raise CommandError(
+                    f'{failed} documents were rejected; {new_index} was removed and {alias} left unchanged'
+                )
+            replayed_at = timezone.now()
+            replayed = self.replay(client, rebuild)
+        except BaseException:
+            finish_rebuild(rebuild)
+            client.indices.delete(index=new_index, ignore_unavailable=True)
+            raise
+
+        index.put_settings(settings={'index': {'refresh_interval': '1s', 'number_of_replicas': replicas}})
+        client.indices.refresh(index=new_index)
+        try:
+            old_indices = swap_alias(client, alias, new_index)
+        finally:
+            # Changes flushed to the old index after the replay go out again
+            finish_rebuild(rebuild, resend_after=replayed_at)
+        self.stdout.write(f'  {alias} -> {new_index} ({replayed} queued changes replayed)')
+
+        self.catch_up(ids, started_at)
+        if not options['keep_old']:
+            for old in old_indices:
+                client.indices.delete(index=old, ignore_unavailable=True)
+                self.stdout.write(f'  deleted {old}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Indexed {indexed} documents in {elapsed:.1f}s ({indexed / max(elapsed, 1e-9):,.0f} docs/s)')
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} documents were rejected'))
+
+    def load(self, client, index_name, ids, options):
+        """Serialize in worker processes and stream into `index_name`."""
+        chunk_size = options['chunk_size']
+        jobs = ((index_name, ids[start:start + chunk_size]) for start in range(0, len(ids), chunk_size))
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+
+        indexed = failed = 0
+        started = last_report = time.monotonic()
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            # Fork the workers now: parallel_bulk pulls jobs from its own threads
+            executor.submit(int).result()
+            actions = (
+                action
+                for chunk in bounded_map(executor, serialize_chunk, jobs, options['workers'] * 2)
+                for action in chunk
+            )
+            for ok, _ in parallel_bulk(
+                client,
+                actions,
+                thread_count=options['bulk_threads'],
+                chunk_size=options['bulk_size'],
+                raise_on_error=False,
+            ):
+                if ok:
+                    indexed += 1
+                else:
+                    failed += 1
+                now = time.monotonic()
+                if now - last_report >= 5:
+                    last_report = now
+                    done = indexed + failed
+                    self.stdout.write(f'  {done}/{len(ids)} docs  {done / (now - started):,.0f} docs/s')
+        return indexed, failed, time.monotonic() - started
+
+    def replay(self, client, rebuild):
+        """Apply the changes queued during the load to the new index."""
+        replayed, errors = bulk(client, replay_actions(rebuild), raise_on_error=False, stats_only=False)
+        errors = [
+            error for error in errors
+            if not (next(iter(error)) == 'delete' and next(iter(error.values())).get('status') == 404)
+        ]
+        if errors:
+            raise CommandError(f'{len(errors)} queued changes could not be replayed into {rebuild.index_name}')
+        return replayed
+
+    def catch_up(self, ids, started_at):
+        """Queue changes that happened while the new index was being built."""
+        index_media(Media.objects.filter(updated_at__gte=started_at).values_list('pk', flat=True))
+        deleted = set(ids) - set(Media.objects.values_list('pk', flat=True))
+        if deleted:
+            delete_media_documents(deleted)
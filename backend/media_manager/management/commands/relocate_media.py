@@ -0,0 +1,101 @@
+"""
+Management command to move legacy media files into the sharded layout
+Run: python manage.py relocate_media [--workers 8] [--batch-size 500] [--dry-run]
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from media_manager.models import Media
+from media_manager.search.indexing import index_media
+from media_manager.storage import BLOB_PREFIX, SHARDED_NAME_RE, media_storage, sharded_name
+
+
+class Command(BaseCommand):
+    help = 'Relocate files stored under folder paths into media/ab/cd/ shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        names = (
+            Media.all_objects.exclude(file="")
+            .exclude(file__startswith=f"{BLOB_PREFIX}/")
+            .exclude(file__regex=SHARDED_NAME_RE.pattern)
+            .values_list("file", flat=True)
+            .distinct()
+            .order_by("file")
+        )
+
+        moved = missing = 0
+        batch = []
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for name in names.iterator(chunk_size=batch_size):
+                batch.append(name)
+                if len(batch) >= batch_size:
+                    result = self.process_batch(executor, batch, options['dry_run'])
+                    moved, missing = moved + result[0], missing + result[1]
+                    batch = []
+                    self.stdout.write(f'  {moved} moved')
+            if batch:
+                result = self.process_batch(executor, batch, options['dry_run'])
+                moved, missing = moved + result[0], missing + result[1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {moved} files {"would be " if options["dry_run"] else ""}relocated')
+        )
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} media rows point at missing files'))
+
+    def process_batch(self, executor, names, dry_run):
+        """Move a batch of files concurrently, then repoint their rows in one UPDATE."""
+        targets = {name: sharded_name(name) for name in names}
+        if dry_run:
+            exists = list(executor.map(media_storage.exists, names))
+            return sum(exists), len(names) - sum(exists)
+
+        outcomes = list(executor.map(lambda name: self.move(name, targets[name]), names))
+        done = {name: targets[name] for name, ok in zip(names, outcomes) if ok}
+        if not done:
+            return 0, len(names)
+
+        try:
+            with transaction.atomic():
+                ids = list(Media.all_objects.filter(file__in=done).values_list("pk", flat=True))
+                Media.all_objects.filter(pk__in=ids).update(
+                    file=Case(*(When(file=old, then=Value(new)) for old, new in done.items()))
+                )
+        except Exception:
+            # Put the files back so the rows keep pointing at them
+            list(executor.map(lambda item: self.move(item[1], item[0]), done.items()))
+            raise
+
+        for old in done:
+            self.prune(os.path.dirname(media_storage.path(old)))
+        index_media(ids)
+        return len(done), len(names) - len(done)
+
+    def move(self, old, new):
+        source, target = media_storage.path(old), media_storage.path(new)
+        if not os.path.exists(source):
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.rename(source, target)
+        return True
+
+    def prune(self, directory):
+        """Remove now-empty legacy directories up to the storage root."""
+        root = os.path.abspath(media_storage.location)
+        directory = os.path.abspath(directory)
+        while directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
@@ -0,0 +1,67 @@
+"""
+Management command to reconcile media rows against the files in storage
+Run: python manage.py scrub_media [--repair] [--delete-dangling] [--workers 8] [--batch-size 1000] [--min-age 3600]
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from media_manager.scrub import DANGLING, MISMATCH, ORPHAN, pending_orphans, repair, scan
+
+
+LABELS = {"media": "media", "default": "rendition"}
+
+
+class Command(BaseCommand):
+    help = 'Find orphaned files, rows with missing files and size mismatches, and optionally repair them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help='Queue orphans for deletion, fix sizes and drop dangling renditions')
+        parser.add_argument('--delete-dangling', action='store_true',
+                            help='With --repair, also delete media rows whose file is missing')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Ignore files modified in the last N seconds (uploads in flight)')
+
+    def handle(self, *args, **options):
+        found, done = Counter(), Counter()
+        orphan_bytes = 0
+        batch = []
+        for finding in scan(options['workers'], options['batch_size'], options['min_age']):
+            batch.append(finding)
+            if len(batch) >= options['batch_size']:
+                orphan_bytes += self.process_batch(batch, options, found, done)
+                batch = []
+        if batch:
+            orphan_bytes += self.process_batch(batch, options, found, done)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ {found[ORPHAN]} orphaned files ({orphan_bytes / (1024 * 1024):.2f} MB), '
+                f'{found[DANGLING]} rows with missing files, {found[MISMATCH]} size mismatches'
+            )
+        )
+        for action, count in done.items():
+            self.stdout.write(self.style.SUCCESS(f'✓ {count} {action}'))
+        if found[DANGLING] and not options['delete_dangling']:
+            self.stdout.write(self.style.WARNING('Media rows with missing files are kept; see --delete-dangling'))
+
+    def process_batch(self, batch, options, found, done):
+        """Report one batch of findings (and repair it). Returns the orphaned bytes."""
+        orphans = pending_orphans([item for kind, item in batch if kind == ORPHAN])
+        for file in orphans:
+            self.stdout.write(f'  orphan {file.name} ({file.size} bytes)')
+        for kind, item in batch:
+            if kind == DANGLING:
+                self.stdout.write(f'  missing {item.name} ({LABELS[item.storage]} #{item.pk})')
+            elif kind == MISMATCH:
+                row, file = item
+                self.stdout.write(f'  size {row.name} ({LABELS[row.storage]} #{row.pk}): {row.size} recorded, {file.size} on disk')
+        found[ORPHAN] += len(orphans)
+        found.update(kind for kind, _ in batch if kind != ORPHAN)
+
+        if options['repair']:
+            done.update(repair(batch, delete_dangling=options['delete_dangling']))
+        return sum(file.size for file in orphans)
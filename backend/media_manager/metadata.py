@@ -0,0 +1,93 @@
+"""
+Descriptive metadata for media files (dimensions, EXIF, page counts).
+
+Only headers are parsed: Pillow reads image size and EXIF without decoding
+pixels, and PDF page counts come from scanning the page tree dictionaries.
+Like renditions.py this does not touch Django models so it can run in
+worker processes.
+"""
+import mmap
+import re
+from datetime import datetime
+
+from PIL import Image
+
+ORIENTATION_TAG = 0x0112
+DATETIME_TAG = 0x0132
+MAKE_TAG = 0x010F
+MODEL_TAG = 0x0110
+EXIF_IFD = 0x8769
+DATETIME_ORIGINAL_TAG = 0x9003
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# EXIF orientations that rotate the image by 90 degrees
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Larger PDFs are skipped; the scan is linear in file size
+MAX_PDF_SCAN_SIZE = 64 * 1024 * 1024
+PDF_PAGES_RE = re.compile(rb"/Type\s*/Pages\b(?:(?!>>).)*?/Count\s+(\d+)", re.DOTALL)
+
+
+def orientation_for(width, height):
+    if width == height:
+        return "square"
+    return "landscape" if width > height else "portrait"
+
+
+def _exif_text(value):
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "ignore")
+    return str(value).strip("\x00 ")[:100] if value else ""
+
+
+def _exif_datetime(value):
+    try:
+        return datetime.strptime(_exif_text(value)[:19], EXIF_DATETIME_FORMAT).isoformat()
+    except ValueError:
+        return None
+
+
+def image_metadata(source_path):
+    with Image.open(source_path) as image:
+        width, height = image.size
+        exif = image.getexif()
+
+    if exif.get(ORIENTATION_TAG) in ROTATED_ORIENTATIONS:
+        width, height = height, width
+
+    captured = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL_TAG) or exif.get(DATETIME_TAG)
+    return {
+        "width": width,
+        "height": height,
+        "orientation": orientation_for(width, height),
+        "captured_at": _exif_datetime(captured) if captured else None,
+        "camera_make": _exif_text(exif.get(MAKE_TAG)),
+        "camera_model": _exif_text(exif.get(MODEL_TAG)),
+    }
+
+
+def pdf_page_count(source_path):
+    """
+    Page count from the root /Pages dictionary, or None.
+
+    PDFs that keep their page tree in compressed object streams are not
+    counted rather than paying for a full parse.
+    """
+    with open(source_path, "rb") as fh:
+        fh.seek(0, 2)
+        size = fh.tell()
+        if not size or size > MAX_PDF_SCAN_SIZE:
+            return None
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            counts = [int(match.group(1)) for match in PDF_PAGES_RE.finditer(data)]
+    # Intermediate page tree nodes count a subset; the root has the total
+    return max(counts) if counts else None
+
+
+def extract_metadata(source_path, file_type, mime_type=""):
+    """Return the metadata fields that apply to the file."""
+    if file_type == "image" and mime_type != "image/svg+xml" and not source_path.lower().endswith(".svg"):
+        return image_metadata(source_path)
+    if mime_type == "application/pdf" or source_path.lower().endswith(".pdf"):
+        return {"page_count": pdf_page_count(source_path)}
+    return {}
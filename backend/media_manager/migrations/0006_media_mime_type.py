@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0005_storage_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='mime_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
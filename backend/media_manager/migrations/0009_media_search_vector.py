@@ -0,0 +1,38 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+INDEX_NAME = "media_search_vector_gin"
+
+
+def search_vector():
+    # Must match media_manager.search.backends.search_vector()
+    return (
+        SearchVector("title", weight="A", config="english")
+        + SearchVector("alt_text", "file", weight="B", config="english")
+        + SearchVector("description", weight="C", config="english")
+    )
+
+
+def create_search_index(apps, schema_editor):
+    # Full-text index for DatabaseBackend; other databases search without one
+    if schema_editor.connection.vendor == "postgresql":
+        Media = apps.get_model("media_manager", "Media")
+        schema_editor.add_index(Media, GinIndex(search_vector(), name=INDEX_NAME))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        Media = apps.get_model("media_manager", "Media")
+        schema_editor.remove_index(Media, GinIndex(search_vector(), name=INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0008_search_index_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_usage(apps, schema_editor):
+    # Same grouped aggregate as media_manager.quotas.reconcile()
+    Media = apps.get_model("media_manager", "Media")
+    StorageQuota = apps.get_model("media_manager", "StorageQuota")
+    usage = (
+        Media.objects.exclude(uploaded_by=None).order_by().values("uploaded_by")
+        .annotate(total=Sum("size")).values_list("uploaded_by", "total")
+    )
+    StorageQuota.objects.bulk_create(
+        [StorageQuota(user_id=user_id, used=total or 0) for user_id, total in usage],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0010_media_perceptual_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageQuota',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='storage_quota', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('limit', models.BigIntegerField(blank=True, help_text='Bytes; empty uses MEDIA_MANAGER_DEFAULT_QUOTA', null=True)),
+                ('used', models.BigIntegerField(default=0)),
+                ('reserved', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0011_storage_quota'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='media',
+            name='media_manag_uploade_84ee2e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='media',
+            name='media_manag_folder__4209de_idx',
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['uploaded_by', 'created_at', 'id'], name='media_manag_uploade_e07034_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['folder', 'created_at', 'id'], name='media_manag_folder__bd3cf0_idx'),
+        ),
+    ]
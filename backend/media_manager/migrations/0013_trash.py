@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0012_media_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='folder',
+            name='media_manag_owner_i_acba91_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='media',
+            name='media_manag_uploade_e07034_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='media',
+            name='media_manag_folder__bd3cf0_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='folder',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='media',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['owner', 'parent'], name='folder_live_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='folder_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['uploaded_by', 'created_at', 'id'], name='media_live_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['folder', 'created_at', 'id'], name='media_live_folder_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='media_trash_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='folder',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('name', 'parent', 'owner'), name='unique_live_folder_name'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:37
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+from media_manager.storage import is_blob_name, original_filename
+
+INDEX_NAME = "media_search_vector_gin"
+
+
+def backfill_original_filename(apps, schema_editor):
+    # Blob names are content hashes; those uploads' names were not kept
+    Media = apps.get_model("media_manager", "Media")
+    batch = []
+    for media in Media.objects.exclude(file="").only("pk", "file").iterator(chunk_size=2000):
+        if not is_blob_name(media.file.name):
+            media.original_filename = original_filename(media.file.name)[:255]
+            batch.append(media)
+        if len(batch) >= 1000:
+            Media.objects.bulk_update(batch, ["original_filename"])
+            batch = []
+    Media.objects.bulk_update(batch, ["original_filename"])
+
+
+def search_vector(name_column):
+    # Must match media_manager.search.backends.search_vector()
+    return (
+        SearchVector("title", weight="A", config="english")
+        + SearchVector("alt_text", name_column, weight="B", config="english")
+        + SearchVector("description", weight="C", config="english")
+    )
+
+
+def swap_search_index(old_column, new_column):
+    def swap(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            Media = apps.get_model("media_manager", "Media")
+            schema_editor.remove_index(Media, GinIndex(search_vector(old_column), name=INDEX_NAME))
+            schema_editor.add_index(Media, GinIndex(search_vector(new_column), name=INDEX_NAME))
+    return swap
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0013_trash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='original_filename',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(backfill_original_filename, migrations.RunPython.noop),
+        # Search the uploaded name instead of the storage path
+        migrations.RunPython(
+            swap_search_index("file", "original_filename"), swap_search_index("original_filename", "file")
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:44
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_expiry(apps, schema_editor):
+    # Give sessions in progress a day from their last chunk
+    UploadSession = apps.get_model("media_manager", "UploadSession")
+    UploadSession.objects.update(expires_at=F("updated_at") + timedelta(days=1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0014_media_original_filename'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='expires_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_expiry, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('receiving', 'Receiving chunk')], default='open', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='uploadsession',
+            index=models.Index(fields=['expires_at'], name='media_manag_expires_0be478_idx'),
+        ),
+    ]
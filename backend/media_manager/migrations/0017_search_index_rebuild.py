@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0016_search_queue_retries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexRebuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_name', models.CharField(max_length=255)),
+                ('queue_mark', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='searchindexqueue',
+            name='flushed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_manager', '0017_search_index_rebuild'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='processing_status',
+            field=models.CharField(blank=True, choices=[('', 'Not needed'), ('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, max_length=10),
+        ),
+    ]
@@ -1,11 +1,28 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, connection, transaction, IntegrityError
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
 from django.utils import timezone
 from pathlib import Path
+import uuid
+
+from media_manager.storage import get_media_storage, is_blob_name, original_filename as stored_filename, sharded_name
 
 User = get_user_model()
 
+# Rows outside the trash (media_manager/trash.py)
+LIVE = Q(deleted_at__isnull=True)
+TRASHED = Q(deleted_at__isnull=False)
+
+
+class LiveManager(models.Manager):
+    """Default manager hiding trashed rows; `all_objects` includes them."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(LIVE)
+
 
 class Folder(models.Model):
     """Hierarchical folder structure for organizing media."""
@@ -20,13 +37,21 @@ class Folder(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="folders")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     class Meta:
-        unique_together = ("name", "parent", "owner")
         ordering = ["name"]
+        constraints = [
+            # Trashed folders do not block their name
+            models.UniqueConstraint(fields=["name", "parent", "owner"], condition=LIVE, name="unique_live_folder_name"),
+        ]
         indexes = [
-            models.Index(fields=["owner", "parent"]),
+            models.Index(fields=["owner", "parent"], condition=LIVE, name="folder_live_owner_idx"),
             models.Index(fields=["created_at"]),
+            models.Index(fields=["deleted_at"], condition=TRASHED, name="folder_trash_idx"),
         ]
 
     def __str__(self):
@@ -41,12 +66,47 @@ class Folder(models.Model):
             parent = parent.parent
         return "/".join(reversed(parts))
 
+    def get_descendant_ids(self, include_self=True):
+        """Ids of all folders below this one, in a single recursive query."""
+        table = connection.ops.quote_name(self._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH RECURSIVE tree(id) AS (
+                    SELECT id FROM {table} WHERE id = %s
+                    UNION ALL
+                    SELECT f.id FROM {table} f JOIN tree ON f.parent_id = tree.id
+                )
+                SELECT id FROM tree
+                """,
+                [self.pk],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        return ids if include_self else [pk for pk in ids if pk != self.pk]
+
+    @classmethod
+    def get_full_paths(cls, folder_ids):
+        """Map folder ids to get_full_path() values with one query per tree level."""
+        nodes = {}
+        missing = set(folder_ids)
+        while missing:
+            for pk, name, parent_id in cls.objects.filter(pk__in=missing).values_list("pk", "name", "parent_id"):
+                nodes[pk] = (name, parent_id)
+            missing = {parent_id for _, parent_id in nodes.values() if parent_id and parent_id not in nodes}
+
+        paths = {}
+
+        def path(pk):
+            if pk not in paths:
+                name, parent_id = nodes[pk]
+                paths[pk] = f"{path(parent_id)}/{name}" if parent_id in nodes else name
+            return paths[pk]
+
+        return {pk: path(pk) for pk in folder_ids if pk in nodes}
+
     def get_all_media(self):
         """Get all media in this folder and subfolders."""
-        media_ids = [m.id for m in self.media.all()]
-        for child in self.children.all():
-            media_ids.extend([m.id for m in child.get_all_media()])
-        return Media.objects.filter(id__in=media_ids)
+        return Media.objects.filter(folder_id__in=self.get_descendant_ids())
 
 
 class Tag(models.Model):
@@ -66,7 +126,14 @@ class Tag(models.Model):
 
 
 def upload_to(instance, filename):
-    """Generate upload path for media files."""
+    """
+    Generate upload path for media files.
+
+    The default "sharded" layout does not depend on the folder; "folder"
+    mirrors the folder path on disk.
+    """
+    if getattr(settings, "MEDIA_MANAGER_UPLOAD_LAYOUT", "sharded") == "sharded":
+        return sharded_name(filename)
     if instance.folder:
         path = instance.folder.get_full_path()
         return f"media/{path}/{filename}"
@@ -84,7 +151,23 @@ class Media(models.Model):
         ("other", "Other"),
     ]
 
-    file = models.FileField(upload_to=upload_to)
+    ORIENTATION_CHOICES = [
+        ("landscape", "Landscape"),
+        ("portrait", "Portrait"),
+        ("square", "Square"),
+    ]
+
+    PROCESSING_CHOICES = [
+        ("", "Not needed"),
+        ("pending", "Pending"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    file = models.FileField(upload_to=upload_to, storage=get_media_storage)
+    # Name as uploaded; deduplicated files are stored under their content hash
+    original_filename = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     title = models.CharField(max_length=255, blank=True)
     description = models.TextField(blank=True)
     alt_text = models.CharField(max_length=255, blank=True)
@@ -94,7 +177,28 @@ class Media(models.Model):
         choices=FILE_TYPE_CHOICES,
         default="other"
     )
+    mime_type = models.CharField(max_length=100, blank=True)
     size = models.BigIntegerField(default=0)
+
+    # Extracted by media_manager/metadata.py after upload
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    orientation = models.CharField(max_length=10, choices=ORIENTATION_CHOICES, blank=True)
+    captured_at = models.DateTimeField(null=True, blank=True)
+    camera_make = models.CharField(max_length=100, blank=True)
+    camera_model = models.CharField(max_length=100, blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    # Post-upload processing (media_manager/processing.py); "pending" rows
+    # survive restarts and are picked up by `manage.py process_media --pending`
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_CHOICES, blank=True, db_index=True)
+
+    # Perceptual hash (media_manager/fingerprints.py): 64-bit dHash as hex,
+    # and its four 16-bit chunks for indexed Hamming-distance lookups
+    perceptual_hash = models.CharField(max_length=16, blank=True)
+    phash_0 = models.PositiveIntegerField(null=True, blank=True)
+    phash_1 = models.PositiveIntegerField(null=True, blank=True)
+    phash_2 = models.PositiveIntegerField(null=True, blank=True)
+    phash_3 = models.PositiveIntegerField(null=True, blank=True)
     
     folder = models.ForeignKey(
         Folder,
@@ -115,23 +219,263 @@ class Media(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["uploaded_by", "created_at"]),
-            models.Index(fields=["folder"]),
+            # Keyset pages of list views (media_manager/pagination.py)
+            models.Index(fields=["uploaded_by", "created_at", "id"], condition=LIVE, name="media_live_owner_idx"),
+            models.Index(fields=["folder", "created_at", "id"], condition=LIVE, name="media_live_folder_idx"),
+            # Trash listings and the purge worker
+            models.Index(fields=["deleted_at"], condition=TRASHED, name="media_trash_idx"),
             models.Index(fields=["file_type"]),
             models.Index(fields=["created_at"]),
+            models.Index(fields=["orientation"]),
+            models.Index(fields=["width", "height"]),
+            models.Index(fields=["captured_at"]),
+            models.Index(fields=["uploaded_by", "phash_0"], name="media_phash_0_idx"),
+            models.Index(fields=["uploaded_by", "phash_1"], name="media_phash_1_idx"),
+            models.Index(fields=["uploaded_by", "phash_2"], name="media_phash_2_idx"),
+            models.Index(fields=["uploaded_by", "phash_3"], name="media_phash_3_idx"),
         ]
 
     def __str__(self):
         return self.title or self.file.name
 
+    def get_filename(self):
+        """Filename as uploaded, for downloads, archives and search."""
+        if self.original_filename:
+            return self.original_filename
+        name = stored_filename(self.file.name)
+        if is_blob_name(self.file.name) and self.title:
+            # Deduplicated before names were kept: the title, with the file's extension
+            suffix = Path(name).suffix
+            title = self.title.replace("/", "_").strip()
+            return title if title.lower().endswith(suffix.lower()) else f"{title}{suffix}"
+        return name
+
     def get_file_extension(self):
         """Get file extension."""
         return Path(self.file.name).suffix.lower()
 
     def get_file_size_mb(self):
         """Get file size in MB."""
-        return round(self.size / (1024 * 1024), 2)
\ No newline at end of file
+        return round(self.size / (1024 * 1024), 2)
+
+
+class MediaRendition(models.Model):
+    """Downscaled preview of an image Media in a given size and format."""
+    media = models.ForeignKey(Media, on_delete=models.CASCADE, related_name="renditions")
+    name = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    file = models.FileField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["width", "format"]
+        constraints = [
+            models.UniqueConstraint(fields=["media", "name", "format"], name="unique_media_rendition"),
+        ]
+
+    def __str__(self):
+        return f"{self.media_id} {self.name}.{self.format}"
+
+
+class MediaBlob(models.Model):
+    """Reference-counted content-addressed file shared by Media rows."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+    @classmethod
+    def retain(cls, name, sha256, size=0, count=1):
+        """Add `count` references to a blob, creating its row if needed."""
+        if cls.objects.filter(name=name).update(ref_count=F("ref_count") + count):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, sha256=sha256, size=size, ref_count=count)
+        except IntegrityError:
+            cls.objects.filter(name=name).update(ref_count=F("ref_count") + count)
+
+    @classmethod
+    def release(cls, name, count=1):
+        """
+        Drop `count` references to a blob.
+
+        Returns True when the last reference went and the file may be removed.
+        """
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(ref_count=F("ref_count") - count):
+                return False
+            deleted, _ = cls.objects.filter(name=name, ref_count__lte=0).delete()
+        return bool(deleted)
+
+
+class StorageDeletion(models.Model):
+    """File waiting to be removed from storage by the deletion worker."""
+
+    STORAGE_CHOICES = [
+        ("media", "Media storage"),
+        ("default", "Default storage"),
+    ]
+
+    name = models.CharField(max_length=255)
+    storage = models.CharField(max_length=20, choices=STORAGE_CHOICES, default="media")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.storage}:{self.name}"
+
+
+class SearchIndexQueue(models.Model):
+    """
+    Pending search index change, one row per object.
+
+    Re-queueing an object overwrites `op` and `updated_at` (and resets its
+    retries) but keeps `enqueued_at`, so repeated saves coalesce and lag is
+    measured from the first unflushed change.
+    """
+
+    OP_CHOICES = [
+        ("index", "Index"),
+        ("delete", "Delete"),
+    ]
+
+    model = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    op = models.CharField(max_length=10, choices=OP_CHOICES, default="index")
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+    # Set when Elasticsearch rejected the change; retried with backoff
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Sent, but kept for a running index rebuild to replay (SearchIndexRebuild)
+    flushed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["enqueued_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["model", "object_id"], name="unique_search_queue_object"),
+        ]
+        indexes = [
+            models.Index(fields=["enqueued_at"]),
+            models.Index(fields=["next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.op} {self.model}:{self.object_id}"
+
+
+class SearchIndexRebuild(models.Model):
+    """
+    Index rebuild in progress (`manage.py reindex_media`).
+
+    Changes flushed meanwhile go to the old index through the alias; queue
+    entries above `queue_mark` or updated since `started_at` are kept so the
+    rebuild can replay them into the new index before swapping.
+    """
+
+    index_name = models.CharField(max_length=255)
+    queue_mark = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.index_name
+
+    def tracks(self, entry):
+        """Whether the queue entry changed after the rebuild started."""
+        return entry.pk > self.queue_mark or entry.updated_at >= self.started_at
+
+
+class UploadSession(models.Model):
+    """
+    Resumable chunked upload in progress, finalized into a Media row.
+
+    `status` is "receiving" while a request writes a chunk, so concurrent
+    chunks cannot interleave; sessions idle past `expires_at` are removed by
+    `manage.py expire_uploads`.
+    """
+
+    STATUS_CHOICES = [
+        ("open", "Open"),
+        ("receiving", "Receiving chunk"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="open")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["owner", "created_at"]),
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_size}/{self.total_size})"
+
+    @property
+    def is_complete(self):
+        return self.received_size >= self.total_size
+
+
+class StorageQuota(models.Model):
+    """
+    Per-user storage limit and running usage (media_manager/quotas.py).
+
+    `used` tracks the sum of the user's Media.size and `reserved` the bytes of
+    uploads in flight; both move by relative F() updates only.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="storage_quota")
+    limit = models.BigIntegerField(
+        null=True, blank=True, help_text="Bytes; empty uses MEDIA_MANAGER_DEFAULT_QUOTA"
+    )
+    used = models.BigIntegerField(default=0)
+    reserved = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.used}+{self.reserved}/{self.limit}"
+
+    @classmethod
+    def add(cls, user_id, used=0, reserved=0):
+        """Move a user's counters by the given deltas, creating the row if needed."""
+        changes = {"used": F("used") + used, "reserved": Greatest(F("reserved") + reserved, 0)}
+        if cls.objects.filter(pk=user_id).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, used=used, reserved=max(reserved, 0))
+        except IntegrityError:
+            cls.objects.filter(pk=user_id).update(**changes)
@@ -0,0 +1,143 @@
+"""
+Keyset pagination for list endpoints.
+
+Rows are ordered by the view's ordering field (?ordering=, default from the
+view or model) with the primary key as tiebreaker, and each page starts
+strictly after the last row of the previous one:
+WHERE (key, id) < (last key, last id). With a composite index such as
+Media(uploaded_by, created_at, id) every page is one index range scan however
+deep it is, and rows created meanwhile never shift pages the way OFFSET does.
+Cursors are opaque tokens in the same format as search results.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from media_manager.search.results import decode_cursor, encode_cursor
+
+MAX_PAGE_SIZE = 500
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pages of {"next", "next_cursor", "results"}, no COUNT query."""
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if not value:
+            return getattr(settings, "MEDIA_MANAGER_PAGE_SIZE", 100)
+        if not value.isdigit() or int(value) < 1:
+            raise ValidationError({self.page_size_query_param: "Must be a positive integer."})
+        return min(int(value), MAX_PAGE_SIZE)
+
+    def get_key(self, queryset):
+        """(field, descending) of the first ordering term, which must be a column."""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ["-pk"]
+        term = ordering[0]
+        field = None
+        if isinstance(term, str):
+            name = term.lstrip("-")
+            try:
+                field = queryset.model._meta.pk if name == "pk" else queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                pass
+        if field is None or not field.concrete or field.is_relation:
+            raise ValidationError({"ordering": f"Cannot paginate by {term}."})
+        return field, term.startswith("-")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        field, descending = self.get_key(queryset)
+        key = field.attname
+        after = "lt" if descending else "gt"
+
+        ordering = [F(key).desc(nulls_last=True) if descending else F(key).asc(nulls_last=True)]
+        if not field.primary_key:
+            ordering.append(F("pk").desc() if descending else F("pk").asc())
+        queryset = queryset.annotate(keyset_value=F(key)).order_by(*ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode(cursor, field)
+            if field.primary_key:
+                queryset = queryset.filter(**{f"pk__{after}": pk})
+            elif value is None:
+                queryset = queryset.filter(**{f"{key}__isnull": True, f"pk__{after}": pk})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f"{key}__{after}": value})
+                    | Q(**{key: value, f"pk__{after}": pk})
+                    | Q(**{f"{key}__isnull": True})
+                )
+
+        rows = list(queryset[:size + 1])
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            last = rows[-1]
+            self.next_cursor = self.encode(field, last.keyset_value, last.pk)
+        return rows
+
+    def encode(self, field, value, pk):
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        return encode_cursor([field.name, value, pk])
+
+    def decode(self, cursor, field):
+        """(key value, pk) of a cursor made for the same ordering field."""
+        try:
+            name, value, pk = decode_cursor(cursor)
+            if name != field.name:
+                raise ValueError(name)
+            return (None if value is None else field.to_python(value)), int(pk)
+        except (ValueError, TypeError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor."}) from None
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "next_cursor": self.next_cursor,
+            "results": data,
+        })
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "next_cursor of the previous page",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Results per page (max {MAX_PAGE_SIZE})",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "next_cursor": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,198 @@
+"""
+Post-upload processing for media.
+
+CPU-heavy stages run in a process pool; only plain data crosses the
+process boundary and the results are written back from the parent.
+
+Scheduled media are marked `processing_status="pending"` in the same
+transaction, so work lost to a restart is picked up again by
+`manage.py process_media --pending`. With MEDIA_MANAGER_PROCESSING_DEFERRED
+the web process only marks rows and never starts a pool; that command
+(with --loop) does all the processing.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from media_manager.fingerprints import dhash_file, hash_fields
+from media_manager.metadata import extract_metadata
+from media_manager.models import Media, MediaRendition
+from media_manager.renditions import render_renditions
+from media_manager.search.indexing import index_media
+
+logger = logging.getLogger(__name__)
+
+RENDITION_DIR = "renditions"
+
+_executor = None
+
+
+def get_worker_count():
+    return getattr(settings, "MEDIA_MANAGER_PROCESSING_WORKERS", 2)
+
+
+def is_deferred():
+    return getattr(settings, "MEDIA_MANAGER_PROCESSING_DEFERRED", False)
+
+
+def get_executor():
+    """Lazily create the shared process pool."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=get_worker_count())
+    return _executor
+
+
+def build_job(media):
+    """Describe the work for one Media as picklable data, or None."""
+    if not media.file:
+        return None
+    is_image = media.file_type == "image"
+    is_pdf = media.mime_type == "application/pdf" or media.file.name.lower().endswith(".pdf")
+    if not (is_image or is_pdf):
+        return None
+    try:
+        source_path = media.file.path
+    except NotImplementedError:
+        # Remote storage without local paths
+        return None
+
+    rendition_dir = f"{RENDITION_DIR}/{media.pk}"
+    return {
+        "media_id": media.pk,
+        "source_path": source_path,
+        "file_type": media.file_type,
+        "mime_type": media.mime_type,
+        "render": is_image,
+        "rendition_dir": rendition_dir,
+        "output_dir": os.path.join(settings.MEDIA_ROOT, rendition_dir),
+        "sizes": getattr(settings, "MEDIA_MANAGER_RENDITION_SIZES", None),
+        "formats": getattr(settings, "MEDIA_MANAGER_RENDITION_FORMATS", None),
+    }
+
+
+def run_job(job):
+    """Worker entry point: run every processing stage for one file."""
+    result = {"media_id": job["media_id"], "metadata": {}, "renditions": [], "error": None}
+    try:
+        result["metadata"] = extract_metadata(job["source_path"], job["file_type"], job["mime_type"])
+        if "width" in result["metadata"]:
+            # Raster image: fingerprint it for near-duplicate detection
+            result["metadata"].update(hash_fields(dhash_file(job["source_path"])))
+        if job["render"]:
+            result["renditions"] = render_renditions(
+                job["source_path"],
+                job["output_dir"],
+                sizes=job["sizes"],
+                formats=job["formats"],
+            )
+        for rendition in result["renditions"]:
+            rendition["file"] = f'{job["rendition_dir"]}/{rendition.pop("filename")}'
+    except Exception as exc:  # Corrupt or unsupported files must not kill the pool
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+def _metadata_instance(media_id, metadata):
+    media = Media(pk=media_id, **metadata)
+    if media.captured_at:
+        # EXIF times carry no zone; read them in the project time zone
+        captured_at = datetime.fromisoformat(media.captured_at)
+        if settings.USE_TZ:
+            captured_at = timezone.make_aware(captured_at)
+        media.captured_at = captured_at
+    return media
+
+
+def apply_results(results):
+    """Store the output of finished jobs."""
+    ok, failed_ids = [], []
+    for result in results:
+        if result["error"]:
+            logger.warning("Processing media %s failed: %s", result["media_id"], result["error"])
+            failed_ids.append(result["media_id"])
+        else:
+            ok.append(result)
+
+    existing_ids = set(
+        Media.objects.filter(pk__in=[result["media_id"] for result in ok]).values_list("pk", flat=True)
+    )
+    ok = [result for result in ok if result["media_id"] in existing_ids]
+
+    MediaRendition.objects.bulk_create(
+        [
+            MediaRendition(media_id=result["media_id"], **rendition)
+            for result in ok
+            for rendition in result["renditions"]
+        ],
+        update_conflicts=True,
+        unique_fields=["media", "name", "format"],
+        update_fields=["file", "width", "height", "size"],
+    )
+
+    # One UPDATE per batch and field set (images and PDFs fill different columns)
+    by_fields = defaultdict(list)
+    for result in ok:
+        if result["metadata"]:
+            by_fields[tuple(sorted(result["metadata"]))].append(
+                _metadata_instance(result["media_id"], result["metadata"])
+            )
+    for fields, instances in by_fields.items():
+        Media.objects.bulk_update(instances, fields, batch_size=500)
+
+    updated_ids = [media.pk for instances in by_fields.values() for media in instances]
+    if updated_ids:
+        index_media(updated_ids)
+
+    done_ids = [result["media_id"] for result in results if not result["error"]]
+    Media.all_objects.filter(pk__in=done_ids).update(processing_status="done")
+    Media.all_objects.filter(pk__in=failed_ids).update(processing_status="failed")
+
+
+def _on_job_done(future):
+    # Runs on the pool's callback thread, which has its own connection
+    close_old_connections()
+    try:
+        apply_results([future.result()])
+    except Exception:
+        logger.exception("Storing processing results failed")
+    finally:
+        close_old_connections()
+
+
+def schedule_processing(media_list):
+    """
+    Mark media pending and queue their post-processing once the current
+    transaction commits.
+
+    With MEDIA_MANAGER_PROCESSING_WORKERS = 0 the work runs inline.
+    """
+    jobs = {}
+    for media in media_list:
+        job = build_job(media)
+        if job is not None:
+            jobs[media.pk] = job
+            # Keep a later save() of the instance from clearing the mark
+            media.processing_status = "pending"
+    if not jobs:
+        return
+    Media.all_objects.filter(pk__in=jobs).update(processing_status="pending")
+    if is_deferred():
+        return
+
+    def submit():
+        if get_worker_count() == 0:
+            apply_results([run_job(job) for job in jobs.values()])
+        else:
+            executor = get_executor()
+            for job in jobs.values():
+                executor.submit(run_job, job).add_done_callback(_on_job_done)
+
+    transaction.on_commit(submit)
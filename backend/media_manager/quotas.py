@@ -0,0 +1,135 @@
+"""
+Per-user storage quotas.
+
+StorageQuota.used is a running total of the user's Media.size (trash included
+until it is purged), moved by one relative UPDATE whenever media are created,
+replaced or deleted (signals.py, bulk.py), so no request has to sum the media
+table. Uploads reserve their size before any bytes are stored: the
+reservation is a single conditional UPDATE, so concurrent uploads cannot
+overshoot the limit together. The reservation is released once the Media row
+(and its usage) is saved.
+
+`manage.py reconcile_quotas` recomputes the counters from the media table.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from media_manager.models import Media, StorageQuota, UploadSession
+
+
+class QuotaExceeded(Exception):
+    """Raised when an upload does not fit in the user's remaining quota."""
+
+    def __init__(self, size, available):
+        self.size = size
+        self.available = available
+        super().__init__(
+            f"Storage quota exceeded: {size / (1024*1024):.2f}MB requested, "
+            f"{max(available, 0) / (1024*1024):.2f}MB available."
+        )
+
+
+def get_default_limit():
+    """Quota in bytes of users without their own limit; None is unlimited."""
+    return getattr(settings, "MEDIA_MANAGER_DEFAULT_QUOTA", None)
+
+
+def get_usage(user_id):
+    """{"limit", "used", "reserved", "available"} in bytes; limit/available None when unlimited."""
+    quota = StorageQuota.objects.filter(pk=user_id).first() or StorageQuota(user_id=user_id)
+    limit = quota.limit if quota.limit is not None else get_default_limit()
+    return {
+        "limit": limit,
+        "used": quota.used,
+        "reserved": quota.reserved,
+        "available": None if limit is None else max(limit - quota.used - quota.reserved, 0),
+    }
+
+
+def check(user_id, size):
+    """Raise QuotaExceeded if `size` more bytes cannot fit right now (reserves nothing)."""
+    available = get_usage(user_id)["available"]
+    if available is not None and size > available:
+        raise QuotaExceeded(size, available)
+
+
+def _fits(size):
+    """Rows whose limit leaves room for `size` more bytes."""
+    fits = Q(limit__isnull=False, used__lte=F("limit") - F("reserved") - size)
+    default = get_default_limit()
+    if default is None:
+        return Q(limit__isnull=True) | fits
+    return Q(limit__isnull=True, used__lte=default - F("reserved") - size) | fits
+
+
+def reserve(user_id, size):
+    """Reserve `size` bytes for an upload in flight, or raise QuotaExceeded."""
+    quota = StorageQuota.objects.filter(pk=user_id)
+    if quota.filter(_fits(size)).update(reserved=F("reserved") + size):
+        return
+    # The user's first upload has no row yet; a concurrent first upload may
+    # create it meanwhile, so check again whether the row was ours or not
+    StorageQuota.objects.get_or_create(user_id=user_id)
+    if not quota.filter(_fits(size)).update(reserved=F("reserved") + size):
+        raise QuotaExceeded(size, get_usage(user_id)["available"])
+
+
+def release(user_id, size):
+    StorageQuota.add(user_id, reserved=-size)
+
+
+@contextmanager
+def reservation(user_id, size):
+    """Hold `size` bytes of quota while the block stores an upload."""
+    reserve(user_id, size)
+    try:
+        yield
+    finally:
+        release(user_id, size)
+
+
+def add_usage(deltas):
+    """Apply {user id: bytes} usage changes."""
+    for user_id, delta in deltas.items():
+        if user_id is not None and delta:
+            StorageQuota.add(user_id, used=delta)
+
+
+def reconcile(dry_run=False):
+    """
+    Recompute every user's usage (and reservations of open upload sessions)
+    with grouped aggregates and fix the counters that drifted.
+
+    Quota rows are locked meanwhile so concurrent updates are not lost.
+    Returns [(user id, (used, reserved) before, (used, reserved) after)].
+    """
+    with transaction.atomic():
+        quotas = StorageQuota.objects.all() if dry_run else StorageQuota.objects.select_for_update()
+        quotas = {quota.pk: quota for quota in quotas}
+        used = dict(
+            Media.all_objects.exclude(uploaded_by=None).order_by().values("uploaded_by")
+            .annotate(total=Sum("size")).values_list("uploaded_by", "total")
+        )
+        reserved = dict(
+            UploadSession.objects.order_by().values("owner")
+            .annotate(total=Sum("total_size")).values_list("owner", "total")
+        )
+
+        changes, updated, created = [], [], []
+        for user_id in sorted(quotas.keys() | used.keys() | reserved.keys()):
+            quota = quotas.get(user_id) or StorageQuota(user_id=user_id)
+            before = (quota.used, quota.reserved)
+            after = (used.get(user_id) or 0, reserved.get(user_id) or 0)
+            if before == after:
+                continue
+            changes.append((user_id, before, after))
+            quota.used, quota.reserved = after
+            (updated if user_id in quotas else created).append(quota)
+
+        if not dry_run:
+            StorageQuota.objects.bulk_update(updated, ["used", "reserved"], batch_size=1000)
+            StorageQuota.objects.bulk_create(created, batch_size=1000, ignore_conflicts=True)
+    return changes
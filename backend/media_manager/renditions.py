@@ -0,0 +1,77 @@
+"""
+Thumbnail and preview renditions for image media.
+
+Only depends on Pillow so it can run inside worker processes without
+touching Django models; media_manager/processing.py does the bookkeeping.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+# name -> bounding box (px) of the longest side
+DEFAULT_SIZES = {
+    "thumb": 160,
+    "small": 480,
+    "medium": 1024,
+}
+DEFAULT_FORMATS = ("webp", "jpeg")
+
+FORMAT_EXTENSIONS = {
+    "webp": "webp",
+    "jpeg": "jpg",
+    "png": "png",
+}
+
+
+def render_renditions(source_path, output_dir, sizes=None, formats=None, quality=82):
+    """
+    Write every size/format rendition of `source_path` into `output_dir`.
+
+    Sizes are produced largest first and each one is downscaled from the
+    previous, so the full-resolution image is decoded (and resampled) once.
+    Returns a list of dicts describing the files that were written.
+    """
+    sizes = sizes or DEFAULT_SIZES
+    formats = formats or DEFAULT_FORMATS
+    largest = max(sizes.values())
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    with Image.open(source_path) as image:
+        # Let the JPEG decoder scale down by powers of two while decoding
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        current = image
+        for name, box in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+            current = current.copy()
+            current.thumbnail((box, box), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                results.append(_save(current, output_dir, name, fmt, quality))
+
+    return results
+
+
+def _save(image, output_dir, name, fmt, quality):
+    filename = f"{name}.{FORMAT_EXTENSIONS[fmt]}"
+    path = os.path.join(output_dir, filename)
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    options = {"quality": quality}
+    if fmt == "jpeg":
+        options.update(optimize=True, progressive=True)
+    elif fmt == "webp":
+        options.update(method=4)
+    image.save(path, format=fmt.upper(), **options)
+
+    return {
+        "name": name,
+        "format": fmt,
+        "filename": filename,
+        "width": image.width,
+        "height": image.height,
+        "size": os.path.getsize(path),
+    }
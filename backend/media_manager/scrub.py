@@ -0,0 +1,285 @@
+"""
+Storage integrity scrubbing: files on disk against the rows that use them.
+
+Files leak when post_delete never fires (queryset deletes, cascades, crashed
+workers) and rows dangle after files are removed by hand. The storage tree
+is walked with os.scandir, subtrees in parallel threads, and yielded in
+sorted order; Media and MediaRendition file names are streamed from the
+database in the same order. One merge pass over both streams finds
+
+- orphans: files no row refers to,
+- dangling rows: rows whose file is missing,
+- size mismatches: rows whose `size` differs from the file on disk,
+
+while holding only the subtrees being scanned and one chunk of rows.
+
+Other apps keep their uploads under the same MEDIA_ROOT (profile pictures,
+post images), so only the trees media_manager writes are walked: blobs,
+sharded uploads and renditions. Media rows with legacy names elsewhere are
+checked one by one instead.
+"""
+import heapq
+import os
+import re
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Collate
+
+from media_manager import bulk
+from media_manager.deletion import STORAGES, enqueue_deletions
+from media_manager.models import Media, MediaBlob, MediaRendition, StorageDeletion
+from media_manager.processing import RENDITION_DIR
+from media_manager.quotas import add_usage
+from media_manager.search.indexing import index_media
+from media_manager.signals import bulk_operation
+from media_manager.storage import BLOB_PREFIX, SHARD_PREFIX, is_blob_name, is_sharded_name
+
+ORPHAN = "orphan"
+DANGLING = "dangling"
+MISMATCH = "mismatch"
+
+StoredFile = namedtuple("StoredFile", "name size modified storage")
+FileRow = namedtuple("FileRow", "name storage pk size owner")
+
+# Directories above this depth are listed inline; each directory at it
+# (media/ab, cas/ab, renditions/<id>) is scanned by a worker thread
+SPLIT_DEPTH = 2
+# Uploads in flight are written here before being renamed into place
+SKIP_DIRS = {f"{BLOB_PREFIX}/.incoming"}
+# Directories that are, or lead to, trees media_manager owns
+OWNED_DIR_RE = re.compile(
+    rf"^(({BLOB_PREFIX}|{RENDITION_DIR})(/.*)?|{SHARD_PREFIX}(/[0-9a-f]{{2}}(/[0-9a-f]{{2}})?)?)$"
+)
+# Byte-wise collations, so the database sorts names the way Python does
+BINARY_COLLATIONS = {"postgresql": "C", "mysql": "utf8mb4_bin"}
+
+
+def is_owned_name(name):
+    """Storage names media_manager creates; other files under the root belong to other apps."""
+    return is_blob_name(name) or is_sharded_name(name) or name.startswith(f"{RENDITION_DIR}/")
+
+
+def _join(relative, name):
+    return f"{relative}/{name}" if relative else name
+
+
+def _sort_key(entry):
+    # Directory "a" sorts as "a/", so "a-b" < "a/..." < "a0" as whole paths do
+    return entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name
+
+
+def _listing(root, relative):
+    try:
+        with os.scandir(os.path.join(root, relative)) as entries:
+            return sorted(entries, key=_sort_key)
+    except FileNotFoundError:
+        # Removed while the walk was running
+        return []
+
+
+def _stored_file(name, entry, storage):
+    stat = entry.stat(follow_symlinks=False)
+    return StoredFile(name, stat.st_size, stat.st_mtime, storage)
+
+
+def _entries(root, relative, storage, depth=None):
+    """
+    Sorted files below `relative`; with `depth`, directories at SPLIT_DEPTH
+    are yielded by name instead of being entered.
+    """
+    for entry in _listing(root, relative):
+        name = _join(relative, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            if name in SKIP_DIRS or not OWNED_DIR_RE.match(name):
+                continue
+            if depth is not None and depth + 1 >= SPLIT_DEPTH:
+                yield name
+            else:
+                yield from _entries(root, name, storage, None if depth is None else depth + 1)
+        elif entry.is_file(follow_symlinks=False) and is_owned_name(name):
+            yield _stored_file(name, entry, storage)
+
+
+def _scan(root, unit, storage):
+    if isinstance(unit, StoredFile):
+        return [unit]
+    return list(_entries(root, unit, storage))
+
+
+def walk_storage(root, storage="media", workers=8):
+    """
+    Yield a StoredFile for every media_manager file under `root`, in name order.
+
+    Subtrees are scanned concurrently and consumed in order, with at most a
+    few per worker in flight.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for unit in _entries(root, "", storage, depth=0):
+            pending.append(executor.submit(_scan, root, unit, storage))
+            if len(pending) > workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _by_name(queryset):
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    return queryset.order_by(Collate("file", collation) if collation else "file", "pk")
+
+
+def file_rows(storage, chunk_size=2000):
+    """Yield a FileRow for every row stored in `storage`, in name order."""
+    if storage == "media":
+        rows = _by_name(Media.all_objects.exclude(file="")).values_list("file", "pk", "size", "uploaded_by_id")
+        for name, pk, size, owner in rows.iterator(chunk_size=chunk_size):
+            yield FileRow(name, storage, pk, size, owner)
+        return
+    # Renditions do not count towards quotas, so they need no owner
+    rows = _by_name(MediaRendition.objects.exclude(file="")).values_list("file", "pk", "size")
+    for name, pk, size in rows.iterator(chunk_size=chunk_size):
+        yield FileRow(name, storage, pk, size, None)
+
+
+def storage_roots():
+    """{directory: [storage keys]} of the filesystem storages to scrub."""
+    roots = {}
+    for key, storage in STORAGES.items():
+        if isinstance(storage, FileSystemStorage):
+            roots.setdefault(os.path.abspath(storage.location), []).append(key)
+    return roots
+
+
+def _ascending(items, what):
+    previous = None
+    for item in items:
+        if previous is not None and item.name < previous:
+            raise ValueError(f"{what} are not in name order: {item.name!r} after {previous!r}")
+        previous = item.name
+        yield item
+
+
+def diff(files, rows):
+    """
+    Merge name-ordered StoredFiles and FileRows into (ORPHAN, file),
+    (DANGLING, row) and (MISMATCH, (row, file)) findings.
+    """
+    files = _ascending(files, "Files")
+    rows = _ascending(rows, "Rows")
+    file, row = next(files, None), next(rows, None)
+    while file is not None or row is not None:
+        if row is None or (file is not None and file.name < row.name):
+            yield ORPHAN, file
+            file = next(files, None)
+        elif file is None or row.name < file.name:
+            yield DANGLING, row
+            row = next(rows, None)
+        else:
+            # Deduplicated blobs are shared by several rows
+            while row is not None and row.name == file.name:
+                if row.size != file.size:
+                    yield MISMATCH, (row, file)
+                row = next(rows, None)
+            file = next(files, None)
+
+
+def _check_legacy(root, rows):
+    """Findings for rows outside the walked trees, by one stat() each."""
+    for row in rows:
+        if is_owned_name(row.name):
+            continue
+        try:
+            stat = os.stat(os.path.join(root, row.name))
+        except FileNotFoundError:
+            yield DANGLING, row
+            continue
+        if stat.st_size != row.size:
+            yield MISMATCH, (row, StoredFile(row.name, stat.st_size, stat.st_mtime, row.storage))
+
+
+def scan(workers=8, chunk_size=2000, min_age=3600):
+    """
+    Yield (kind, item) findings for every scrubbed storage.
+
+    Files younger than `min_age` seconds are skipped: they may belong to an
+    upload whose row is not saved yet.
+    """
+    cutoff = time.time() - min_age
+    for root, storages in storage_roots().items():
+        files = walk_storage(root, storages[0], workers)
+        rows = heapq.merge(*(file_rows(storage, chunk_size) for storage in storages))
+        for kind, item in diff(files, (row for row in rows if is_owned_name(row.name))):
+            if kind == ORPHAN and item.modified > cutoff:
+                continue
+            yield kind, item
+        # Renditions are always under RENDITION_DIR
+        if "media" in storages:
+            yield from _check_legacy(root, file_rows("media", chunk_size))
+
+
+def pending_orphans(files):
+    """
+    The `files` still unreferenced and not queued for deletion yet.
+
+    Checked again right before repairing, since the scan can take a while.
+    """
+    names = [file.name for file in files]
+    taken = set(Media.all_objects.filter(file__in=names).values_list("file", flat=True))
+    taken.update(MediaRendition.objects.filter(file__in=names).values_list("file", flat=True))
+    taken.update(StorageDeletion.objects.filter(name__in=names).values_list("name", flat=True))
+    return [file for file in files if file.name not in taken]
+
+
+def repair(findings, delete_dangling=False):
+    """
+    Fix one batch of findings. Returns a Counter of what was done.
+
+    Orphans go to the storage deletion queue (with leaked blob references),
+    sizes are corrected along with quota usage and the search index, and
+    dangling renditions are dropped. Dangling media rows are only deleted
+    with `delete_dangling`, since their metadata would be lost.
+    """
+    done = Counter()
+    orphans = pending_orphans([item for kind, item in findings if kind == ORPHAN])
+    dangling = [item for kind, item in findings if kind == DANGLING]
+    mismatches = [item for kind, item in findings if kind == MISMATCH]
+
+    with transaction.atomic():
+        if orphans:
+            MediaBlob.objects.filter(
+                name__in=[file.name for file in orphans if is_blob_name(file.name)]
+            ).exclude(Exists(Media.all_objects.filter(file=OuterRef("name")))).delete()
+            enqueue_deletions([(file.storage, file.name) for file in orphans])
+            done["orphans queued for deletion"] += len(orphans)
+
+        renditions = [row.pk for row in dangling if row.storage == "default"]
+        if renditions:
+            # The files are gone already; nothing to queue
+            with bulk_operation():
+                MediaRendition.objects.filter(pk__in=renditions).delete()
+            done["dangling renditions deleted"] += len(renditions)
+        media_ids = [row.pk for row in dangling if row.storage == "media"]
+        if media_ids and delete_dangling:
+            done["dangling media deleted"] += bulk.delete_media(media_ids)
+
+        media = {row.pk: (row, file) for row, file in mismatches if row.storage == "media"}
+        Media.all_objects.bulk_update(
+            [Media(pk=pk, size=file.size) for pk, (_, file) in media.items()], ["size"], batch_size=1000
+        )
+        usage = Counter()
+        for row, file in media.values():
+            usage[row.owner] += file.size - row.size
+        add_usage(usage)
+        MediaRendition.objects.bulk_update(
+            [MediaRendition(pk=row.pk, size=file.size) for row, file in mismatches if row.storage == "default"],
+            ["size"], batch_size=1000,
+        )
+        if media:
+            index_media(media)
+        done["sizes corrected"] += len(mismatches)
+    return done
@@ -0,0 +1,318 @@
+# media_manager/search/backends.py
+"""
+Pluggable search backends behind the search views.
+
+MEDIA_MANAGER_SEARCH_BACKEND serves queries. When it raises SearchUnavailable
+(Elasticsearch down, index missing) MEDIA_MANAGER_SEARCH_FALLBACK_BACKEND is
+tried next. Every backend returns the same page shape (search/results.py), so
+clients, and `manage.py benchmark_search`, see identical responses. Cursors
+and cached pages are tied to the backend that produced them: a cursor from
+one backend is refused by the other.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.module_loading import import_string
+
+from media_manager.models import Media
+from media_manager.search import cache as search_cache
+from media_manager.search import facets as search_facets
+from media_manager.search import results
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = "english"
+MAX_QUERY_TERMS = 10
+
+
+class SearchUnavailable(Exception):
+    """The backend cannot serve queries right now."""
+
+
+def _date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        parsed = parse_datetime(value)
+        parsed = parsed.date() if parsed else None
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value}")
+    return parsed
+
+
+# Range query params (<prefix>_from / <prefix>_to): (document field, model lookup, cast)
+RANGE_FILTERS = {
+    "date": ("created_at", "created_at__date", _date),
+    "size": ("file_size", "size", int),
+    "width": ("width", "width", int),
+    "height": ("height", "height", int),
+    "page_count": ("page_count", "page_count", int),
+    "captured_at": ("captured_at", "captured_at__date", _date),
+}
+
+
+def parse_filters(params):
+    """
+    Filters from query params, validated once for every backend:
+    {"file_type", "orientation", "tags": [...], "<prefix>": {"gte", "lte"}}.
+
+    Raises ValueError on malformed numbers or dates.
+    """
+    filters = {}
+    for key in ("file_type", "orientation"):
+        if params.get(key):
+            filters[key] = params[key]
+    for prefix, (_, _, cast) in RANGE_FILTERS.items():
+        bounds = {}
+        for suffix, operator in (("from", "gte"), ("to", "lte")):
+            value = params.get(f"{prefix}_{suffix}")
+            if not value:
+                continue
+            try:
+                bounds[operator] = cast(value)
+            except ValueError:
+                raise ValueError(f"Invalid value for {prefix}_{suffix}: {value}") from None
+        if bounds:
+            filters[prefix] = bounds
+    tags = params.getlist("tags") if hasattr(params, "getlist") else params.get("tags")
+    if tags:
+        filters["tags"] = list(tags)
+    return filters
+
+
+def search_vector():
+    """
+    Weighted full-text vector over the searchable Media columns.
+
+    Migration 0014 builds the GIN index on this exact expression; keep them
+    in sync or Postgres stops using the index.
+    """
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("alt_text", "original_filename", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+class SearchBackend:
+    """Interface: one page of `user`'s media matching `query` and `filters`."""
+
+    name = None
+
+    def search(self, user, query="", filters=None, source_fields=results.SOURCE_FIELDS,
+               hydrated_fields=(), size=results.DEFAULT_PAGE_SIZE, cursor=None, context=None,
+               facets=False):
+        """
+        Return {"count", "results", "next_cursor"}, plus "facets" when
+        `facets` is set (see search/facets.py).
+
+        Raises ValueError for a cursor the backend cannot read and
+        SearchUnavailable when the backend is down.
+        """
+        raise NotImplementedError
+
+    def encode_cursor(self, sort_values):
+        """Cursor for the page after `sort_values`, naming this backend."""
+        return results.encode_cursor([self.name, *sort_values])
+
+    def decode_cursor(self, cursor):
+        """Sort values of `cursor`; raises ValueError for tampered cursors or another backend's."""
+        name, *sort_values = results.decode_cursor(cursor)
+        if name != self.name:
+            raise ValueError("Cursor is from another search backend; start again from the first page")
+        if not sort_values:
+            raise ValueError("Invalid cursor")
+        return sort_values
+
+
+class ElasticsearchBackend(SearchBackend):
+    """Relevance search on MediaDocument, rendered from `_source`."""
+
+    name = "elasticsearch"
+
+    def build(self, user, query="", filters=None):
+        from elasticsearch.dsl import Q as ES_Q
+        from media_manager.search.documents import MediaDocument
+
+        filters = filters or {}
+        search = MediaDocument.search().filter("term", uploaded_by_id=user.id)
+        if query:
+            search = search.query("multi_match", query=query, fields=[
+                "title", "description", "alt_text", "file_name"
+            ])
+        for key in ("file_type", "orientation"):
+            if key in filters:
+                search = search.filter("term", **{key: filters[key]})
+        for prefix, (field, _, _) in RANGE_FILTERS.items():
+            if prefix in filters:
+                search = search.filter("range", **{field: filters[prefix]})
+        for tag in filters.get("tags", ()):
+            search = search.filter("nested", path="tags", query=ES_Q("term", **{"tags.name": tag}))
+        return search
+
+    def search(self, user, query="", filters=None, source_fields=results.SOURCE_FIELDS,
+               hydrated_fields=(), size=results.DEFAULT_PAGE_SIZE, cursor=None, context=None,
+               facets=False):
+        from elasticsearch import ApiError, TransportError
+
+        search = results.paginate(
+            self.build(user, query, filters), source_fields, size=size, cursor=cursor, scored=bool(query),
+            decode=self.decode_cursor,
+        )
+        # Facets come from the same request, unless cached for this query
+        facet_counts = search_facets.get_cached(user, self.name, query, filters) if facets else None
+        if facets and facet_counts is None:
+            search_facets.add_aggregations(search)
+        try:
+            response = search.execute()
+        except (ApiError, TransportError) as exc:
+            raise SearchUnavailable(str(exc)) from exc
+
+        page = results.render_page(
+            response, source_fields, hydrated_fields, user, size, context, encode=self.encode_cursor,
+        )
+        if facets:
+            if facet_counts is None:
+                facet_counts = search_facets.from_aggregations(response.aggregations)
+                search_facets.set_cached(user, self.name, query, filters, facet_counts)
+            page["facets"] = facet_counts
+        return page
+
+
+class DatabaseBackend(SearchBackend):
+    """
+    Search straight from the Media table.
+
+    Postgres ranks with a weighted tsvector (GIN indexed, see search_vector());
+    other databases, e.g. SQLite in development, fall back to case-insensitive
+    substring matching weighted the same way. Pages use offset cursors.
+    """
+
+    name = "database"
+
+    # icontains fallback: weight of a term matching each column
+    FIELD_WEIGHTS = (("title", 4), ("alt_text", 2), ("original_filename", 2), ("description", 1))
+
+    def filter(self, queryset, filters):
+        for key in ("file_type", "orientation"):
+            if key in filters:
+                queryset = queryset.filter(**{key: filters[key]})
+        for prefix, (_, lookup, _) in RANGE_FILTERS.items():
+            for operator, value in filters.get(prefix, {}).items():
+                queryset = queryset.filter(**{f"{lookup}__{operator}": value})
+        for tag in filters.get("tags", ()):
+            queryset = queryset.filter(Exists(
+                Media.tags.through.objects.filter(media_id=OuterRef("pk"), tag__name=tag)
+            ))
+        return queryset
+
+    def match(self, queryset, query):
+        """Restrict to rows matching `query` and annotate a `rank`."""
+        if connections[queryset.db].vendor == "postgresql":
+            search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+            return queryset.annotate(
+                search=search_vector(),
+                rank=SearchRank(F("search"), search_query),
+            ).filter(search=search_query)
+
+        rank = Value(0)
+        for term in query.split()[:MAX_QUERY_TERMS]:
+            matches = Q()
+            for field, weight in self.FIELD_WEIGHTS:
+                lookup = {f"{field}__icontains": term}
+                matches |= Q(**lookup)
+                rank = rank + Case(When(**lookup, then=Value(weight)), default=Value(0))
+            queryset = queryset.filter(matches)
+        return queryset.annotate(rank=rank)
+
+    def decode_offset(self, cursor):
+        if not cursor:
+            return 0
+        values = self.decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+            raise ValueError("Invalid cursor")
+        return values[0]
+
+    def search(self, user, query="", filters=None, source_fields=results.SOURCE_FIELDS,
+               hydrated_fields=(), size=results.DEFAULT_PAGE_SIZE, cursor=None, context=None,
+               facets=False):
+        from media_manager.search.documents import MediaDocument, attach_folder_paths
+
+        offset = self.decode_offset(cursor)
+        queryset = self.filter(Media.objects.filter(uploaded_by=user), filters or {})
+        ordering = ["-created_at", "-id"]
+        if query:
+            queryset = self.match(queryset, query)
+            ordering.insert(0, "-rank")
+
+        total = queryset.count()
+        media = list(
+            queryset.select_related("folder", "uploaded_by")
+            .prefetch_related("tags", "renditions")
+            .order_by(*ordering)[offset:offset + size]
+        )
+        attach_folder_paths(media)
+
+        # Same shape as the Elasticsearch `_source`
+        document = MediaDocument()
+        rows = []
+        for instance in media:
+            source = document.prepare(instance)
+            rows.append({field: source.get(field) for field in source_fields})
+        if hydrated_fields:
+            rows = results.hydrate(rows, {instance.pk: instance for instance in media}, hydrated_fields, context)
+
+        next_cursor = None
+        if offset + size < total:
+            next_cursor = self.encode_cursor([offset + size])
+        page = {"count": total, "results": rows, "next_cursor": next_cursor}
+        if facets:
+            facet_counts = search_facets.get_cached(user, self.name, query, filters)
+            if facet_counts is None:
+                facet_counts = search_facets.from_queryset(queryset)
+                search_facets.set_cached(user, self.name, query, filters, facet_counts)
+            page["facets"] = facet_counts
+        return page
+
+
+def get_backends():
+    """Configured backend followed by the fallback, if any."""
+    paths = [
+        getattr(settings, "MEDIA_MANAGER_SEARCH_BACKEND", "media_manager.search.backends.ElasticsearchBackend"),
+        getattr(settings, "MEDIA_MANAGER_SEARCH_FALLBACK_BACKEND", "media_manager.search.backends.DatabaseBackend"),
+    ]
+    return [import_string(path)() for path in dict.fromkeys(path for path in paths if path)]
+
+
+def search(user, query="", filters=None, **options):
+    """
+    Run the search on the first backend that is available.
+
+    Pages are cached per user, backend and parameters (search/cache.py)
+    until the user's media, tags or folders change, so pages of the fallback
+    are not served once the primary backend is back. Returns (backend name,
+    page); raises SearchUnavailable if no backend is available.
+    """
+    params = {"q": query, "filters": filters or {}, **options}
+    request = (options.get("context") or {}).get("request")
+    # Hydrated file URLs are absolute, so they depend on the host
+    params["context"] = request.build_absolute_uri("/") if request else None
+
+    error = None
+    for backend in get_backends():
+        backend_params = {**params, "backend": backend.name}
+        cached = search_cache.get_cached("results", user.id, backend_params)
+        if cached is not None:
+            return cached
+        try:
+            result = backend.name, backend.search(user, query, filters, **options)
+        except SearchUnavailable as exc:
+            logger.warning("Search backend %s unavailable: %s", backend.name, exc)
+            error = exc
+            continue
+        search_cache.set_cached("results", user.id, backend_params, result)
+        return result
+    raise SearchUnavailable("No search backend available") from error
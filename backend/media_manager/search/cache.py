@@ -0,0 +1,238 @@
+# media_manager/search/cache.py
+"""
+Per-user cache for search results, facets and suggestions.
+
+Two tiers: a small in-process LRU in front of the shared cache
+(MEDIA_MANAGER_SEARCH_CACHE_ALIAS, Redis in production). Keys embed a
+per-user generation number kept in the shared cache; it is bumped when the
+user's Media, Tag or Folder rows change (media_manager/signals.py, bulk.py)
+and again when the search queue writes their documents (search/queue.py).
+Every cached entry of that user then becomes unreachable in both tiers at
+once, and nothing has to be deleted by pattern. Generations start from the
+clock, so an evicted counter never resurrects entries from before.
+
+Each process remembers generations for MEDIA_MANAGER_SEARCH_CACHE_GENERATION_TTL
+seconds and counts hits in memory, so a local hit costs no round trip;
+bumps from other processes show up within that delay.
+
+If the shared cache is unreachable, lookups miss and nothing is stored:
+search keeps working, uncached.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES = ("results", "facets", "suggest")
+OUTCOMES = ("local_hits", "shared_hits", "misses")
+STATS_FLUSH_INTERVAL = 10  # seconds between writes of a process's hit counters
+
+
+class LocalLRU:
+    """Thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = None
+_local_generations = None
+_stats = Counter()
+_stats_lock = threading.Lock()
+_stats_flushed_at = 0.0
+
+
+def local_cache():
+    global _local
+    if _local is None:
+        _local = LocalLRU(getattr(settings, "MEDIA_MANAGER_SEARCH_CACHE_LOCAL_ENTRIES", 500))
+    return _local
+
+
+def local_generations():
+    global _local_generations
+    if _local_generations is None:
+        _local_generations = LocalLRU(getattr(settings, "MEDIA_MANAGER_SEARCH_CACHE_LOCAL_ENTRIES", 500))
+    return _local_generations
+
+
+def get_generation_ttl():
+    return getattr(settings, "MEDIA_MANAGER_SEARCH_CACHE_GENERATION_TTL", 1)
+
+
+def shared_cache():
+    return caches[getattr(settings, "MEDIA_MANAGER_SEARCH_CACHE_ALIAS", "default")]
+
+
+def _generation_key(user_id):
+    return f"media_manager:search_generation:{user_id}"
+
+
+def _stats_key(namespace, outcome):
+    return f"media_manager:search_cache_stats:{namespace}:{outcome}"
+
+
+def get_generation(user_id):
+    """Current generation of `user_id`'s search data."""
+    key = _generation_key(user_id)
+    generation = local_generations().get(key)
+    if generation is not None:
+        return generation
+    shared = shared_cache()
+    generation = shared.get(key)
+    if generation is None:
+        shared.add(key, time.time_ns(), None)
+        generation = shared.get(key)
+    local_generations().set(key, generation, get_generation_ttl())
+    return generation
+
+
+def bump_generations(user_ids):
+    """Invalidate everything cached for `user_ids`."""
+    shared = shared_cache()
+    for user_id in set(user_ids) - {None}:
+        key = _generation_key(user_id)
+        try:
+            shared.incr(key)
+        except ValueError:
+            shared.set(key, time.time_ns(), None)
+        except Exception:
+            # The cache is down: lookups miss until it is back
+            logger.exception("Could not invalidate search cache of user %s", user_id)
+        local_generations().delete(key)
+
+
+def invalidate_on_commit(user_ids):
+    """bump_generations() once the current transaction commits."""
+    user_ids = set(user_ids) - {None}
+    if user_ids:
+        transaction.on_commit(lambda: bump_generations(user_ids))
+
+
+def cache_key(namespace, user_id, params):
+    """Key for `params` (JSON-serializable, dates allowed) in `user_id`'s current generation."""
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"media_manager:{namespace}:{user_id}:{get_generation(user_id)}:{digest}"
+
+
+def flush_stats():
+    """Add this process's hit counts to the shared totals; best effort."""
+    global _stats_flushed_at
+    with _stats_lock:
+        counts = dict(_stats)
+        _stats.clear()
+        _stats_flushed_at = time.monotonic()
+    shared = shared_cache()
+    try:
+        for (namespace, outcome), count in counts.items():
+            key = _stats_key(namespace, outcome)
+            try:
+                shared.incr(key, count)
+            except ValueError:
+                if not shared.add(key, count, None):
+                    shared.incr(key, count)
+    except Exception:
+        logger.warning("Could not record search cache stats", exc_info=True)
+
+
+def _count(namespace, outcome):
+    with _stats_lock:
+        _stats[(namespace, outcome)] += 1
+        due = time.monotonic() - _stats_flushed_at >= STATS_FLUSH_INTERVAL
+    if due:
+        flush_stats()
+
+
+def get_cached(namespace, user_id, params):
+    """Cached value or None; callers must not mutate what they get back."""
+    try:
+        key = cache_key(namespace, user_id, params)
+        value = local_cache().get(key)
+        entry = shared_cache().get(key) if value is None else None
+    except Exception:
+        logger.exception("Search cache lookup failed")
+        return None
+    if value is not None:
+        _count(namespace, "local_hits")
+        return value
+    if entry is None:
+        _count(namespace, "misses")
+        return None
+    _count(namespace, "shared_hits")
+    # Keep it locally only for what is left of the shared entry's lifetime
+    expires_at, value = entry
+    local_cache().set(key, value, expires_at - time.time())
+    return value
+
+
+def set_cached(namespace, user_id, params, value, timeout=None):
+    if timeout is None:
+        timeout = getattr(settings, "MEDIA_MANAGER_SEARCH_CACHE_TTL", 300)
+    try:
+        key = cache_key(namespace, user_id, params)
+        shared_cache().set(key, (time.time() + timeout, value), timeout)
+    except Exception:
+        logger.exception("Search cache store failed")
+        return
+    local_cache().set(key, value, timeout)
+
+
+def cache_stats():
+    """Hit counters and hit rate per namespace, summed over all processes."""
+    flush_stats()
+    counts = shared_cache().get_many(
+        [_stats_key(namespace, outcome) for namespace in NAMESPACES for outcome in OUTCOMES]
+    )
+    stats = {}
+    for namespace in NAMESPACES:
+        row = {outcome: counts.get(_stats_key(namespace, outcome), 0) for outcome in OUTCOMES}
+        lookups = sum(row.values())
+        row["hit_rate"] = round((row["local_hits"] + row["shared_hits"]) / lookups, 4) if lookups else None
+        stats[namespace] = row
+    return stats
+
+
+def clear():
+    """Drop the local tier and every user's entries (tests, manual flushes)."""
+    local_cache().clear()
+    local_generations().clear()
+    with _stats_lock:
+        _stats.clear()
+    shared_cache().clear()
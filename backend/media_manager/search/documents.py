@@ -1,7 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_init
 from django_elasticsearch_dsl import Document, fields, Index
 from django_elasticsearch_dsl.registries import registry
+from elasticsearch.dsl import analyzer, token_filter
 from media_manager.models import Media, Tag, Folder
 
+User = get_user_model()
+
+# Fields of related models that are copied into MediaDocument; saving a
+# related object only reindexes its media when one of these changed.
+INDEXED_RELATED_FIELDS = {
+    Tag: ("name",),
+    Folder: ("name", "parent_id"),
+    User: ("username",),
+}
+PREPARE_CHUNK_SIZE = 500
+
+
+def _remember_indexed_values(sender, instance, **kwargs):
+    instance._indexed_values = tuple(
+        instance.__dict__.get(field) for field in INDEXED_RELATED_FIELDS[sender]
+    )
+
+
+for _model in INDEXED_RELATED_FIELDS:
+    post_init.connect(_remember_indexed_values, sender=_model, dispatch_uid=f"media_document_{_model.__name__}")
+
+
+def indexed_values_changed(instance):
+    """Whether an indexed field changed since load or the last check."""
+    current = tuple(getattr(instance, field) for field in INDEXED_RELATED_FIELDS[type(instance)])
+    changed = current != getattr(instance, "_indexed_values", None)
+    instance._indexed_values = current
+    return changed
+
+
+def attach_folder_paths(media):
+    """Precompute folder paths for a list of Media (see prepare_folder_path)."""
+    paths = Folder.get_full_paths({instance.folder_id for instance in media if instance.folder_id})
+    for instance in media:
+        instance._folder_path = paths.get(instance.folder_id)
+
+# Analyzers are objects so their definitions are shipped with the mapping
+autocomplete = analyzer("autocomplete", tokenizer="standard", filter=["lowercase", "stop"])
+
+# Search-as-you-type: index every prefix of every word (up to 20 chars) so a
+# suggest query is a plain term lookup instead of a prefix/fuzzy scan
+suggest_edge_ngram = token_filter("suggest_edge_ngram", type="edge_ngram", min_gram=1, max_gram=20)
+suggest_index_analyzer = analyzer(
+    "suggest_index",
+    tokenizer="standard",
+    filter=["lowercase", "asciifolding", suggest_edge_ngram],
+)
+suggest_search_analyzer = analyzer(
+    "suggest_search",
+    tokenizer="standard",
+    filter=["lowercase", "asciifolding"],
+)
+
 # Create custom index with settings
 media_index = Index("media", using="default")
 media_index.settings(
@@ -29,23 +85,34 @@ class MediaDocument(Document):
     
     # Basic fields
     title = fields.TextField(
-        analyzer="autocomplete",
+        analyzer=autocomplete,
         fields={"keyword": fields.KeywordField()}
     )
     description = fields.TextField(analyzer="standard")
     alt_text = fields.TextField()
     file_type = fields.KeywordField()
+    mime_type = fields.KeywordField()
     
     # File info - NOTE: 'size' is handled by Django class, use file_size for custom mapping
     file_name = fields.TextField(
-        attr="file.name",
+        attr="get_filename",
         analyzer="standard",
         fields={"keyword": fields.KeywordField()}
     )
     file_size = fields.IntegerField(attr="size")
     file_extension = fields.KeywordField(attr="get_file_extension")
+
+    # Extracted metadata
+    width = fields.IntegerField()
+    height = fields.IntegerField()
+    orientation = fields.KeywordField()
+    captured_at = fields.DateField()
+    camera_make = fields.KeywordField()
+    camera_model = fields.KeywordField()
+    page_count = fields.IntegerField()
     
     # Relationships
+    folder_id = fields.IntegerField(attr="folder_id")
     folder_name = fields.KeywordField(attr="folder.name")
     folder_path = fields.TextField(attr="folder.get_full_path")
     tags = fields.NestedField(
@@ -56,6 +123,12 @@ class MediaDocument(Document):
     )
     uploaded_by_username = fields.KeywordField(attr="uploaded_by.username")
     uploaded_by_id = fields.IntegerField(attr="uploaded_by.id")
+
+    # Autocomplete over title, tag names and folder path (search/suggest.py)
+    suggest = fields.TextField(
+        analyzer=suggest_index_analyzer,
+        search_analyzer=suggest_search_analyzer,
+    )
     
     # Timestamps
     created_at = fields.DateField()
@@ -75,15 +148,69 @@ class MediaDocument(Document):
         fields = [
             "id",
         ]
+        related_models = [Tag, Folder, User]
+
+    def get_queryset(self):
+        """Media with everything the document needs loaded in bulk."""
+        return (
+            super().get_queryset()
+            .select_related("folder", "uploaded_by")
+            .prefetch_related("tags")
+        )
+
+    def get_instances_from_related(self, related_instance):
+        """
+        Media whose document embeds `related_instance`.
+
+        Saves only cascade when an indexed field (tag name, folder name or
+        parent, username) changed; deletes always do. Folder changes cover
+        the whole subtree because descendants embed the path.
+        """
+        deleting = self._related_instance_to_ignore is related_instance
+        if not deleting and not indexed_values_changed(related_instance):
+            return None
+        if isinstance(related_instance, Tag):
+            return related_instance.media.all()
+        if isinstance(related_instance, Folder):
+            return Media.objects.filter(folder_id__in=related_instance.get_descendant_ids())
+        if isinstance(related_instance, User):
+            return related_instance.uploaded_media.all()
+        return None
+
+    def _get_actions(self, object_list, action):
+        """Resolve folder paths per chunk instead of per document."""
+        if action == "delete":
+            yield from super()._get_actions(object_list, action)
+            return
+        chunk = []
+        for instance in object_list:
+            chunk.append(instance)
+            if len(chunk) >= PREPARE_CHUNK_SIZE:
+                attach_folder_paths(chunk)
+                yield from super()._get_actions(chunk, action)
+                chunk = []
+        if chunk:
+            attach_folder_paths(chunk)
+            yield from super()._get_actions(chunk, action)
 
     def prepare_tags(self, instance):
         """Prepare tags for nested field."""
         return [{"id": tag.id, "name": tag.name} for tag in instance.tags.all()]
 
+    def prepare_suggest(self, instance):
+        """Phrases the suggest endpoint matches on."""
+        phrases = [instance.title or instance.get_filename()]
+        phrases.extend(tag.name for tag in instance.tags.all())
+        if instance.folder_id:
+            phrases.append(self.prepare_folder_path(instance))
+        return [phrase for phrase in phrases if phrase]
+
     def prepare_file_extension(self, instance):
         """Prepare file extension."""
         return instance.get_file_extension()
 
     def prepare_folder_path(self, instance):
-        """Prepare full folder path."""
-        return instance.folder.get_full_path() if instance.folder else "root"
\ No newline at end of file
+        """Prepare full folder path (precomputed per chunk when bulk reindexing)."""
+        if not instance.folder_id:
+            return "root"
+        return getattr(instance, "_folder_path", None) or instance.folder.get_full_path()
\ No newline at end of file
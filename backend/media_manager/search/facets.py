@@ -0,0 +1,134 @@
+# media_manager/search/facets.py
+"""
+Facet counts for advanced search.
+
+Elasticsearch computes them as aggregations in the same request as the hits;
+the database backend groups the filtered queryset. Both produce
+{facet: [{"value", "count"[, "label"]}, ...]}, cached per user, backend and
+query in search/cache.py until the user's documents change.
+"""
+from collections import Counter
+from pathlib import Path
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+from media_manager.models import Folder, Media
+from media_manager.search import cache as search_cache
+
+TERMS_SIZE = 20
+TAGS_SIZE = 50
+MB = 1024 * 1024
+# (key, from, to) in bytes; `to` is exclusive
+SIZE_BUCKETS = (
+    ("<1MB", None, MB),
+    ("1-10MB", MB, 10 * MB),
+    ("10-100MB", 10 * MB, 100 * MB),
+    (">100MB", 100 * MB, None),
+)
+
+
+def cache_params(backend, query, filters):
+    # Backends count differently (e.g. analyzed vs substring matches)
+    return {"backend": backend, "q": query or "", "filters": filters or {}}
+
+
+def get_cached(user, backend, query, filters):
+    return search_cache.get_cached("facets", user.id, cache_params(backend, query, filters))
+
+
+def set_cached(user, backend, query, filters, facets):
+    search_cache.set_cached("facets", user.id, cache_params(backend, query, filters), facets)
+
+
+def add_aggregations(search):
+    """Add the facet aggregations to `search` (in place) and return it."""
+    search.aggs.bucket("file_type", "terms", field="file_type", size=TERMS_SIZE)
+    search.aggs.bucket("extension", "terms", field="file_extension", size=TERMS_SIZE)
+    search.aggs.bucket("folder", "terms", field="folder_id", size=TERMS_SIZE)
+    search.aggs.bucket("tags", "nested", path="tags").bucket("names", "terms", field="tags.name", size=TAGS_SIZE)
+    search.aggs.bucket("size", "range", field="file_size", ranges=[
+        {"key": key, **({"from": start} if start is not None else {}), **({"to": end} if end is not None else {})}
+        for key, start, end in SIZE_BUCKETS
+    ])
+    search.aggs.bucket(
+        "created_at", "date_histogram", field="created_at", calendar_interval="month", format="yyyy-MM", min_doc_count=1,
+    )
+    return search
+
+
+def _folder_facet(counts):
+    """[(folder id, count)] -> buckets labelled with the full folder path."""
+    paths = Folder.get_full_paths({folder_id for folder_id, _ in counts})
+    return [
+        {"value": folder_id, "label": paths.get(folder_id, ""), "count": count}
+        for folder_id, count in counts
+    ]
+
+
+def from_aggregations(aggregations):
+    """Facets from an Elasticsearch response's aggregations."""
+    def terms(agg):
+        return [{"value": bucket.key, "count": bucket.doc_count} for bucket in agg.buckets]
+
+    return {
+        "file_type": terms(aggregations.file_type),
+        "extension": terms(aggregations.extension),
+        "folder": _folder_facet([(bucket.key, bucket.doc_count) for bucket in aggregations.folder.buckets]),
+        "tags": terms(aggregations.tags.names),
+        "size": [{"value": bucket.key, "count": bucket.doc_count} for bucket in aggregations.size.buckets],
+        "created_at": [
+            {"value": bucket.key_as_string, "count": bucket.doc_count}
+            for bucket in aggregations.created_at.buckets
+        ],
+    }
+
+
+def from_queryset(queryset):
+    """Facets of a filtered Media queryset (database backend)."""
+    queryset = queryset.order_by()
+
+    def grouped(field):
+        return [
+            {"value": row[field], "count": row["count"]}
+            for row in queryset.values(field).annotate(count=Count("id")).order_by("-count", field)[:TERMS_SIZE]
+        ]
+
+    folders = (
+        queryset.exclude(folder_id=None).values("folder_id")
+        .annotate(count=Count("id")).order_by("-count", "folder_id")[:TERMS_SIZE]
+    )
+    tags = (
+        Media.tags.through.objects.filter(media_id__in=queryset.values("pk"))
+        .values("tag__name").annotate(count=Count("media_id", distinct=True))
+        .order_by("-count", "tag__name")[:TAGS_SIZE]
+    )
+    sizes = queryset.aggregate(**{
+        f"size_{position}": Count("id", filter=Q(
+            **({"size__gte": start} if start is not None else {}),
+            **({"size__lt": end} if end is not None else {}),
+        ))
+        for position, (_, start, end) in enumerate(SIZE_BUCKETS)
+    })
+    months = (
+        queryset.annotate(month=TruncMonth("created_at")).values("month")
+        .annotate(count=Count("id")).order_by("month")
+    )
+    # The extension lives in the file name; count it from names only
+    extensions = Counter(
+        Path(name).suffix.lower()
+        for name in queryset.values_list("file", flat=True).iterator()
+    )
+    extensions.pop("", None)
+
+    return {
+        "file_type": grouped("file_type"),
+        "extension": [{"value": value, "count": count} for value, count in extensions.most_common(TERMS_SIZE)],
+        "folder": _folder_facet([(row["folder_id"], row["count"]) for row in folders]),
+        "tags": [{"value": row["tag__name"], "count": row["count"]} for row in tags],
+        "size": [
+            {"value": key, "count": sizes[f"size_{position}"]}
+            for position, (key, _, _) in enumerate(SIZE_BUCKETS)
+        ],
+        "created_at": [{"value": row["month"].strftime("%Y-%m"), "count": row["count"]} for row in months],
+    }
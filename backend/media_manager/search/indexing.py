@@ -0,0 +1,30 @@
+# media_manager/search/indexing.py
+"""
+Batched Elasticsearch updates for code paths that bypass model signals
+(bulk_create, queryset.update, set-based deletes).
+
+Both helpers only queue the change (media_manager/search/queue.py); the
+search queue worker sends them with the bulk API.
+"""
+from media_manager.models import Media
+from media_manager.search.cache import invalidate_on_commit
+from media_manager.search.queue import enqueue
+
+
+def index_media(media_ids):
+    """Queue (re-)indexing of the given Media rows and drop their owners' cached searches."""
+    media_ids = list(media_ids)
+    enqueue(Media, media_ids, "index")
+    invalidate_on_commit(
+        Media.objects.filter(pk__in=media_ids).values_list("uploaded_by_id", flat=True).distinct()
+    )
+
+
+def delete_media_documents(media_ids):
+    """
+    Queue removal of the given Media ids from the index.
+
+    The rows are usually gone by now; callers invalidate the owners' cached
+    searches themselves (see bulk.delete_media).
+    """
+    enqueue(Media, media_ids, "delete")
@@ -0,0 +1,179 @@
+# media_manager/search/queue.py
+"""
+Durable queue of pending Elasticsearch changes.
+
+Changes are recorded as SearchIndexQueue rows once the surrounding
+transaction commits; repeated changes to the same object collapse into one
+row. `manage.py process_search_queue` flushes the queue with one bulk
+request per batch, so requests never wait on Elasticsearch. Entries whose
+bulk item failed stay queued and are retried with exponential backoff.
+While an index rebuild runs, sent entries it tracks are kept (flushed_at)
+for it to replay into the new index.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django_elasticsearch_dsl.apps import DEDConfig
+from django_elasticsearch_dsl.registries import registry
+
+from media_manager.models import Media, SearchIndexQueue, SearchIndexRebuild
+from media_manager.search import cache as search_cache
+
+logger = logging.getLogger(__name__)
+
+DELETE_CHUNK_SIZE = 200
+MAX_BACKOFF = timedelta(hours=1)
+
+
+def enqueue(model, object_ids, op="index"):
+    """Queue `op` for the given primary keys of `model` after commit."""
+    if not DEDConfig.autosync_enabled():
+        return
+    label = model._meta.label_lower
+    object_ids = {str(pk) for pk in object_ids}
+    if not object_ids:
+        return
+
+    def write():
+        now = timezone.now()
+        SearchIndexQueue.objects.bulk_create(
+            [
+                SearchIndexQueue(
+                    model=label, object_id=pk, op=op, enqueued_at=now, updated_at=now, next_attempt_at=now,
+                )
+                for pk in sorted(object_ids)
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["model", "object_id"],
+            update_fields=["op", "updated_at", "attempts", "last_error", "next_attempt_at", "flushed_at"],
+        )
+
+    transaction.on_commit(write)
+
+
+def queue_stats():
+    """Queue depth and the age of the oldest pending change (health metrics)."""
+    pending = SearchIndexQueue.objects.filter(flushed_at__isnull=True)
+    stats = pending.aggregate(oldest=Min("enqueued_at"))
+    depth = pending.count()
+    oldest = stats["oldest"]
+    return {
+        "depth": depth,
+        "failing": pending.filter(attempts__gt=0).count(),
+        "oldest_enqueued_at": oldest,
+        "lag_seconds": round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0.0,
+    }
+
+
+def _media_owners(document, instances, deleted_ids):
+    """Users whose cached search data (search/cache.py) a batch invalidates."""
+    if document.django.model is not Media:
+        return set()
+    owners = {instance.uploaded_by_id for instance in instances}
+    if deleted_ids:
+        # The rows are gone, but their documents still name the owner
+        hits = document.mget(deleted_ids, missing="skip", source_includes=["uploaded_by_id"])
+        owners.update(hit.uploaded_by_id for hit in hits)
+    return owners
+
+
+def _flush_model(label, entries):
+    """Send the queued changes of one model; returns {object id: error} of the failed items."""
+    try:
+        model = apps.get_model(label)
+    except LookupError:
+        logger.warning("Dropping search queue entries for unknown model %s", label)
+        return {}
+
+    index_ids = [entry.object_id for entry in entries if entry.op == "index"]
+    delete_ids = [entry.object_id for entry in entries if entry.op == "delete"]
+    failed = {}
+    for doc_class in registry.get_documents([model]):
+        document = doc_class()
+        instances = list(document.get_queryset().filter(pk__in=index_ids)) if index_ids else []
+        found = {str(instance.pk) for instance in instances}
+        # Rows deleted since they were queued for indexing
+        gone = [pk for pk in index_ids if pk not in found]
+
+        actions = list(document._get_actions(instances, "index"))
+        actions += [
+            {"_op_type": "delete", "_index": document._index._name, "_id": pk}
+            for pk in delete_ids + gone
+        ]
+        owners = _media_owners(document, instances, delete_ids + gone)
+        _, errors = document.bulk(actions, raise_on_error=False)
+        search_cache.bump_generations(owners)
+        for error in errors:
+            op, info = next(iter(error.items()))
+            if op == "delete" and info.get("status") == 404:
+                continue
+            failed[str(info.get("_id"))] = str(info.get("error"))
+            logger.warning("Search queue %s of %s:%s failed: %s", op, label, info.get("_id"), info.get("error"))
+    return failed
+
+
+def _retry_later(entries, errors, now):
+    """Keep failed entries queued, each with its attempt count and next retry time."""
+    for entry in entries:
+        attempts = entry.attempts + 1
+        # Skipped if the entry was re-queued meanwhile: the new change goes out first
+        SearchIndexQueue.objects.filter(pk=entry.pk, updated_at=entry.updated_at).update(
+            attempts=attempts,
+            last_error=errors[entry.object_id],
+            next_attempt_at=now + min(timedelta(seconds=30 * 2 ** attempts), MAX_BACKOFF),
+        )
+
+
+def _unchanged(entries):
+    """Querysets over `entries` not re-queued since they were read, in chunks."""
+    for start in range(0, len(entries), DELETE_CHUNK_SIZE):
+        chunk = entries[start:start + DELETE_CHUNK_SIZE]
+        yield SearchIndexQueue.objects.filter(
+            reduce(or_, (Q(pk=entry.pk, updated_at=entry.updated_at) for entry in chunk))
+        )
+
+
+def flush(batch_size=500):
+    """
+    Send one batch of queued changes to Elasticsearch. Returns (sent, failed).
+
+    Connection errors propagate and leave the batch queued. Entries whose
+    bulk item failed are backed off; entries re-queued while the batch was
+    in flight are kept for the next round.
+    """
+    now = timezone.now()
+    batch = list(
+        SearchIndexQueue.objects.filter(flushed_at__isnull=True, next_attempt_at__lte=now)
+        .order_by("enqueued_at", "id")[:batch_size]
+    )
+    if not batch:
+        return 0, 0
+
+    by_model = defaultdict(list)
+    for entry in batch:
+        by_model[entry.model].append(entry)
+    failed = []
+    for label, entries in by_model.items():
+        errors = _flush_model(label, entries)
+        failed_entries = [entry for entry in entries if entry.object_id in errors]
+        _retry_later(failed_entries, errors, now)
+        failed.extend(failed_entries)
+
+    failed_ids = {entry.pk for entry in failed}
+    sent = [entry for entry in batch if entry.pk not in failed_ids]
+    rebuilds = list(SearchIndexRebuild.objects.all())
+    kept = [entry for entry in sent if any(rebuild.tracks(entry) for rebuild in rebuilds)]
+    kept_ids = {entry.pk for entry in kept}
+    for queryset in _unchanged(kept):
+        queryset.update(flushed_at=now)
+    for queryset in _unchanged([entry for entry in sent if entry.pk not in kept_ids]):
+        queryset.delete()
+    return len(batch), len(failed)
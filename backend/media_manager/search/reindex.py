@@ -0,0 +1,110 @@
+# media_manager/search/reindex.py
+"""
+Building blocks for `manage.py reindex_media`.
+
+Documents are serialized in worker processes from chunks of primary keys,
+loaded through MediaDocument.get_queryset() so the cost per chunk is a
+handful of queries instead of several per row.
+
+Changes made while the new index is loading are flushed to the old one.
+A SearchIndexRebuild row keeps those queue entries around (see
+search/queue.py) so they can be replayed into the new index before the
+alias is swapped.
+"""
+from collections import deque
+
+from django.db.models import Max
+from elasticsearch import NotFoundError
+
+from media_manager.models import Media, SearchIndexQueue, SearchIndexRebuild
+from media_manager.search.documents import MediaDocument, attach_folder_paths
+
+
+def serialize_chunk(job):
+    """Worker entry point: bulk actions for one (index name, ids) chunk."""
+    index_name, ids = job
+    document = MediaDocument()
+    media = list(document.get_queryset().filter(pk__in=ids))
+    attach_folder_paths(media)
+
+    actions = []
+    for instance in media:
+        if document.should_index_object(instance):
+            actions.append({
+                "_index": index_name,
+                "_id": document.generate_id(instance),
+                "_source": document.prepare(instance),
+            })
+    return actions
+
+
+def start_rebuild(index_name):
+    """Record the search queue high-water mark for a rebuild into `index_name`."""
+    mark = SearchIndexQueue.objects.aggregate(mark=Max("pk"))["mark"] or 0
+    return SearchIndexRebuild.objects.create(index_name=index_name, queue_mark=mark)
+
+
+def replay_actions(rebuild, chunk_size=500):
+    """Bulk actions bringing the rebuild's index up to date with the changes queued since it started."""
+    entries = SearchIndexQueue.objects.filter(model=Media._meta.label_lower)
+    ids = sorted({int(entry.object_id) for entry in entries if rebuild.tracks(entry)})
+    actions = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        indexed = serialize_chunk((rebuild.index_name, chunk))
+        found = {int(action["_id"]) for action in indexed}
+        actions += indexed
+        # Deleted (or no longer indexable) since the rebuild read them
+        actions += [
+            {"_op_type": "delete", "_index": rebuild.index_name, "_id": pk}
+            for pk in chunk if pk not in found
+        ]
+    return actions
+
+
+def finish_rebuild(rebuild, resend_after=None):
+    """
+    Release the queue entries kept for `rebuild`. Entries flushed after
+    `resend_after` only reached the old index, so they are queued again.
+    """
+    parked = SearchIndexQueue.objects.filter(flushed_at__isnull=False)
+    if resend_after is not None:
+        parked.filter(flushed_at__gte=resend_after).update(flushed_at=None)
+    rebuild.delete()
+    # Entries another running rebuild still tracks stay parked
+    others = list(SearchIndexRebuild.objects.all())
+    done = [entry.pk for entry in parked if not any(other.tracks(entry) for other in others)]
+    SearchIndexQueue.objects.filter(pk__in=done, flushed_at__isnull=False).delete()
+
+
+def bounded_map(executor, fn, jobs, window):
+    """Like executor.map, but keeps at most `window` jobs in flight."""
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(fn, job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def alias_targets(client, alias):
+    """
+    Indices behind `alias`, and whether `alias` is still a concrete index
+    (created by `search_index --create` before aliases were used).
+    """
+    try:
+        return list(client.indices.get_alias(name=alias)), False
+    except NotFoundError:
+        return [], bool(client.indices.exists(index=alias))
+
+
+def swap_alias(client, alias, new_index):
+    """Point `alias` at `new_index` in one atomic update; returns the old indices."""
+    old_indices, concrete = alias_targets(client, alias)
+    actions = [{"remove": {"index": old, "alias": alias}} for old in old_indices]
+    if concrete:
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    client.indices.update_aliases(actions=actions)
+    return old_indices
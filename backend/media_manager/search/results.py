@@ -0,0 +1,165 @@
+# media_manager/search/results.py
+"""
+Rendering and pagination of media search results.
+
+Results are rendered straight from each hit's `_source`. Fields that only
+exist in the database (file URL, renditions, ...) are filled in by a single
+hydration query whose rows are put back in hit order. Pages after the first
+use `search_after` cursors, so there is no from+size limit on depth.
+"""
+import base64
+import json
+
+from media_manager.models import Media
+from media_manager.serializers import MediaListSerializer
+
+# Fields stored in MediaDocument and returned without touching the database
+SOURCE_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "alt_text",
+    "file_type",
+    "mime_type",
+    "file_name",
+    "file_size",
+    "file_extension",
+    "width",
+    "height",
+    "orientation",
+    "captured_at",
+    "camera_make",
+    "camera_model",
+    "page_count",
+    "folder_id",
+    "folder_name",
+    "folder_path",
+    "tags",
+    "uploaded_by_username",
+    "created_at",
+    "updated_at",
+)
+# Fields that need a database hydration (see MediaListSerializer)
+HYDRATED_FIELDS = tuple(
+    field for field in MediaListSerializer.Meta.fields if field not in SOURCE_FIELDS
+)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def parse_fields(value):
+    """
+    Split a comma separated `fields` parameter into (source, hydrated) fields.
+
+    An empty value selects every source field; `id` is always included.
+    Raises ValueError on unknown names.
+    """
+    requested = [field.strip() for field in (value or "").split(",") if field.strip()]
+    if not requested:
+        return list(SOURCE_FIELDS), []
+    unknown = [field for field in requested if field not in SOURCE_FIELDS + HYDRATED_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    source = [field for field in SOURCE_FIELDS if field in requested or field == "id"]
+    hydrated = [field for field in HYDRATED_FIELDS if field in requested]
+    return source, hydrated
+
+
+def parse_page_size(value):
+    """Validated page size; raises ValueError on bad input."""
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        size = 0
+    if size < 1:
+        raise ValueError("page_size must be a positive integer")
+    return min(size, MAX_PAGE_SIZE)
+
+
+def encode_cursor(sort_values):
+    """Opaque token for the sort values of the last hit on a page."""
+    return base64.urlsafe_b64encode(json.dumps(list(sort_values)).encode()).decode()
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError on tampered tokens."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or not values:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def paginate(search, source_fields, size=DEFAULT_PAGE_SIZE, cursor=None, scored=False, decode=decode_cursor):
+    """
+    Restrict `search` to one page.
+
+    Sorting always ends on `id` so `search_after` has a unique tiebreaker;
+    `scored` searches are ordered by relevance first. `decode` reads the
+    sort values out of `cursor`.
+    """
+    sort = [{"created_at": {"order": "desc"}}, {"id": {"order": "desc"}}]
+    if scored:
+        sort.insert(0, {"_score": {"order": "desc"}})
+    search = search.sort(*sort).source(list(source_fields))
+    if cursor:
+        search = search.extra(search_after=decode(cursor))
+    return search[:size]
+
+
+def load_media(ids, user):
+    """Media rows with everything MediaListSerializer needs, keyed by id."""
+    return (
+        Media.objects.filter(uploaded_by=user)
+        .select_related("folder", "uploaded_by")
+        .prefetch_related("renditions")
+        .in_bulk(ids)
+    )
+
+
+def hydrate(results, media, hydrated_fields, context=None):
+    """
+    Merge `hydrated_fields` of `media` (id -> Media) into `results`, keeping
+    their order. Results without a row in `media` are dropped.
+    """
+    rows = MediaListSerializer(list(media.values()), many=True, context=context or {}).data
+    rows = {row["id"]: row for row in rows}
+    return [
+        {**result, **{field: rows[result["id"]][field] for field in hydrated_fields}}
+        for result in results
+        if result["id"] in rows
+    ]
+
+
+def render_page(response, source_fields, hydrated_fields, user, size, context=None, encode=encode_cursor):
+    """
+    Response body for one executed page.
+
+    Hits render from `_source`; when `hydrated_fields` are requested the
+    matching Media rows are loaded in one pass and merged in hit order.
+    Hits whose row is gone (or not owned by `user`) are dropped then.
+    `encode` turns the sort values of the last hit into `next_cursor`.
+    """
+    hits = list(response.hits)
+    results = []
+    for hit in hits:
+        source = hit.to_dict()
+        results.append({field: source.get(field) for field in source_fields})
+
+    if hydrated_fields:
+        media = load_media([hit.id for hit in hits], user)
+        results = hydrate(results, media, hydrated_fields, context)
+
+    next_cursor = None
+    if len(hits) == size:
+        next_cursor = encode(hits[-1].meta.sort)
+    return {
+        "count": response.hits.total.value,
+        "results": results,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,78 @@
+# media_manager/search/signals.py
+"""
+Signal processor that queues index changes instead of calling Elasticsearch.
+
+Enable with:
+    ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = "media_manager.search.signals.QueuedSignalProcessor"
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.signals import RealTimeSignalProcessor
+
+from media_manager.search.queue import enqueue
+from media_manager.signals import in_bulk_operation
+
+
+def _is_tracked(model):
+    return any(not doc.django.ignore_signals for doc in registry.get_documents([model]))
+
+
+def _enqueue_related(instance, deleting=False):
+    """Queue re-indexing of documents that embed data from `instance`."""
+    for doc in registry._get_related_doc(instance):
+        document = doc(related_instance_to_ignore=instance) if deleting else doc()
+        try:
+            related = document.get_instances_from_related(instance)
+        except ObjectDoesNotExist:
+            related = None
+        if related is None:
+            continue
+        if isinstance(related, models.Model):
+            object_ids = [related.pk]
+        elif isinstance(related, models.QuerySet):
+            object_ids = related.values_list("pk", flat=True)
+        else:
+            object_ids = [obj.pk for obj in related]
+        enqueue(doc.django.model, object_ids, "index")
+
+
+class QueuedSignalProcessor(RealTimeSignalProcessor):
+    """
+    Same signals as RealTimeSignalProcessor, but every change becomes a
+    SearchIndexQueue row written on commit (see media_manager/search/queue.py).
+
+    Code running inside media_manager.signals.bulk_operation() queues its own
+    changes once per batch and is skipped here.
+    """
+
+    def handle_save(self, sender, instance, **kwargs):
+        if in_bulk_operation():
+            return
+        if _is_tracked(instance.__class__):
+            enqueue(instance.__class__, [instance.pk], "index")
+        _enqueue_related(instance)
+
+    def handle_m2m_changed(self, sender, instance, action, **kwargs):
+        if in_bulk_operation():
+            return
+        model, pk_set = kwargs.get("model"), kwargs.get("pk_set")
+        if action == "pre_clear" and not _is_tracked(instance.__class__):
+            # Reverse side, e.g. tag.media.clear(): collect media before the links go
+            _enqueue_related(instance, deleting=True)
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        if _is_tracked(instance.__class__):
+            enqueue(instance.__class__, [instance.pk], "index")
+        # Reverse side, e.g. tag.media.add(...): the changed objects are in pk_set
+        if pk_set and _is_tracked(model):
+            enqueue(model, pk_set, "index")
+
+    def handle_pre_delete(self, sender, instance, **kwargs):
+        # Resolve related documents while the relation still exists
+        if not in_bulk_operation():
+            _enqueue_related(instance, deleting=True)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if not in_bulk_operation() and _is_tracked(instance.__class__):
+            enqueue(instance.__class__, [instance.pk], "delete")
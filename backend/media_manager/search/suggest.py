@@ -0,0 +1,76 @@
+# media_manager/search/suggest.py
+"""
+Search-as-you-type suggestions for the media search box.
+
+Matches the edge n-gram `suggest` field of MediaDocument (title, tag names,
+folder path) and returns only ids and labels. Results are cached per user
+for a few seconds, so repeated keystrokes (backspace, retyping) are served
+without a round trip to Elasticsearch; writing the user's documents
+invalidates them (search/cache.py). While Elasticsearch is unreachable,
+titles and filenames starting with the query are suggested from the
+database instead, uncached.
+"""
+import re
+
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+
+from media_manager.models import Media
+from media_manager.search import cache as search_cache
+from media_manager.search.documents import MediaDocument
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+MAX_QUERY_LENGTH = 100
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query):
+    """Lowercased, whitespace-collapsed query, so equivalent input shares a cache entry."""
+    return re.sub(r"\s+", " ", (query or "").strip().lower())[:MAX_QUERY_LENGTH]
+
+
+def suggest_from_database(user, query, limit=DEFAULT_LIMIT):
+    """Prefix matches on title and filename, newest first."""
+    media = (
+        Media.objects.filter(uploaded_by=user)
+        .filter(Q(title__istartswith=query) | Q(original_filename__istartswith=query))
+        .only("id", "title", "file", "original_filename")
+        .order_by("-created_at", "-id")[:limit]
+    )
+    return [{"id": instance.id, "label": instance.title or instance.get_filename()} for instance in media]
+
+
+def suggest(user, query, limit=DEFAULT_LIMIT):
+    """Up to `limit` {"id", "label"} suggestions from `user`'s media."""
+    query = normalize_query(query)
+    if not query:
+        return []
+
+    params = {"q": query, "limit": limit}
+    suggestions = search_cache.get_cached("suggest", user.id, params)
+    if suggestions is not None:
+        return suggestions
+
+    search = (
+        MediaDocument.search()
+        .filter("term", uploaded_by_id=user.id)
+        .query("match", suggest={"query": query, "operator": "and"})
+        .source(["id", "title", "file_name"])
+        .extra(track_total_hits=False)
+    )[:limit]
+    from elasticsearch import ApiError, TransportError
+
+    try:
+        hits = search.execute()
+    except (ApiError, TransportError) as exc:
+        logger.warning("Suggesting from the database, Elasticsearch unavailable: %s", exc)
+        return suggest_from_database(user, query, limit)
+    suggestions = [{"id": hit.id, "label": hit.title or hit.file_name or ""} for hit in hits]
+    search_cache.set_cached(
+        "suggest", user.id, params, suggestions, getattr(settings, "MEDIA_MANAGER_SUGGEST_CACHE_TTL", 30),
+    )
+    return suggestions
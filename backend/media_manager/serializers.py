@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from media_manager.models import Media, Folder, Tag
+from media_manager.models import Media, Folder, Tag, UploadSession, MediaRendition
+from media_manager.uploads import get_chunk_size, get_max_upload_size, get_session_ttl
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -43,8 +46,9 @@ class FolderSerializer(serializers.ModelSerializer):
             "full_path",
             "created_at",
             "updated_at",
+            "deleted_at",
         ]
-        read_only_fields = ["id", "owner", "created_at", "updated_at"]
+        read_only_fields = ["id", "owner", "created_at", "updated_at", "deleted_at"]
 
     def get_children_count(self, obj):
         """Get count of direct children folders."""
@@ -69,14 +73,50 @@ class FolderNestedSerializer(FolderSerializer):
         return FolderNestedSerializer(children, many=True, context=self.context).data
 
 
-class MediaListSerializer(serializers.ModelSerializer):
+class MediaRenditionSerializer(serializers.ModelSerializer):
+    """Serializer for generated image renditions."""
+
+    class Meta:
+        model = MediaRendition
+        fields = ["name", "format", "file", "width", "height", "size"]
+        read_only_fields = fields
+
+
+class SparseFieldsMixin:
+    """
+    Render only the fields listed in context["fields"] (?fields= of the list
+    views); `id` is always kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields")
+        if requested:
+            for name in set(self.fields) - set(requested) - {"id"}:
+                self.fields.pop(name)
+
+
+class MediaListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Compact serializer for listing media."""
+
+    # Columns read by each field that is not a column itself; renditions are prefetched
+    SOURCES = {
+        "renditions": (),
+        "thumbnail": (),
+        "file_type_display": ("file_type",),
+        "file_extension": ("file",),
+        "size_mb": ("size",),
+        "folder_name": ("folder__name",),
+        "uploaded_by_username": ("uploaded_by__username",),
+    }
     
     file_type_display = serializers.CharField(source="get_file_type_display", read_only=True)
     size_mb = serializers.SerializerMethodField()
     file_extension = serializers.CharField(source="get_file_extension", read_only=True)
     folder_name = serializers.CharField(source="folder.name", read_only=True)
     uploaded_by_username = serializers.CharField(source="uploaded_by.username", read_only=True)
+    renditions = MediaRenditionSerializer(many=True, read_only=True)
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Media
@@ -84,15 +124,23 @@ class MediaListSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "file",
+            "content_hash",
+            "renditions",
+            "thumbnail",
             "file_type",
             "file_type_display",
+            "mime_type",
             "file_extension",
             "size",
             "size_mb",
+            "width",
+            "height",
+            "orientation",
             "folder",
             "folder_name",
             "uploaded_by_username",
             "created_at",
+            "deleted_at",
         ]
         read_only_fields = fields
 
@@ -100,6 +148,16 @@ class MediaListSerializer(serializers.ModelSerializer):
         """Get file size in MB."""
         return obj.get_file_size_mb()
 
+    def get_thumbnail(self, obj):
+        """URL of the smallest rendition, in the preferred format."""
+        formats = list(getattr(settings, "MEDIA_MANAGER_RENDITION_FORMATS", ("webp", "jpeg")))
+        thumbs = [rendition for rendition in obj.renditions.all() if rendition.name == "thumb"]
+        if not thumbs:
+            return None
+        thumb = min(thumbs, key=lambda r: formats.index(r.format) if r.format in formats else len(formats))
+        request = self.context.get("request")
+        return request.build_absolute_uri(thumb.file.url) if request else thumb.file.url
+
 
 class MediaDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer with full relationships."""
@@ -110,6 +168,7 @@ class MediaDetailSerializer(serializers.ModelSerializer):
     folder_details = FolderSerializer(source="folder", read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     uploaded_by = UserBasicSerializer(read_only=True)
+    renditions = MediaRenditionSerializer(many=True, read_only=True)
 
     class Meta:
         model = Media
@@ -118,12 +177,24 @@ class MediaDetailSerializer(serializers.ModelSerializer):
             "title",
             "description",
             "file",
+            "content_hash",
+            "renditions",
             "alt_text",
             "file_type",
             "file_type_display",
+            "mime_type",
             "file_extension",
             "size",
             "size_mb",
+            "width",
+            "height",
+            "orientation",
+            "captured_at",
+            "camera_make",
+            "camera_model",
+            "page_count",
+            "perceptual_hash",
+            "processing_status",
             "folder",
             "folder_details",
             "tags",
@@ -134,7 +205,18 @@ class MediaDetailSerializer(serializers.ModelSerializer):
         read_only_fields = [
             "id",
             "file",
+            "content_hash",
+            "mime_type",
             "size",
+            "width",
+            "height",
+            "orientation",
+            "captured_at",
+            "camera_make",
+            "camera_model",
+            "page_count",
+            "perceptual_hash",
+            "processing_status",
             "uploaded_by",
             "created_at",
             "updated_at",
@@ -224,6 +306,107 @@ class MediaCreateSerializer(serializers.ModelSerializer):
         return media
 
 
+class MediaBatchUploadSerializer(serializers.Serializer):
+    """Serializer for uploading many files with shared folder and tags."""
+
+    files = serializers.ListField(
+        child=serializers.FileField(),
+        allow_empty=False,
+        max_length=500
+    )
+    folder = serializers.PrimaryKeyRelatedField(
+        queryset=Folder.objects.all(),
+        required=False,
+        allow_null=True
+    )
+    tag_ids = serializers.PrimaryKeyRelatedField(
+        queryset=Tag.objects.all(),
+        many=True,
+        required=False
+    )
+
+    def validate_folder(self, value):
+        """Validate folder ownership."""
+        request = self.context.get("request")
+        if value and value.owner != request.user:
+            raise serializers.ValidationError("You don't have permission to use this folder.")
+        return value
+
+    def validate_tag_ids(self, value):
+        """Validate tag ownership."""
+        request = self.context.get("request")
+        if any(tag.owner_id != request.user.id for tag in value):
+            raise serializers.ValidationError("You don't have permission to use these tags.")
+        return value
+
+
+class MediaBulkFilterSerializer(serializers.Serializer):
+    """Filter expression selecting media for a bulk operation."""
+
+    file_type = serializers.ChoiceField(choices=Media.FILE_TYPE_CHOICES, required=False)
+    folder_id = serializers.IntegerField(required=False, allow_null=True)
+    tag_id = serializers.IntegerField(required=False)
+    q = serializers.CharField(required=False, allow_blank=True)
+    created_from = serializers.DateTimeField(required=False)
+    created_to = serializers.DateTimeField(required=False)
+    size_from = serializers.IntegerField(required=False, min_value=0)
+    size_to = serializers.IntegerField(required=False, min_value=0)
+
+
+class MediaSelectionSerializer(serializers.Serializer):
+    """Media selected by ids or by a filter expression."""
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    filter = MediaBulkFilterSerializer(required=False)
+
+    def validate(self, attrs):
+        """Require exactly one selector."""
+        if ("ids" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Provide either 'ids' or 'filter'.")
+        return attrs
+
+
+class MediaBulkActionSerializer(MediaSelectionSerializer):
+    """Serializer for bulk tag/untag/move/delete over ids or a filter."""
+
+    ACTIONS = ["add_tags", "remove_tags", "move", "delete"]
+
+    action = serializers.ChoiceField(choices=ACTIONS)
+    tag_ids = serializers.PrimaryKeyRelatedField(
+        queryset=Tag.objects.all(),
+        many=True,
+        required=False
+    )
+    folder_id = serializers.PrimaryKeyRelatedField(
+        queryset=Folder.objects.all(),
+        required=False,
+        allow_null=True
+    )
+
+    def validate_tag_ids(self, value):
+        """Validate tag ownership."""
+        request = self.context.get("request")
+        if any(tag.owner_id != request.user.id for tag in value):
+            raise serializers.ValidationError("You don't have permission to use these tags.")
+        return value
+
+    def validate_folder_id(self, value):
+        """Validate folder ownership."""
+        request = self.context.get("request")
+        if value and value.owner != request.user:
+            raise serializers.ValidationError("You don't have permission to use this folder.")
+        return value
+
+    def validate(self, attrs):
+        """Require exactly one selector and the arguments of the action."""
+        attrs = super().validate(attrs)
+        if attrs["action"] in ("add_tags", "remove_tags") and not attrs.get("tag_ids"):
+            raise serializers.ValidationError({"tag_ids": "This field is required for tag actions."})
+        if attrs["action"] == "move" and "folder_id" not in attrs:
+            raise serializers.ValidationError({"folder_id": "This field is required for move (null for root)."})
+        return attrs
+
+
 class FolderCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating folders."""
     
@@ -241,4 +424,79 @@ class FolderCreateSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if value and value.owner != request.user:
             raise serializers.ValidationError("You don't have permission to use this folder.")
-        return value
\ No newline at end of file
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer describing a resumable upload session."""
+
+    offset = serializers.IntegerField(source="received_size", read_only=True)
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "filename",
+            "total_size",
+            "offset",
+            "chunk_size",
+            "checksum",
+            "expires_at",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+    def get_chunk_size(self, obj):
+        """Get maximum accepted chunk size in bytes."""
+        return get_chunk_size()
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Serializer for starting a chunked upload."""
+
+    METADATA_FIELDS = ["title", "description", "alt_text", "file_type", "folder", "tag_ids"]
+
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    checksum = serializers.RegexField(r"^[0-9a-fA-F]{64}$", required=False, allow_blank=True)
+    title = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    alt_text = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    file_type = serializers.CharField(required=False)
+    folder = serializers.IntegerField(required=False, allow_null=True)
+    tag_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate_size(self, value):
+        """Validate declared file size against the upload limit."""
+        max_size = get_max_upload_size()
+        if value > max_size:
+            raise serializers.ValidationError(
+                f"File size ({value / (1024*1024):.2f}MB) exceeds maximum of {max_size // (1024*1024)}MB."
+            )
+        return value
+
+    def validate(self, attrs):
+        """Validate metadata with the same rules used for direct uploads."""
+        metadata = {
+            key: attrs[key] for key in self.METADATA_FIELDS if key in attrs
+        }
+        MediaCreateSerializer(
+            data=metadata,
+            partial=True,
+            context=self.context,
+        ).is_valid(raise_exception=True)
+        attrs["metadata"] = metadata
+        return attrs
+
+    def create(self, validated_data):
+        """Create upload session owned by the requesting user."""
+        return UploadSession.objects.create(
+            owner=self.context["request"].user,
+            filename=validated_data["filename"],
+            total_size=validated_data["size"],
+            checksum=validated_data.get("checksum", "").lower(),
+            metadata=validated_data["metadata"],
+            expires_at=timezone.now() + get_session_ttl(),
+        )
@@ -1,14 +1,50 @@
-from django.db.models.signals import pre_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.core.files.base import ContentFile
+from contextlib import contextmanager
 from pathlib import Path
 import mimetypes
+import threading
 
-from media_manager.models import Media
+from media_manager.deletion import enqueue_deletions
+from media_manager.models import Media, MediaBlob, MediaRendition, Tag, Folder
+from media_manager.processing import schedule_processing
+from media_manager.quotas import add_usage
+from media_manager.search.cache import invalidate_on_commit
+from media_manager.sniffing import detect_mime_type, file_type_for_mime, read_header, sniff
+from media_manager.storage import is_blob_name, hash_from_blob_name
 
+_state = threading.local()
+
+
+@contextmanager
+def bulk_operation():
+    """
+    Skip per-instance file cleanup inside the block.
+
+    Used by media_manager/bulk.py, which does the same work once per batch.
+    """
+    previous = getattr(_state, "bulk", False)
+    _state.bulk = True
+    try:
+        yield
+    finally:
+        _state.bulk = previous
+
+
+def in_bulk_operation():
+    return getattr(_state, "bulk", False)
+
+
+def detect_file_type(filename, size=0, header=None):
+    """
+    Detect file type from the leading bytes of the file when given,
+    falling back to its filename.
+    """
+    sniffed = sniff(header, filename)
+    if sniffed and sniffed != "text/plain":
+        return file_type_for_mime(sniffed)
 
-def detect_file_type(filename, size=0):
-    """Detect file type from filename and size."""
     ext = Path(filename).suffix.lower()
     mime_type, _ = mimetypes.guess_type(filename)
     
@@ -45,24 +81,148 @@ def detect_file_type(filename, size=0):
 @receiver(pre_save, sender=Media)
 def set_media_file_size_and_type(sender, instance, **kwargs):
     """
-    Auto-set file size and file type before saving.
+    Auto-set file size, file type and mime type before saving.
+
+    New uploads are sniffed from their first few KB; stored files are not
+    re-read on every save.
     """
     if instance.file:
-        # Set file size
-        if hasattr(instance.file, "size"):
+        header = None
+        if not instance.file._committed:
+            # Before the storage renames it
+            instance.original_filename = Path(instance.file.name).name[:255]
+            instance.size = instance.file.size
+            header = read_header(instance.file.file)
+            instance.mime_type = detect_mime_type(instance.file.name, header)
+        elif not instance.size:
             instance.size = instance.file.size
-        
+
         # Set file type if not already set
         if not instance.file_type or instance.file_type == "other":
-            instance.file_type = detect_file_type(instance.file.name)
+            instance.file_type = detect_file_type(instance.file.name, header=header)
+        if not instance.mime_type:
+            instance.mime_type = detect_mime_type(instance.file.name)
+
+    # Remember the blob being replaced so its reference (and size) can be dropped
+    instance._replaced_file_name = None
+    instance._replaced_size = 0
+    if instance.pk and instance.file and not instance.file._committed:
+        instance._replaced_file_name, instance._replaced_size = (
+            Media.all_objects.filter(pk=instance.pk).values_list("file", "size").first() or (None, 0)
+        )
+
+
+@receiver(post_save, sender=Media)
+def track_media_blob(sender, instance, created, **kwargs):
+    """
+    Reference-count the content-addressed blob behind a saved Media.
+    """
+    replaced = getattr(instance, "_replaced_file_name", None)
+    if not (created or replaced):
+        return
+
+    name = instance.file.name if instance.file else ""
+    if replaced and replaced != name:
+        release_media_file(instance.file.storage, replaced)
+
+    if is_blob_name(name):
+        content_hash = hash_from_blob_name(name)
+        MediaBlob.retain(name, content_hash, instance.size)
+        if instance.content_hash != content_hash:
+            instance.content_hash = content_hash
+            Media.all_objects.filter(pk=instance.pk).update(content_hash=content_hash)
+
+
+@receiver(post_save, sender=Media)
+def process_uploaded_media(sender, instance, created, **kwargs):
+    """
+    Generate renditions for new or replaced files after commit.
+    """
+    if created or getattr(instance, "_replaced_file_name", None):
+        schedule_processing([instance])
+
+
+def release_media_file(storage, name):
+    """Drop one reference to a stored file, queueing its deletion with the last one."""
+    if is_blob_name(name) and not MediaBlob.release(name):
+        return
+    enqueue_deletions([("media", name)])
+
+
+@receiver(post_save, sender=Media)
+def track_media_usage(sender, instance, created, **kwargs):
+    """
+    Move the owner's storage usage by the size of a new or replaced file.
+    """
+    if created:
+        add_usage({instance.uploaded_by_id: instance.size})
+    elif getattr(instance, "_replaced_file_name", None):
+        add_usage({instance.uploaded_by_id: instance.size - instance._replaced_size})
 
 
 @receiver(post_delete, sender=Media)
 def delete_media_file(sender, instance, **kwargs):
     """
-    Delete the file from storage when Media instance is deleted.
+    Queue the file for deletion when Media instance is deleted.
+
+    Deduplicated blobs are only removed once no Media references them.
     """
-    if instance.file:
-        # Delete the file from storage
-        if instance.file.storage.exists(instance.file.name):
-            instance.file.storage.delete(instance.file.name)
\ No newline at end of file
+    if instance.file and not in_bulk_operation():
+        release_media_file(instance.file.storage, instance.file.name)
+
+
+@receiver(post_delete, sender=Media)
+def release_media_usage(sender, instance, **kwargs):
+    """
+    Give the file's size back to the owner's quota.
+    """
+    if not in_bulk_operation():
+        add_usage({instance.uploaded_by_id: -instance.size})
+
+
+@receiver(post_delete, sender=MediaRendition)
+def delete_rendition_file(sender, instance, **kwargs):
+    """
+    Queue rendition files for deletion along with their rows.
+    """
+    if instance.file and not in_bulk_operation():
+        enqueue_deletions([("default", instance.file.name)])
+
+
+@receiver(post_save, sender=Media)
+@receiver(post_delete, sender=Media)
+def invalidate_media_search_cache(sender, instance, **kwargs):
+    """
+    Drop the owner's cached search results (media_manager/search/cache.py).
+    """
+    if not in_bulk_operation():
+        invalidate_on_commit([instance.uploaded_by_id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+def invalidate_owner_search_cache(sender, instance, **kwargs):
+    """
+    Tag and folder names are part of search results and facets.
+    """
+    if not in_bulk_operation():
+        invalidate_on_commit([instance.owner_id])
+
+
+@receiver(m2m_changed, sender=Media.tags.through)
+def invalidate_tagging_search_cache(sender, instance, action, pk_set, **kwargs):
+    """
+    Tagging from either side: media.tags.add(...) or tag.media.add(...).
+    """
+    if in_bulk_operation() or action not in ("pre_clear", "post_add", "post_remove"):
+        return
+    if isinstance(instance, Media):
+        invalidate_on_commit([instance.uploaded_by_id])
+        return
+    if action == "pre_clear":
+        media = instance.media.all()
+    else:
+        media = Media.objects.filter(pk__in=pk_set or ())
+    invalidate_on_commit({instance.owner_id, *media.values_list("uploaded_by_id", flat=True)})
@@ -0,0 +1,116 @@
+"""
+Near-duplicate image lookups by perceptual hash.
+
+Media.phash_0..phash_3 hold the four 16-bit chunks of the dHash
+(media_manager/fingerprints.py), each indexed together with uploaded_by.
+Two hashes within Hamming distance d agree on at least one chunk to within
+d // 4 bits, so candidates come from a few indexed IN lookups and only
+those are compared bit by bit; nothing is compared pairwise across the
+whole library.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from media_manager.fingerprints import CHUNKS, chunks, hamming, neighbours, parse_hash
+from media_manager.models import Media
+
+# Beyond this the chunk neighbourhoods grow quickly (radius 3 is 697 values
+# per chunk) and matches stop looking like the same picture
+MAX_DISTANCE = 11
+# Duplicate reports only probe exact chunk matches (radius 0)
+MAX_DUPLICATE_DISTANCE = CHUNKS - 1
+
+
+def find_similar(media, max_distance=6):
+    """
+    [(distance, media id)] of the owner's other images within `max_distance`
+    bits of `media`, closest first.
+    """
+    if not media.perceptual_hash:
+        return []
+    max_distance = min(max_distance, MAX_DISTANCE)
+    value = parse_hash(media.perceptual_hash)
+    radius = max_distance // CHUNKS
+    candidates = (
+        Media.objects.filter(uploaded_by_id=media.uploaded_by_id)
+        .filter(reduce(or_, (
+            Q(**{f"phash_{position}__in": neighbours(chunk, radius)})
+            for position, chunk in enumerate(chunks(value))
+        )))
+        .exclude(pk=media.pk)
+        .values_list("pk", "perceptual_hash")
+    )
+    matches = []
+    for media_id, text in candidates:
+        distance = hamming(value, parse_hash(text))
+        if distance <= max_distance:
+            matches.append((distance, media_id))
+    return sorted(matches)
+
+
+class _Groups:
+    """Union-find over media ids."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def groups(self):
+        members = {}
+        for item in self.parent:
+            members.setdefault(self.find(item), []).append(item)
+        return [sorted(ids) for ids in members.values() if len(ids) > 1]
+
+
+def _link_bucket(bucket, groups, max_distance):
+    """Union the rows of one chunk bucket [(id, hash)] that are close enough."""
+    # Identical hashes (the common case) are linked without comparing
+    by_hash = {}
+    for media_id, value in bucket:
+        if value in by_hash:
+            groups.union(by_hash[value], media_id)
+        else:
+            by_hash[value] = media_id
+    distinct = list(by_hash.items())
+    for index, (value, media_id) in enumerate(distinct):
+        for other_value, other_id in distinct[index + 1:]:
+            if hamming(value, other_value) <= max_distance:
+                groups.union(media_id, other_id)
+
+
+def duplicate_groups(user, max_distance=MAX_DUPLICATE_DISTANCE):
+    """
+    Lists of ids of `user`'s images within `max_distance` bits of each
+    other (transitively), largest group first.
+
+    One streamed pass per chunk column in index order: rows sharing a chunk
+    value are adjacent, and only those are compared.
+    """
+    max_distance = min(max_distance, MAX_DUPLICATE_DISTANCE)
+    groups = _Groups()
+    hashed = Media.objects.filter(uploaded_by=user).exclude(perceptual_hash="")
+    for position in range(CHUNKS):
+        field = f"phash_{position}"
+        rows = hashed.order_by(field, "pk").values_list(field, "pk", "perceptual_hash")
+        bucket, current = [], None
+        for chunk, media_id, text in rows.iterator(chunk_size=5000):
+            if chunk != current:
+                _link_bucket(bucket, groups, max_distance)
+                bucket, current = [], chunk
+            bucket.append((media_id, parse_hash(text)))
+        _link_bucket(bucket, groups, max_distance)
+    return sorted(groups.groups(), key=lambda ids: (-len(ids), ids[0]))
@@ -0,0 +1,239 @@
+"""
+Content sniffing from the leading bytes of a file.
+
+Signatures are compiled into a table keyed by the first byte, so a lookup
+only compares against the handful of magic numbers that can match. Container
+formats (RIFF, ISO-BMFF `ftyp`, EBML, ZIP, OLE) are refined by looking a few
+bytes further in, or by the filename when the header alone is ambiguous.
+"""
+import mimetypes
+import re
+
+HEADER_SIZE = 4096
+
+# (magic, mime type); all matched at offset 0
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"\x00\x00\x01\x00", "image/x-icon"),
+    (b"8BPS", "image/vnd.adobe.photoshop"),
+    (b"FLV\x01", "video/x-flv"),
+    (b"\x30\x26\xb2\x75\x8e\x66\xcf\x11", "video/x-ms-asf"),
+    (b"\x00\x00\x01\xba", "video/mpeg"),
+    (b"\x00\x00\x01\xb3", "video/mpeg"),
+    (b"ID3", "audio/mpeg"),
+    (b"\xff\xfb", "audio/mpeg"),
+    (b"\xff\xf3", "audio/mpeg"),
+    (b"\xff\xf2", "audio/mpeg"),
+    (b"\xff\xf1", "audio/aac"),
+    (b"\xff\xf9", "audio/aac"),
+    (b"fLaC", "audio/flac"),
+    (b"OggS", "audio/ogg"),
+    (b"MThd", "audio/midi"),
+    (b"#!AMR", "audio/amr"),
+    (b"%PDF-", "application/pdf"),
+    (b"{\\rtf", "application/rtf"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"Rar!\x1a\x07", "application/vnd.rar"),
+)
+
+RIFF_FORMS = {
+    b"WEBP": "image/webp",
+    b"WAVE": "audio/wav",
+    b"AVI ": "video/x-msvideo",
+}
+
+FTYP_BRANDS = {
+    b"qt  ": "video/quicktime",
+    b"M4A ": "audio/mp4",
+    b"M4B ": "audio/mp4",
+    b"M4V ": "video/x-m4v",
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"mif1": "image/heif",
+    b"avif": "image/avif",
+    b"3gp4": "video/3gpp",
+    b"3gp5": "video/3gpp",
+    b"3g2a": "video/3gpp2",
+}
+
+DOCUMENT_MIME_TYPES = {
+    "application/pdf",
+    "application/rtf",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.ms-powerpoint",
+    "application/epub+zip",
+}
+DOCUMENT_MIME_PREFIXES = (
+    "text/",
+    "application/vnd.openxmlformats-officedocument.",
+    "application/vnd.oasis.opendocument.",
+)
+
+# Types a ZIP may declare in its leading `mimetype` entry; anything else
+# (text/html, image/svg+xml...) would be served as that type
+ZIP_DECLARED_TYPE_RE = re.compile(r"^(application/vnd\.oasis\.opendocument\.[a-z0-9.+-]+|application/epub\+zip)$")
+
+ZIP_MAGIC = b"PK\x03\x04"
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+EBML_MAGIC = b"\x1aE\xdf\xa3"
+
+
+def _compile(signatures):
+    table = {}
+    for magic, mime_type in signatures:
+        table.setdefault(magic[0], []).append((magic, mime_type))
+    # Longest magic first so specific signatures win over short ones
+    return {
+        first: tuple(sorted(entries, key=lambda entry: -len(entry[0])))
+        for first, entries in table.items()
+    }
+
+
+_PREFIX_TABLE = _compile(SIGNATURES)
+
+
+def _guess_from_name(filename):
+    return mimetypes.guess_type(filename)[0] if filename else None
+
+
+def _sniff_ftyp(header):
+    brand = header[8:12]
+    return FTYP_BRANDS.get(brand) or ("video/3gpp" if brand.startswith(b"3gp") else "video/mp4")
+
+
+def _sniff_container(header, filename):
+    if header.startswith(b"BM") and header[6:10] == b"\x00\x00\x00\x00":
+        # Reserved bytes must be zero, which rules out text starting with "BM"
+        return "image/bmp"
+
+    if header.startswith(b"RIFF"):
+        return RIFF_FORMS.get(header[8:12])
+
+    if header.startswith(EBML_MAGIC):
+        return "video/webm" if b"webm" in header[:64] else "video/x-matroska"
+
+    if header.startswith(ZIP_MAGIC):
+        # OpenDocument and EPUB store their mime type uncompressed as the first entry
+        if header[30:38] == b"mimetype":
+            end = header.find(b"PK", 38)
+            declared = header[38:end if end > 0 else 38 + 80].decode("ascii", "ignore").strip()
+            if ZIP_DECLARED_TYPE_RE.match(declared):
+                return declared
+        for marker, mime_type in (
+            (b"word/", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+            (b"xl/", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+            (b"ppt/", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+        ):
+            if marker in header:
+                return mime_type
+        guessed = _guess_from_name(filename)
+        return guessed if guessed and "officedocument" in guessed else "application/zip"
+
+    if header.startswith(OLE_MAGIC):
+        guessed = _guess_from_name(filename)
+        return guessed if guessed in DOCUMENT_MIME_TYPES else "application/x-ole-storage"
+
+    return None
+
+
+def _sniff_text(header):
+    if b"\x00" in header:
+        return None
+    try:
+        text = header.decode("utf-8")
+    except UnicodeDecodeError:
+        # A multi-byte sequence may be cut at the end of the header
+        try:
+            text = header[:-3].decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+    head = text.lstrip("\ufeff \t\r\n")[:256].lower()
+    if head.startswith("<svg") or (head.startswith("<?xml") and "<svg" in text.lower()):
+        return "image/svg+xml"
+    return "text/plain"
+
+
+def sniff(header, filename=None):
+    """
+    Return the mime type identified from `header` bytes, or None.
+
+    Plain text only identifies as "text/plain"; callers should prefer the
+    filename for text formats (csv, json, markdown...).
+    """
+    if not header:
+        return None
+    # ISO-BMFF starts with a box size, which can collide with other signatures
+    if header[4:8] == b"ftyp":
+        return _sniff_ftyp(header)
+
+    for magic, mime_type in _PREFIX_TABLE.get(header[0], ()):
+        if header.startswith(magic):
+            return mime_type
+
+    return _sniff_container(header, filename) or _sniff_text(header)
+
+
+def read_header(fileobj, size=HEADER_SIZE):
+    """Read the first `size` bytes of an open file, preserving its position."""
+    try:
+        position = fileobj.tell()
+        fileobj.seek(0)
+    except (AttributeError, OSError, ValueError):
+        return b""
+    try:
+        return fileobj.read(size) or b""
+    finally:
+        fileobj.seek(position)
+
+
+def detect_mime_type(filename, header=None):
+    """Mime type from content when recognisable, otherwise from the filename."""
+    sniffed = sniff(header, filename)
+    if sniffed and sniffed != "text/plain":
+        return sniffed
+    return _guess_from_name(filename) or sniffed or "application/octet-stream"
+
+
+def file_type_for_mime(mime_type):
+    """Map a mime type onto Media.FILE_TYPE_CHOICES."""
+    if mime_type == "image/svg+xml" or mime_type.startswith("image/"):
+        return "image"
+    if mime_type.startswith("video/"):
+        return "video"
+    if mime_type.startswith("audio/"):
+        return "audio"
+    if mime_type in DOCUMENT_MIME_TYPES or mime_type.startswith(DOCUMENT_MIME_PREFIXES):
+        return "document"
+    return "other"
+
+
+def sample_headers():
+    """
+    Representative headers for benchmarks and tests, as (filename, header, mime type).
+    """
+    pad = bytes(range(256)) * (HEADER_SIZE // 256)
+    samples = [(f"sample{index}.bin", magic + pad, mime) for index, (magic, mime) in enumerate(SIGNATURES)]
+    samples += [
+        ("image.bmp", b"BM\x36\x00\x0c\x00\x00\x00\x00\x00\x36\x00" + pad, "image/bmp"),
+        ("photo.webp", b"RIFF\x24\x00\x00\x00WEBPVP8 " + pad, "image/webp"),
+        ("sound.wav", b"RIFF\x24\x00\x00\x00WAVEfmt " + pad, "audio/wav"),
+        ("clip.mp4", b"\x00\x00\x00\x20ftypisom\x00\x00\x02\x00" + pad, "video/mp4"),
+        ("clip.mov", b"\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00" + pad, "video/quicktime"),
+        ("photo.heic", b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00" + pad, "image/heic"),
+        ("clip.webm", EBML_MAGIC + b"\x9f\x42\x86\x81\x01\x42\x82\x84webm" + pad, "video/webm"),
+        ("report.docx", ZIP_MAGIC + b"\x14\x00" * 13 + b"word/document.xml" + pad,
+         "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+        ("notes.odt", ZIP_MAGIC + b"\x00" * 26 + b"mimetypeapplication/vnd.oasis.opendocument.text" + ZIP_MAGIC,
+         "application/vnd.oasis.opendocument.text"),
+        ("legacy.doc", OLE_MAGIC + pad, "application/msword"),
+        ("icon.svg", b'<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg"></svg>', "image/svg+xml"),
+        ("readme.txt", b"Plain text notes\n" * 64, "text/plain"),
+    ]
+    return samples
@@ -0,0 +1,110 @@
+"""
+Content-addressed storage for media files.
+
+Uploads are hashed while they are written (single pass) and stored once
+under a sharded ``cas/ab/cd/<sha256><ext>`` layout. Identical uploads
+resolve to the same blob; ``MediaBlob`` keeps the reference counts.
+
+Without deduplication files are fanned out by a random key instead
+(``media/ab/cd/<key>_<filename>``), so no directory grows unbounded and
+renaming a Folder never has to move files.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = "cas"
+SHARD_PREFIX = "media"
+SHARD_KEY_LENGTH = 16
+SHARDED_NAME_RE = re.compile(rf"^{SHARD_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{{SHARD_KEY_LENGTH}}}_")
+
+
+def is_deduplication_enabled():
+    return getattr(settings, "MEDIA_MANAGER_DEDUPLICATE_UPLOADS", True)
+
+
+def blob_name(digest, ext=""):
+    """Storage name of a blob: cas/ab/cd/<sha256><ext>."""
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f"{BLOB_PREFIX}/")
+
+
+def hash_from_blob_name(name):
+    """Extract the content hash from a blob name, or '' for other names."""
+    if not is_blob_name(name):
+        return ""
+    return Path(name).name.split(".", 1)[0]
+
+
+def sharded_name(filename, key=None):
+    """Storage name spread over 65536 directories: media/ab/cd/<key>_<filename>."""
+    key = key or uuid.uuid4().hex[:SHARD_KEY_LENGTH]
+    return f"{SHARD_PREFIX}/{key[:2]}/{key[2:4]}/{key}_{Path(filename).name}"
+
+
+def is_sharded_name(name):
+    return bool(name) and SHARDED_NAME_RE.match(name) is not None
+
+
+def original_filename(name):
+    """Filename as uploaded, without the shard key of a sharded name."""
+    filename = Path(name).name
+    if is_sharded_name(name):
+        return filename[SHARD_KEY_LENGTH + 1:]
+    return filename
+
+
+@deconstructible
+class MediaStorage(FileSystemStorage):
+    """Filesystem storage that deduplicates uploads by SHA-256."""
+
+    def get_available_name(self, name, max_length=None):
+        """Blob names are derived from content, so no suffixing is needed."""
+        if is_deduplication_enabled():
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if not is_deduplication_enabled():
+            return super()._save(name, content)
+
+        temp_dir = Path(self.path(BLOB_PREFIX)) / ".incoming"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+
+        with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as tmp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        name = blob_name(digest.hexdigest(), Path(name).suffix)
+        full_path = self.path(name)
+        try:
+            # Marks the blob as reused: the deletion worker leaves recently
+            # modified blobs alone until this upload's row has committed
+            os.utime(full_path)
+            os.remove(tmp.name)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp.name, full_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+
+def get_media_storage():
+    """Storage used by Media.file."""
+    return media_storage
+
+
+media_storage = MediaStorage()
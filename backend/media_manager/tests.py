@@ -1,15 +1,65 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APITestCase
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from PIL import Image, ImageDraw
 
-from media_manager.models import Media, Folder, Tag
+from media_manager.models import (
+    Media, Folder, Tag, UploadSession, MediaBlob, MediaRendition, StorageDeletion, SearchIndexQueue, StorageQuota,
+)
+from media_manager.search import queue as search_queue
+from media_manager.search.documents import MediaDocument
+from media_manager.search.reindex import finish_rebuild, replay_actions, serialize_chunk, start_rebuild
+from media_manager.search import results as search_results
+from media_manager.search import suggest as search_suggest
+from media_manager.search import backends as search_backends
+from media_manager.search import cache as search_cache
+from media_manager.deletion import process_deletions
+from media_manager.delivery import get_download_name
+from media_manager.fingerprints import hamming, hash_fields, neighbours, parse_hash
+from media_manager.similarity import duplicate_groups
+from media_manager import bulk, quotas, scrub, sniffing, transforms, trash, uploads
+from media_manager.signals import detect_file_type
+from media_manager.sniffing import detect_mime_type, sample_headers
+from media_manager.storage import is_sharded_name, original_filename
 
 User = get_user_model()
 
 
+class TempMediaRootMixin:
+    """Run a test class against its own MEDIA_ROOT, removed afterwards."""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+    def make_temp_dir(self):
+        """A temporary directory removed after the test."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+
 class FolderModelTests(TestCase):
     """Tests for Folder model."""
 
@@ -76,7 +126,7 @@ class TagModelTests(TestCase):
             Tag.objects.create(name="sunset", owner=self.user)
 
 
-class MediaAPITests(APITestCase):
+class MediaAPITests(TempMediaRootMixin, APITestCase):
     """Tests for Media API endpoints."""
 
     def setUp(self):
@@ -247,7 +297,7 @@ class FolderAPITests(APITestCase):
         self.assertEqual(len(response.data), 2)
 
 
-class TagAPITests(APITestCase):
+class TagAPITests(TempMediaRootMixin, APITestCase):
     """Tests for Tag API endpoints."""
 
     def setUp(self):
@@ -288,4 +338,2103 @@ class TagAPITests(APITestCase):
         
         response = self.client.get(f"/api/media-manager/tags/{tag.id}/media_count/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["media_count"], 1)
\ No newline at end of file
+        self.assertEqual(response.data["media_count"], 1)
+
+
+class ChunkedUploadAPITests(TempMediaRootMixin, APITestCase):
+    """Tests for resumable chunked upload endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.content = b"0123456789" * 10
+
+        upload_settings = self.settings(MEDIA_MANAGER_UPLOAD_TEMP_DIR=self.make_temp_dir())
+        upload_settings.enable()
+        self.addCleanup(upload_settings.disable)
+
+    def start_upload(self, **extra):
+        data = {
+            "filename": "notes.txt",
+            "size": len(self.content),
+            "checksum": hashlib.sha256(self.content).hexdigest(),
+            "title": "Notes",
+        }
+        data.update(extra)
+        return self.client.post("/api/media-manager/media/uploads/", data, format="json")
+
+    def put_chunk(self, upload_id, offset, chunk, checksum=None):
+        headers = {}
+        if checksum is not None:
+            headers["HTTP_X_CHUNK_CHECKSUM"] = checksum
+        return self.client.put(
+            f"/api/media-manager/media/uploads/{upload_id}/?offset={offset}",
+            data=chunk,
+            content_type="application/octet-stream",
+            **headers
+        )
+
+    def test_chunked_upload_flow(self):
+        """Test init, chunk upload and finalize create media."""
+        response = self.start_upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data["id"]
+        self.assertEqual(response.data["offset"], 0)
+
+        first, second = self.content[:60], self.content[60:]
+        response = self.put_chunk(upload_id, 0, first, hashlib.sha256(first).hexdigest())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["offset"], 60)
+
+        response = self.put_chunk(upload_id, 60, second)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(f"/api/media-manager/media/uploads/{upload_id}/finalize/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["title"], "Notes")
+        self.assertEqual(response.data["size"], len(self.content))
+        self.assertFalse(UploadSession.objects.filter(pk=upload_id).exists())
+
+    def test_offset_mismatch_returns_current_offset(self):
+        """Test chunk at the wrong offset is rejected."""
+        upload_id = self.start_upload().data["id"]
+        response = self.put_chunk(upload_id, 10, self.content[10:20])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], 0)
+
+    def test_chunk_checksum_mismatch(self):
+        """Test corrupted chunk is rejected and not counted."""
+        upload_id = self.start_upload().data["id"]
+        response = self.put_chunk(upload_id, 0, self.content[:50], "0" * 64)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).received_size, 0)
+
+    def test_finalize_incomplete_upload(self):
+        """Test finalize refuses an incomplete upload."""
+        upload_id = self.start_upload().data["id"]
+        self.put_chunk(upload_id, 0, self.content[:50])
+        response = self.client.post(f"/api/media-manager/media/uploads/{upload_id}/finalize/")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_chunk_is_written_after_claiming_the_session(self):
+        """Test a chunk is written with the session claimed, and concurrent chunks are refused."""
+        upload_id = self.start_upload().data["id"]
+        write_chunk = uploads.write_chunk
+
+        def concurrent_write(session, *args, **kwargs):
+            self.assertEqual(UploadSession.objects.get(pk=upload_id).status, "receiving")
+            response = self.put_chunk(upload_id, 0, self.content[:50])
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            response = self.client.post(f"/api/media-manager/media/uploads/{upload_id}/finalize/")
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            return write_chunk(session, *args, **kwargs)
+
+        with mock.patch("media_manager.uploads.write_chunk", side_effect=concurrent_write):
+            response = self.put_chunk(upload_id, 0, self.content[:50])
+        self.assertEqual(response.data["offset"], 50)
+        session = UploadSession.objects.get(pk=upload_id)
+        self.assertEqual((session.status, session.received_size), ("open", 50))
+
+        # A claim left behind by a crashed request times out
+        uploads.begin_chunk(session)
+        self.assertEqual(self.put_chunk(upload_id, 50, self.content[50:]).status_code, status.HTTP_409_CONFLICT)
+        with override_settings(MEDIA_MANAGER_UPLOAD_CLAIM_TIMEOUT=0):
+            self.assertEqual(self.put_chunk(upload_id, 50, self.content[50:]).status_code, status.HTTP_200_OK)
+
+    def test_finalize_creates_one_media(self):
+        """Test finalizing twice creates a single media and releases the reservation once."""
+        upload_id = self.start_upload().data["id"]
+        self.put_chunk(upload_id, 0, self.content)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/media-manager/media/uploads/{upload_id}/finalize/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(f"/api/media-manager/media/uploads/{upload_id}/finalize/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(Media.objects.filter(uploaded_by=self.user).count(), 1)
+        self.assertEqual(quotas.get_usage(self.user.pk)["reserved"], 0)
+        self.assertFalse(uploads.get_temp_path(UploadSession(pk=upload_id)).exists())
+
+    def test_expired_sessions_are_removed(self):
+        """Test expire_uploads deletes idle sessions, their temp files and reservations."""
+        expired_id = self.start_upload().data["id"]
+        self.put_chunk(expired_id, 0, self.content[:50])
+        active_id = self.start_upload().data["id"]
+        UploadSession.objects.filter(pk=expired_id).update(expires_at=timezone.now())
+        self.assertEqual(quotas.get_usage(self.user.pk)["reserved"], 2 * len(self.content))
+
+        response = self.client.get(f"/api/media-manager/media/uploads/{expired_id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.put_chunk(expired_id, 50, self.content[50:])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        call_command("expire_uploads", stdout=io.StringIO())
+        self.assertEqual(list(UploadSession.objects.values_list("pk", flat=True)), [uuid.UUID(active_id)])
+        self.assertFalse(uploads.get_temp_path(UploadSession(pk=expired_id)).exists())
+        self.assertEqual(quotas.get_usage(self.user.pk)["reserved"], len(self.content))
+
+
+
+@override_settings(MEDIA_MANAGER_DELETION_GRACE_SECONDS=0)
+class DeduplicatedStorageTests(TempMediaRootMixin, TestCase):
+    """Tests for content-addressed media storage."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+
+    def create_media(self, name, content=b"press photo"):
+        return Media.objects.create(
+            file=SimpleUploadedFile(name, content),
+            uploaded_by=self.user,
+        )
+
+    def test_identical_uploads_share_blob(self):
+        """Test same content is stored once under a sharded path."""
+        first = self.create_media("a.jpg")
+        second = self.create_media("b.jpg")
+        digest = hashlib.sha256(b"press photo").hexdigest()
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.file.name, f"cas/{digest[:2]}/{digest[2:4]}/{digest}.jpg")
+        self.assertEqual(first.content_hash, digest)
+        self.assertEqual(MediaBlob.objects.get(name=first.file.name).ref_count, 2)
+
+    def test_blob_removed_with_last_reference(self):
+        """Test file is only deleted when the last Media goes."""
+        first = self.create_media("a.jpg")
+        second = self.create_media("b.jpg")
+        storage, name = first.file.storage, first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        process_deletions()
+        self.assertTrue(storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertTrue(storage.exists(name))
+        process_deletions()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_requeued_blob_survives_deletion(self):
+        """Test a blob re-uploaded after being queued is not deleted."""
+        first = self.create_media("a.jpg")
+        storage, name = first.file.storage, first.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.create_media("b.jpg")
+
+        self.assertEqual(process_deletions(), (1, 0))
+        self.assertTrue(storage.exists(name))
+        self.assertFalse(StorageDeletion.objects.exists())
+
+    @override_settings(MEDIA_MANAGER_DELETION_GRACE_SECONDS=300)
+    def test_blob_reused_before_commit_survives_deletion(self):
+        """Test a blob reused by an upload whose row has not committed yet is not deleted."""
+        first = self.create_media("a.jpg")
+        storage, name = first.file.storage, first.file.name
+        old = time.time() - 3600
+        os.utime(storage.path(name), (old, old))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        # The upload has stored its file, but its Media row is not visible yet
+        self.assertEqual(storage.save("b.jpg", SimpleUploadedFile("b.jpg", b"press photo")), name)
+        self.assertEqual(process_deletions(), (0, 0))
+        self.assertTrue(storage.exists(name))
+        self.assertGreater(StorageDeletion.objects.get().next_attempt_at, timezone.now())
+
+        # The upload never committed: the blob goes once the grace period is over
+        os.utime(storage.path(name), (old, old))
+        StorageDeletion.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_deletions(), (1, 0))
+        self.assertFalse(storage.exists(name))
+
+    def test_uploaded_name_is_kept(self):
+        """Test the name a blob was uploaded under is used for downloads and search."""
+        media = self.create_media("Harbour at dusk.jpg")
+        self.assertTrue(media.file.name.startswith("cas/"))
+        self.assertEqual(media.original_filename, "Harbour at dusk.jpg")
+        self.assertEqual(get_download_name(media), "Harbour at dusk.jpg")
+        self.assertEqual(MediaDocument().prepare(media)["file_name"], "Harbour at dusk.jpg")
+
+        page = search_backends.DatabaseBackend().search(self.user, "harbour", source_fields=["id"])
+        self.assertEqual([row["id"] for row in page["results"]], [media.pk])
+        page = search_backends.DatabaseBackend().search(self.user, "cas", source_fields=["id"])
+        self.assertEqual(page["count"], 0)
+
+    def test_failed_deletion_is_retried_later(self):
+        """Test storage errors are recorded and backed off."""
+        StorageDeletion.objects.create(storage="media", name="missing/../../outside.txt")
+        self.assertEqual(process_deletions(), (0, 1))
+        item = StorageDeletion.objects.get()
+        self.assertEqual(item.attempts, 1)
+        self.assertTrue(item.last_error)
+        self.assertGreater(item.next_attempt_at, timezone.now())
+        self.assertEqual(process_deletions(), (0, 0))
+
+
+
+def make_image(size=(1200, 800), fmt="JPEG", color=(200, 30, 30)):
+    """Build an in-memory image file."""
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_MANAGER_PROCESSING_WORKERS=0)
+class RenditionTests(TempMediaRootMixin, APITestCase):
+    """Tests for image rendition generation."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_upload_generates_renditions(self):
+        """Test renditions are created after upload and listed."""
+        file = SimpleUploadedFile("photo.jpg", make_image(), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/media-manager/media/", {"file": file}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        media = Media.objects.get()
+        thumb = MediaRendition.objects.get(media=media, name="thumb", format="webp")
+        self.assertEqual((thumb.width, thumb.height), (160, 107))
+        self.assertEqual(media.renditions.count(), 6)
+        self.assertEqual(media.processing_status, "done")
+
+        response = self.client.get(f"/api/media-manager/media/{media.id}/")
+        self.assertEqual(len(response.data["renditions"]), 6)
+
+    def test_corrupt_image_is_skipped(self):
+        """Test undecodable images do not create renditions."""
+        with self.captureOnCommitCallbacks(execute=True):
+            media = Media.objects.create(
+                file=SimpleUploadedFile("broken.jpg", b"not an image"),
+                uploaded_by=self.user,
+            )
+        self.assertFalse(MediaRendition.objects.exists())
+        media.refresh_from_db()
+        self.assertEqual(media.processing_status, "failed")
+
+    @override_settings(MEDIA_MANAGER_PROCESSING_DEFERRED=True)
+    def test_pending_media_processed_by_command(self):
+        """Test deferred uploads stay pending in the database until process_media --pending runs."""
+        with self.captureOnCommitCallbacks(execute=True):
+            media = Media.objects.create(file=SimpleUploadedFile("photo.jpg", make_image()), uploaded_by=self.user)
+        media.refresh_from_db()
+        self.assertEqual(media.processing_status, "pending")
+        self.assertFalse(media.renditions.exists())
+
+        # Threads stand in for worker processes, which cannot share the test database
+        command = "media_manager.management.commands.process_media"
+        with mock.patch(f"{command}.ProcessPoolExecutor", ThreadPoolExecutor), mock.patch(f"{command}.connections"):
+            call_command("process_media", pending=True, workers=1, stdout=io.StringIO())
+        media.refresh_from_db()
+        self.assertEqual(media.processing_status, "done")
+        self.assertEqual(media.renditions.count(), 6)
+
+
+
+@override_settings(MEDIA_MANAGER_PROCESSING_WORKERS=0)
+class MediaRenderTests(TempMediaRootMixin, APITestCase):
+    """Tests for on-demand image variants."""
+
+    def setUp(self):
+        transforms._variant_cache = None
+        variant_settings = self.settings(MEDIA_MANAGER_VARIANT_CACHE_DIR=self.make_temp_dir())
+        variant_settings.enable()
+        self.addCleanup(variant_settings.disable)
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.other_user = User.objects.create_user(
+            username="otheruser",
+            email="other@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.media = Media.objects.create(
+            file=SimpleUploadedFile("photo.png", make_image(fmt="PNG")),
+            uploaded_by=self.user,
+        )
+
+    def tearDown(self):
+        transforms._variant_cache = None
+
+    def test_render_variant(self):
+        """Test variant is resized, encoded and cacheable."""
+        url = f"/api/media-manager/media/{self.media.id}/render/?w=300&fmt=jpeg&q=70&v={self.media.content_hash}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", response["Cache-Control"])
+        image = Image.open(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(image.size, (300, 200))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalid_parameters(self):
+        """Test out-of-range width is rejected."""
+        response = self.client.get(f"/api/media-manager/media/{self.media.id}/render/?w=99999")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_render_requires_ownership(self):
+        """Test other users cannot render someone else's media."""
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(f"/api/media-manager/media/{self.media.id}/render/?w=100")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_variant_cache_evicts_least_recently_used(self):
+        """Test the disk cache stays under its size cap."""
+        cache = transforms.VariantCache(self.make_temp_dir(), max_bytes=250)
+
+        def writer(size):
+            return lambda path: open(path, "wb").write(b"x" * size)
+
+        first = cache.get_or_create("aa-first", writer(100))
+        cache.get_or_create("bb-second", writer(100))
+        cache.get("aa-first")
+        os.utime(cache.path_for("bb-second"), (time.time() - 60, time.time() - 60))
+        cache.get_or_create("cc-third", writer(100))
+
+        self.assertTrue(first.exists())
+        self.assertIsNone(cache.get("bb-second"))
+        self.assertIsNotNone(cache.get("cc-third"))
+
+
+
+@override_settings(MEDIA_MANAGER_SENDFILE_BACKEND=None)
+class MediaStreamTests(TempMediaRootMixin, APITestCase):
+    """Tests for range-aware media delivery."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.content = bytes(range(256)) * 4
+        self.media = Media.objects.create(
+            file=SimpleUploadedFile("clip.mp4", self.content),
+            title="Clip",
+            uploaded_by=self.user,
+        )
+        self.url = f"/api/media-manager/media/{self.media.id}/stream/"
+
+    def test_full_download(self):
+        """Test whole file is streamed with validators."""
+        response = self.client.get(self.url + "?download=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["ETag"], f'"{self.media.content_hash}"')
+        self.assertIn('attachment; filename="Clip.mp4"', response["Content-Disposition"])
+
+    def test_uploads_cannot_run_script(self):
+        """Test responses are sandboxed and active types are only served as downloads."""
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        self.assertEqual(response["Content-Security-Policy"], "sandbox")
+        self.assertIn("inline", response["Content-Disposition"])
+
+        page = Media.objects.create(
+            file=SimpleUploadedFile("page.html", b"<html><script>alert(1)</script></html>"),
+            uploaded_by=self.user,
+        )
+        Media.objects.filter(pk=page.pk).update(mime_type="text/html; charset=utf-8")
+        response = self.client.get(f"/api/media-manager/media/{page.id}/stream/")
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+        self.assertEqual(response["Content-Security-Policy"], "sandbox")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.media.content_hash}"')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+
+    def test_byte_range(self):
+        """Test a single byte range returns 206 with only those bytes."""
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.content)}")
+        self.assertEqual(response["Content-Length"], "10")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-5:])
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end is rejected."""
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_conditional_requests(self):
+        """Test If-None-Match and a stale If-Range."""
+        etag = f'"{self.media.content_hash}"'
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(MEDIA_MANAGER_SENDFILE_BACKEND="x-accel-redirect")
+    def test_accel_redirect_offload(self):
+        """Test offload mode hands the file to the web server."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.media.file.name}")
+        self.assertEqual(response.content, b"")
+
+
+
+class MediaBatchUploadTests(TempMediaRootMixin, APITestCase):
+    """Tests for multi-file batch upload."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.folder = Folder.objects.create(name="Event", owner=self.user)
+        self.tag = Tag.objects.create(name="gallery", owner=self.user)
+
+    def test_batch_upload(self):
+        """Test many files are created with shared folder and tags."""
+        files = [
+            SimpleUploadedFile(f"photo{i}.jpg", f"photo {i}".encode(), content_type="image/jpeg")
+            for i in range(3)
+        ] + [SimpleUploadedFile("copy.jpg", b"photo 0", content_type="image/jpeg")]
+        response = self.client.post(
+            "/api/media-manager/media/batch/",
+            {"files": files, "folder": self.folder.id, "tag_ids": [self.tag.id]},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 4)
+        self.assertEqual([r["file"] for r in response.data["results"]], ["photo0.jpg", "photo1.jpg", "photo2.jpg", "copy.jpg"])
+
+        media = Media.objects.filter(folder=self.folder)
+        self.assertEqual(media.count(), 4)
+        self.assertEqual(media.filter(tags=self.tag, file_type="image").count(), 4)
+        first = Media.objects.get(pk=response.data["results"][0]["id"])
+        self.assertEqual(first.size, len(b"photo 0"))
+        self.assertEqual(MediaBlob.objects.get(name=first.file.name).ref_count, 2)
+
+    def test_batch_upload_rejects_foreign_folder(self):
+        """Test folder ownership is validated."""
+        other = User.objects.create_user(username="other", email="o@example.com", password="x")
+        folder = Folder.objects.create(name="Theirs", owner=other)
+        response = self.client.post(
+            "/api/media-manager/media/batch/",
+            {"files": [SimpleUploadedFile("a.jpg", b"a")], "folder": folder.id},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+@override_settings(MEDIA_MANAGER_DELETION_GRACE_SECONDS=0)
+class MediaBulkActionTests(TempMediaRootMixin, APITestCase):
+    """Tests for bulk media operations."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(name="archive", owner=self.user)
+        self.folder = Folder.objects.create(name="Archive", owner=self.user)
+        self.media = [
+            Media.objects.create(
+                file=SimpleUploadedFile(f"clip{i}.mp4", f"clip {i}".encode()),
+                uploaded_by=self.user,
+            )
+            for i in range(3)
+        ]
+        self.photo = Media.objects.create(
+            file=SimpleUploadedFile("photo.jpg", b"photo"),
+            uploaded_by=self.user,
+        )
+
+    def bulk(self, data):
+        return self.client.post("/api/media-manager/media/bulk/", data, format="json")
+
+    def test_add_and_remove_tags_by_ids(self):
+        """Test tags are added and removed for a set of ids."""
+        ids = [m.id for m in self.media]
+        response = self.bulk({"action": "add_tags", "ids": ids, "tag_ids": [self.tag.id]})
+        self.assertEqual(response.data, {"action": "add_tags", "matched": 3, "affected": 3})
+        self.assertEqual(self.tag.media.count(), 3)
+
+        response = self.bulk({"action": "remove_tags", "ids": ids[:2], "tag_ids": [self.tag.id]})
+        self.assertEqual(response.data["affected"], 2)
+        self.assertEqual(self.tag.media.count(), 1)
+
+    def test_move_by_filter(self):
+        """Test filter expression selects media to move."""
+        response = self.bulk({"action": "move", "filter": {"file_type": "video"}, "folder_id": self.folder.id})
+        self.assertEqual(response.data["matched"], 3)
+        self.assertEqual(self.folder.media.count(), 3)
+        self.photo.refresh_from_db()
+        self.assertIsNone(self.photo.folder)
+
+    def test_delete_trashes_and_purge_removes_files(self):
+        """Test bulk delete trashes rows; purging removes them and their stored files."""
+        storage = self.photo.file.storage
+        names = [m.file.name for m in self.media]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.bulk({"action": "delete", "filter": {"file_type": "video"}})
+        self.assertEqual(response.data["affected"], 3)
+        self.assertEqual(Media.objects.count(), 1)
+        self.assertEqual(Media.all_objects.count(), 4)
+        self.assertFalse(StorageDeletion.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(trash.purge(before=timezone.now()), (3, 0))
+        self.assertEqual(Media.all_objects.count(), 1)
+        self.assertEqual(StorageDeletion.objects.count(), 3)
+        process_deletions()
+        self.assertFalse(any(storage.exists(name) for name in names))
+        self.assertFalse(MediaBlob.objects.filter(name__in=names).exists())
+
+    def test_requires_single_selector(self):
+        """Test ids and filter are mutually exclusive."""
+        response = self.bulk({"action": "delete", "ids": [self.photo.id], "filter": {"file_type": "image"}})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_media_untouched(self):
+        """Test ids owned by someone else are not matched."""
+        other = User.objects.create_user(username="other", email="o@example.com", password="x")
+        theirs = Media.objects.create(file=SimpleUploadedFile("t.jpg", b"t"), uploaded_by=other)
+        response = self.bulk({"action": "delete", "ids": [theirs.id]})
+        self.assertEqual(response.data["matched"], 0)
+        self.assertTrue(Media.objects.filter(pk=theirs.pk).exists())
+
+
+class ContentSniffingTests(TempMediaRootMixin, TestCase):
+    """Tests for magic-byte file type detection."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+
+    def test_sample_corpus(self):
+        """Test every sample header is identified."""
+        for filename, header, mime_type in sample_headers():
+            self.assertEqual(detect_mime_type(filename, header), mime_type, filename)
+
+    def test_content_wins_over_extension(self):
+        """Test misnamed files are classified by their bytes."""
+        png = make_image(fmt="PNG")
+        self.assertEqual(detect_file_type("scan.txt", header=png[:4096]), "image")
+        self.assertEqual(detect_file_type("movie.jpg", header=b"\x00\x00\x00\x18ftypisom"), "video")
+        self.assertEqual(detect_file_type("notes.md", header=b"# Notes"), "document")
+
+    def test_zip_declared_type_is_whitelisted(self):
+        """Test a ZIP cannot declare an active type in its mimetype entry."""
+        for declared in (b"text/html", b"image/svg+xml", b"application/vnd.oasis.opendocument.text<script>"):
+            header = sniffing.ZIP_MAGIC + b"\x00" * 26 + b"mimetype" + declared + sniffing.ZIP_MAGIC
+            self.assertEqual(detect_mime_type("page.html", header), "application/zip", declared)
+        header = sniffing.ZIP_MAGIC + b"\x00" * 26 + b"mimetypetext/html" + sniffing.ZIP_MAGIC + b"word/document.xml"
+        self.assertEqual(
+            detect_mime_type("report.docx", header),
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        )
+        header = sniffing.ZIP_MAGIC + b"\x00" * 26 + b"mimetypeapplication/epub+zip" + sniffing.ZIP_MAGIC
+        self.assertEqual(detect_mime_type("book.epub", header), "application/epub+zip")
+
+    def test_upload_records_mime_type(self):
+        """Test saving a misnamed upload stores sniffed type and mime type."""
+        media = Media.objects.create(
+            file=SimpleUploadedFile("holiday.mp4", make_image(fmt="PNG")),
+            uploaded_by=self.user,
+        )
+        self.assertEqual(media.file_type, "image")
+        self.assertEqual(media.mime_type, "image/png")
+
+    def test_benchmark_command(self):
+        """Test the benchmark verifies the corpus and reports throughput."""
+        out = io.StringIO()
+        call_command("benchmark_sniffing", rounds=1, stdout=out)
+        self.assertIn("calls/s", out.getvalue())
+
+
+def make_exif_image():
+    """Build a landscape JPEG whose EXIF rotates it to portrait."""
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = "Canon"
+    exif[0x0110] = "EOS R5"
+    exif.get_ifd(0x8769)[0x9003] = "2024:06:01 12:30:00"
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 800), (10, 90, 160)).save(buffer, format="JPEG", exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_MANAGER_PROCESSING_WORKERS=0)
+class MediaMetadataTests(TempMediaRootMixin, APITestCase):
+    """Tests for metadata extraction during processing."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            media = Media.objects.create(file=SimpleUploadedFile(name, content), uploaded_by=self.user)
+        media.refresh_from_db()
+        return media
+
+    def test_image_dimensions_and_exif(self):
+        """Test EXIF orientation, capture time and camera are stored."""
+        media = self.upload("photo.jpg", make_exif_image())
+        self.assertEqual((media.width, media.height), (800, 1200))
+        self.assertEqual(media.orientation, "portrait")
+        self.assertEqual((media.camera_make, media.camera_model), ("Canon", "EOS R5"))
+        self.assertEqual(timezone.localtime(media.captured_at).strftime("%Y-%m-%d %H:%M"), "2024-06-01 12:30")
+
+    def test_pdf_page_count(self):
+        """Test page count is read from the page tree."""
+        pdf = (
+            b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+            b"2 0 obj << /Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 3 >> endobj\n"
+            b"trailer << /Root 1 0 R >>\n%%EOF\n"
+        )
+        media = self.upload("report.pdf", pdf)
+        self.assertEqual(media.file_type, "document")
+        self.assertEqual(media.page_count, 3)
+        self.assertIsNone(media.width)
+
+    def test_list_filters_by_orientation_and_width(self):
+        """Test list endpoint filters on extracted columns."""
+        self.upload("wide.jpg", make_image(size=(1600, 900)))
+        self.upload("tall.jpg", make_image(size=(600, 900), color=(1, 2, 3)))
+
+        response = self.client.get("/api/media-manager/media/", {"orientation": "landscape"})
+        self.assertEqual([item["width"] for item in response.data["results"]], [1600])
+
+        response = self.client.get("/api/media-manager/media/", {"min_width": "700"})
+        self.assertEqual(len(response.data["results"]), 1)
+
+        response = self.client.get("/api/media-manager/media/", {"min_width": "wide"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_MANAGER_DEDUPLICATE_UPLOADS=False)
+class ShardedLayoutTests(TempMediaRootMixin, TestCase):
+    """Tests for the sharded upload layout and relocation command."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.folder = Folder.objects.create(name="Press", owner=self.user)
+
+    def create_media(self, name="photo.jpg"):
+        return Media.objects.create(
+            file=SimpleUploadedFile(name, b"press photo"),
+            folder=self.folder,
+            uploaded_by=self.user,
+        )
+
+    def test_upload_is_sharded_independent_of_folder(self):
+        """Test new files land under media/ab/cd/ regardless of folder."""
+        media = self.create_media()
+        self.assertTrue(is_sharded_name(media.file.name), media.file.name)
+        self.assertNotIn("Press", media.file.name)
+        self.assertEqual(original_filename(media.file.name), "photo.jpg")
+
+    def test_relocate_legacy_files(self):
+        """Test legacy folder paths are moved and rows rewritten."""
+        with override_settings(MEDIA_MANAGER_UPLOAD_LAYOUT="folder"):
+            media = self.create_media()
+        legacy = media.file.name
+        self.assertEqual(legacy, "media/Press/photo.jpg")
+
+        call_command("relocate_media", stdout=io.StringIO())
+        media.refresh_from_db()
+        self.assertTrue(is_sharded_name(media.file.name))
+        self.assertTrue(media.file.storage.exists(media.file.name))
+        self.assertFalse(media.file.storage.exists(legacy))
+        self.assertFalse(os.path.exists(os.path.dirname(media.file.storage.path(legacy))))
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=True)
+class SearchQueueTests(TempMediaRootMixin, APITestCase):
+    """Tests for the queued search index signal processor."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+
+    def create_media(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Media.objects.create(file=SimpleUploadedFile("a.mp4", b"clip"), uploaded_by=self.user)
+
+    def test_changes_coalesce_per_object(self):
+        """Test repeated saves keep one entry and deletes replace it."""
+        media = self.create_media()
+        enqueued_at = SearchIndexQueue.objects.get().enqueued_at
+        with self.captureOnCommitCallbacks(execute=True):
+            media.title = "Renamed"
+            media.save()
+        entry = SearchIndexQueue.objects.get()
+        self.assertEqual((entry.object_id, entry.op), (str(media.pk), "index"))
+        self.assertEqual(entry.enqueued_at, enqueued_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            media.delete()
+        self.assertEqual(SearchIndexQueue.objects.get().op, "delete")
+
+    def test_rollback_queues_nothing(self):
+        """Test changes are only queued when the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=False):
+            Media.objects.create(file=SimpleUploadedFile("a.mp4", b"clip"), uploaded_by=self.user)
+        self.assertFalse(SearchIndexQueue.objects.exists())
+
+    def test_flush_sends_one_bulk_request(self):
+        """Test flush indexes live rows, deletes missing ones and empties the queue."""
+        kept = self.create_media()
+        gone = self.create_media()
+        Media.objects.filter(pk=gone.pk).delete()
+
+        with mock.patch.object(MediaDocument, "bulk", return_value=(2, [])) as bulk, \
+                mock.patch.object(MediaDocument, "mget", return_value=[]):
+            self.assertEqual(search_queue.flush(), (2, 0))
+        actions = bulk.call_args.args[0]
+        self.assertEqual(
+            sorted((action["_op_type"], str(action["_id"])) for action in actions),
+            [("delete", str(gone.pk)), ("index", str(kept.pk))],
+        )
+        self.assertFalse(SearchIndexQueue.objects.exists())
+
+    def test_entry_requeued_during_flush_is_kept(self):
+        """Test a change made while a batch is in flight is not lost."""
+        media = self.create_media()
+
+        def requeue(actions, **kwargs):
+            SearchIndexQueue.objects.filter(object_id=str(media.pk)).update(updated_at=timezone.now())
+            return len(actions), []
+
+        with mock.patch.object(MediaDocument, "bulk", side_effect=requeue):
+            search_queue.flush()
+        self.assertTrue(SearchIndexQueue.objects.exists())
+
+    def test_failed_item_stays_queued(self):
+        """Test only the item Elasticsearch rejected is kept, and retried after a backoff."""
+        self.create_media()
+        rejected = self.create_media()
+        error = {"index": {"_id": str(rejected.pk), "status": 400, "error": {"type": "mapper_parsing_exception"}}}
+
+        with mock.patch.object(MediaDocument, "bulk", return_value=(1, [error])):
+            self.assertEqual(search_queue.flush(), (2, 1))
+        entry = SearchIndexQueue.objects.get()
+        self.assertEqual((entry.object_id, entry.attempts), (str(rejected.pk), 1))
+        self.assertIn("mapper_parsing_exception", entry.last_error)
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertEqual(search_queue.queue_stats()["failing"], 1)
+
+        with mock.patch.object(MediaDocument, "bulk", return_value=(1, [])) as bulk:
+            self.assertEqual(search_queue.flush(), (0, 0))
+            bulk.assert_not_called()
+            SearchIndexQueue.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(search_queue.flush(), (1, 0))
+        self.assertEqual([str(action["_id"]) for action in bulk.call_args.args[0]], [str(rejected.pk)])
+        self.assertFalse(SearchIndexQueue.objects.exists())
+
+    def test_health_endpoint(self):
+        """Test staff can read queue depth and lag."""
+        self.create_media()
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username="ops", email="ops@example.com", password="x", is_staff=True))
+        response = client.get("/api/media-manager/search/health/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["depth"], 1)
+        self.assertGreaterEqual(response.data["lag_seconds"], 0)
+
+
+class ReindexSerializationTests(TempMediaRootMixin, TestCase):
+    """Tests for chunked document serialization used by reindex_media."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        parent = Folder.objects.create(name="Press", owner=self.user)
+        self.folder = Folder.objects.create(name="2024", parent=parent, owner=self.user)
+        self.tag = Tag.objects.create(name="launch", owner=self.user)
+
+    def create_media(self, count):
+        for i in range(count):
+            media = Media.objects.create(
+                file=SimpleUploadedFile(f"clip{i}.mp4", f"clip {i}".encode()),
+                folder=self.folder,
+                uploaded_by=self.user,
+            )
+            media.tags.add(self.tag)
+        return list(Media.objects.values_list("pk", flat=True))
+
+    def test_folder_paths_resolved_per_level(self):
+        """Test nested folder paths match Folder.get_full_path."""
+        with self.assertNumQueries(2):
+            paths = Folder.get_full_paths({self.folder.pk})
+        self.assertEqual(paths, {self.folder.pk: self.folder.get_full_path()})
+
+    def test_serialize_chunk_query_count_is_constant(self):
+        """Test a chunk costs the same queries for 1 or 10 media."""
+        ids = self.create_media(10)
+        with self.assertNumQueries(4):
+            actions = serialize_chunk(("media-test", ids[:1]))
+        with self.assertNumQueries(4):
+            actions = serialize_chunk(("media-test", ids))
+
+        self.assertEqual(len(actions), 10)
+        source = actions[0]["_source"]
+        self.assertEqual(actions[0]["_index"], "media-test")
+        self.assertEqual(source["folder_path"], "Press/2024")
+        self.assertEqual(source["tags"], [{"id": self.tag.id, "name": "launch"}])
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=True)
+class RelatedIndexingTests(TempMediaRootMixin, TestCase):
+    """Tests for cascading Tag, Folder and User changes into the index."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.parent = Folder.objects.create(name="Press", owner=self.user)
+        self.child = Folder.objects.create(name="2024", parent=self.parent, owner=self.user)
+        self.other = Folder.objects.create(name="Other", owner=self.user)
+        self.tag = Tag.objects.create(name="launch", owner=self.user)
+        self.in_child = Media.objects.create(
+            file=SimpleUploadedFile("a.mp4", b"a"), folder=self.child, uploaded_by=self.user,
+        )
+        self.in_other = Media.objects.create(
+            file=SimpleUploadedFile("b.mp4", b"b"), folder=self.other, uploaded_by=self.user,
+        )
+        self.in_child.tags.add(self.tag)
+        SearchIndexQueue.objects.all().delete()
+
+    def queued_ids(self):
+        return set(SearchIndexQueue.objects.values_list("object_id", flat=True))
+
+    def test_descendant_ids(self):
+        """Test the recursive query returns the whole subtree."""
+        self.assertEqual(set(self.parent.get_descendant_ids()), {self.parent.pk, self.child.pk})
+        self.assertEqual(self.parent.get_descendant_ids(include_self=False), [self.child.pk])
+        self.assertEqual(set(self.parent.get_all_media()), {self.in_child})
+
+    def test_folder_rename_reindexes_subtree(self):
+        """Test renaming a parent folder queues media in its descendants only."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parent.name = "News"
+            self.parent.save()
+        self.assertEqual(self.queued_ids(), {str(self.in_child.pk)})
+
+    def test_tag_rename_reindexes_tagged_media(self):
+        """Test renaming a tag queues exactly its media."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "release"
+            self.tag.save()
+        self.assertEqual(self.queued_ids(), {str(self.in_child.pk)})
+
+    def test_unchanged_saves_do_not_cascade(self):
+        """Test saves that leave indexed fields alone queue nothing."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.save()
+            self.other.save()
+            self.user.last_login = timezone.now()
+            self.user.save()
+        self.assertFalse(SearchIndexQueue.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = "renamed"
+            self.user.save()
+        self.assertEqual(self.queued_ids(), {str(self.in_child.pk), str(self.in_other.pk)})
+
+    def test_flush_query_count_is_constant(self):
+        """Test preparing documents does not query per media."""
+        for i in range(5):
+            Media.objects.create(
+                file=SimpleUploadedFile(f"c{i}.mp4", f"c{i}".encode()), folder=self.child, uploaded_by=self.user,
+            ).tags.add(self.tag)
+        with self.captureOnCommitCallbacks(execute=True):
+            search_queue.enqueue(Media, Media.objects.values_list("pk", flat=True))
+
+        def consume(actions, **kwargs):
+            return len(list(actions)), []
+
+        # queue batch, media + tags prefetch, one query per folder level, rebuilds, queue cleanup (select + delete)
+        with mock.patch.object(MediaDocument, "bulk", side_effect=consume), self.assertNumQueries(8):
+            self.assertEqual(search_queue.flush(), (7, 0))
+
+    def test_tag_rename_during_rebuild_is_replayed(self):
+        """Test a tag renamed mid-rebuild reaches the new index before the swap."""
+        rebuild = start_rebuild("media-new")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "release"
+            self.tag.save()
+        with mock.patch.object(MediaDocument, "bulk", return_value=(1, [])):
+            self.assertEqual(search_queue.flush(), (1, 0))
+        # Sent to the old index, but kept for the rebuild
+        self.assertEqual(self.queued_ids(), {str(self.in_child.pk)})
+        self.assertEqual(search_queue.queue_stats()["depth"], 0)
+
+        actions = replay_actions(rebuild)
+        self.assertEqual([action["_id"] for action in actions], [self.in_child.pk])
+        self.assertEqual(actions[0]["_index"], "media-new")
+        self.assertEqual(actions[0]["_source"]["tags"], [{"id": self.tag.id, "name": "release"}])
+
+        finish_rebuild(rebuild, resend_after=timezone.now())
+        self.assertFalse(SearchIndexQueue.objects.exists())
+
+    def test_changes_flushed_after_replay_are_resent(self):
+        """Test changes that only reached the old index are queued again after the swap."""
+        rebuild = start_rebuild("media-new")
+        replayed_at = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "release"
+            self.tag.save()
+        with mock.patch.object(MediaDocument, "bulk", return_value=(1, [])):
+            search_queue.flush()
+
+        finish_rebuild(rebuild, resend_after=replayed_at)
+        self.assertEqual(self.queued_ids(), {str(self.in_child.pk)})
+        self.assertEqual(search_queue.queue_stats()["depth"], 1)
+
+
+class SearchResultsTests(TempMediaRootMixin, APITestCase):
+    """Tests for rendering and paginating search hits."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.other = User.objects.create_user(
+            username="other",
+            email="other@example.com",
+            password="testpass123",
+        )
+        self.media = [
+            Media.objects.create(
+                file=SimpleUploadedFile(f"m{i}.mp4", f"m{i}".encode()), title=f"Media {i}", uploaded_by=self.user,
+            )
+            for i in range(3)
+        ]
+        self.foreign = Media.objects.create(
+            file=SimpleUploadedFile("x.mp4", b"x"), title="Foreign", uploaded_by=self.other,
+        )
+
+    def response_for(self, media, total=None):
+        """Fake Elasticsearch response with hits in the given order."""
+        from elasticsearch.dsl.response import Response as ESResponse
+
+        hits = [
+            {
+                "_index": "media",
+                "_id": str(item.pk),
+                "_source": {"id": item.pk, "title": item.title},
+                "sort": [item.pk],
+            }
+            for item in media
+        ]
+        total = len(hits) if total is None else total
+        return ESResponse(MediaDocument.search(), {"hits": {"total": {"value": total, "relation": "eq"}, "hits": hits}})
+
+    def test_parse_fields(self):
+        """Test field selection splits into source and hydrated fields."""
+        self.assertEqual(search_results.parse_fields(""), (list(search_results.SOURCE_FIELDS), []))
+        self.assertEqual(search_results.parse_fields("title, file"), (["id", "title"], ["file"]))
+        with self.assertRaises(ValueError):
+            search_results.parse_fields("title,password")
+
+    def test_paginate_uses_search_after(self):
+        """Test cursors turn into search_after with a stable sort."""
+        cursor = search_results.encode_cursor([1.5, 1700000000000, 42])
+        body = search_results.paginate(
+            MediaDocument.search(), ["id", "title"], size=10, cursor=cursor, scored=True,
+        ).to_dict()
+        self.assertEqual(body["search_after"], [1.5, 1700000000000, 42])
+        self.assertEqual(body["size"], 10)
+        self.assertEqual(body["_source"], ["id", "title"])
+        self.assertEqual([list(key)[0] for key in body["sort"]], ["_score", "created_at", "id"])
+        with self.assertRaises(ValueError):
+            search_results.decode_cursor("not-a-cursor")
+
+    def test_render_from_source_without_queries(self):
+        """Test hits render from _source in relevance order with no DB access."""
+        ordered = [self.media[2], self.media[0], self.media[1]]
+        with self.assertNumQueries(0):
+            page = search_results.render_page(self.response_for(ordered), ["id", "title"], [], self.user, size=3)
+        self.assertEqual([row["id"] for row in page["results"]], [m.pk for m in ordered])
+        self.assertEqual(page["results"][0], {"id": ordered[0].pk, "title": ordered[0].title})
+        self.assertEqual(search_results.decode_cursor(page["next_cursor"]), [ordered[-1].pk])
+
+    def test_hydration_preserves_order(self):
+        """Test DB-only fields are merged in hit order and foreign rows dropped."""
+        ordered = [self.media[1], self.foreign, self.media[2], self.media[0]]
+        # media (with folder and uploader) + renditions prefetch
+        with self.assertNumQueries(2):
+            page = search_results.render_page(
+                self.response_for(ordered, total=4), ["id", "title"], ["file", "content_hash"], self.user, size=10,
+            )
+        self.assertEqual([row["id"] for row in page["results"]], [self.media[i].pk for i in (1, 2, 0)])
+        self.assertIn("file", page["results"][0])
+        self.assertEqual(page["results"][0]["content_hash"], self.media[1].content_hash)
+        self.assertIsNone(page["next_cursor"])
+
+    def test_invalid_parameters_rejected(self):
+        """Test bad fields, page sizes and cursors return 400 before searching."""
+        self.client.force_authenticate(user=self.user)
+        for params in ({"fields": "nope"}, {"page_size": "0"}, {"page_size": "x"}, {"cursor": "%%%"}):
+            with mock.patch("elasticsearch.dsl.Search.execute") as execute:
+                response = self.client.get("/api/media-manager/search/", {"q": "media", **params})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            execute.assert_not_called()
+
+
+class SuggestTests(TempMediaRootMixin, APITestCase):
+    """Tests for the autocomplete suggest endpoint."""
+
+    def setUp(self):
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.folder = Folder.objects.create(name="Trips", owner=self.user)
+        self.media = Media.objects.create(
+            file=SimpleUploadedFile("beach.mp4", b"beach"),
+            title="Sunset Beach",
+            folder=self.folder,
+            uploaded_by=self.user,
+        )
+        self.media.tags.add(Tag.objects.create(name="summer", owner=self.user))
+        self.client.force_authenticate(user=self.user)
+
+    def es_response(self):
+        from elasticsearch.dsl.response import Response as ESResponse
+
+        hits = [{"_index": "media", "_id": str(self.media.pk), "_source": {"id": self.media.pk, "title": self.media.title}}]
+        return ESResponse(MediaDocument.search(), {"hits": {"total": {"value": 1, "relation": "eq"}, "hits": hits}})
+
+    def test_suggest_field_covers_title_tags_and_folder(self):
+        """Test the indexed suggest phrases."""
+        self.assertEqual(MediaDocument().prepare_suggest(self.media), ["Sunset Beach", "summer", "Trips"])
+
+    def test_suggest_is_cached_per_user(self):
+        """Test equivalent keystrokes hit the cache instead of Elasticsearch."""
+        with mock.patch("elasticsearch.dsl.Search.execute", return_value=self.es_response()) as execute:
+            first = self.client.get("/api/media-manager/search/suggest/", {"q": "Sun"})
+            second = self.client.get("/api/media-manager/search/suggest/", {"q": "  sun "})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["results"], [{"id": self.media.pk, "label": "Sunset Beach"}])
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(execute.call_count, 1)
+
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpass123")
+        params = {"q": "sun", "limit": search_suggest.DEFAULT_LIMIT}
+        self.assertIsNotNone(search_cache.get_cached("suggest", self.user.id, params))
+        self.assertIsNone(search_cache.get_cached("suggest", other.id, params))
+
+    def test_falls_back_to_database_when_elasticsearch_is_down(self):
+        """Test suggestions come from title prefixes, uncached, while ES is unreachable."""
+        from elasticsearch import ConnectionError as ESConnectionError
+
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpass123")
+        Media.objects.create(file=SimpleUploadedFile("sunrise.jpg", b"x"), uploaded_by=self.user)
+        Media.objects.create(file=SimpleUploadedFile("beach.jpg", b"y"), title="Sunday", uploaded_by=other)
+        with mock.patch("elasticsearch.dsl.Search.execute", side_effect=ESConnectionError("down")):
+            response = self.client.get("/api/media-manager/search/suggest/", {"q": "sun"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["label"] for row in response.data["results"]], ["sunrise.jpg", "Sunset Beach"],
+        )
+        self.assertIsNone(
+            search_cache.get_cached("suggest", self.user.id, {"q": "sun", "limit": search_suggest.DEFAULT_LIMIT})
+        )
+
+    def test_empty_query_and_bad_limit(self):
+        """Test empty queries skip Elasticsearch and bad limits are rejected."""
+        with mock.patch("elasticsearch.dsl.Search.execute") as execute:
+            response = self.client.get("/api/media-manager/search/suggest/", {"q": "  "})
+            self.assertEqual(response.data["results"], [])
+            response = self.client.get("/api/media-manager/search/suggest/", {"q": "sun", "limit": "x"})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        execute.assert_not_called()
+
+
+@override_settings(
+    MEDIA_MANAGER_SEARCH_BACKEND="media_manager.search.backends.ElasticsearchBackend",
+    MEDIA_MANAGER_SEARCH_FALLBACK_BACKEND="media_manager.search.backends.DatabaseBackend",
+)
+class DatabaseSearchBackendTests(TempMediaRootMixin, APITestCase):
+    """Tests for the database search backend and the fallback to it."""
+
+    def setUp(self):
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpass123")
+        self.in_description = Media.objects.create(
+            file=SimpleUploadedFile("a.jpg", b"a"), title="Harbour", description="sunset over the harbour",
+            file_type="image", uploaded_by=self.user,
+        )
+        self.in_title = Media.objects.create(
+            file=SimpleUploadedFile("b.jpg", b"b"), title="Sunset Beach", file_type="image", uploaded_by=self.user,
+        )
+        self.video = Media.objects.create(
+            file=SimpleUploadedFile("c.mp4", b"c"), title="Sunset timelapse", file_type="video", uploaded_by=self.user,
+        )
+        Media.objects.create(file=SimpleUploadedFile("d.jpg", b"d"), title="Sunset", uploaded_by=other)
+        self.in_title.tags.add(Tag.objects.create(name="travel", owner=self.user))
+        self.client.force_authenticate(user=self.user)
+
+    def test_ranked_filtered_and_paginated(self):
+        """Test title matches rank first, filters apply and cursors page through."""
+        backend = search_backends.DatabaseBackend()
+        page = backend.search(self.user, "sunset", source_fields=["id", "title", "tags"], size=2)
+        self.assertEqual(page["count"], 3)
+        self.assertEqual([row["id"] for row in page["results"]], [self.video.pk, self.in_title.pk])
+        self.assertEqual(page["results"][1]["tags"], [{"id": self.in_title.tags.get().pk, "name": "travel"}])
+
+        page = backend.search(self.user, "sunset", source_fields=["id"], size=2, cursor=page["next_cursor"])
+        self.assertEqual([row["id"] for row in page["results"]], [self.in_description.pk])
+        self.assertIsNone(page["next_cursor"])
+
+        filters = search_backends.parse_filters({"file_type": "image", "tags": ["travel"]})
+        page = backend.search(self.user, "sunset", filters, source_fields=["id"])
+        self.assertEqual([row["id"] for row in page["results"]], [self.in_title.pk])
+
+    def test_cursor_of_other_backend_is_refused(self):
+        """Test a cursor only pages through the backend that issued it."""
+        cursor = search_backends.DatabaseBackend().search(self.user, "sunset", size=1)["next_cursor"]
+        with self.assertRaisesMessage(ValueError, "another search backend"):
+            search_backends.ElasticsearchBackend().search(self.user, "sunset", cursor=cursor)
+
+        # Elasticsearch went down between two pages
+        cursor = search_backends.ElasticsearchBackend().encode_cursor([1.5, 1700000000000, self.video.pk])
+        with mock.patch.object(
+            search_backends.ElasticsearchBackend, "search", side_effect=search_backends.SearchUnavailable("down"),
+        ):
+            response = self.client.get("/api/media-manager/search/", {"q": "sunset", "cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("first page", response.data["error"])
+
+    def test_fallback_pages_are_cached_apart(self):
+        """Test pages served by the fallback are not returned once Elasticsearch is back."""
+        with mock.patch.object(
+            search_backends.ElasticsearchBackend, "search", side_effect=search_backends.SearchUnavailable("down"),
+        ):
+            response = self.client.get("/api/media-manager/search/", {"q": "sunset"})
+        self.assertEqual(response.data["backend"], "database")
+
+        page = {"count": 0, "results": [], "next_cursor": None}
+        with mock.patch.object(search_backends.ElasticsearchBackend, "search", return_value=page):
+            response = self.client.get("/api/media-manager/search/", {"q": "sunset"})
+        self.assertEqual(response.data["backend"], "elasticsearch")
+
+    def test_falls_back_when_elasticsearch_is_down(self):
+        """Test the search view answers from the database while ES is unreachable."""
+        from elasticsearch import ConnectionError as ESConnectionError
+
+        with mock.patch("elasticsearch.dsl.Search.execute", side_effect=ESConnectionError("down")):
+            response = self.client.get("/api/media-manager/search/", {"q": "timelapse", "fields": "title,file"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["backend"], "database")
+        self.assertEqual(response.data["results"][0]["title"], "Sunset timelapse")
+        self.assertIn("file", response.data["results"][0])
+
+        search_cache.clear()
+        with mock.patch("elasticsearch.dsl.Search.execute", side_effect=ESConnectionError("down")):
+            with self.settings(MEDIA_MANAGER_SEARCH_FALLBACK_BACKEND=None):
+                response = self.client.get("/api/media-manager/search/", {"q": "timelapse"})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_invalid_filters_rejected(self):
+        """Test malformed range filters return 400."""
+        response = self.client.get("/api/media-manager/search/advanced/", {"width_from": "wide"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get("/api/media-manager/search/advanced/", {"date_from": "2024-13-45"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_migration_matches_query_expression(self):
+        """Test the GIN index is built on the expression the backend queries."""
+        from importlib import import_module
+
+        migration = import_module("media_manager.migrations.0014_media_original_filename")
+        self.assertEqual(migration.search_vector("original_filename"), search_backends.search_vector())
+
+    def test_benchmark_command(self):
+        """Test the benchmark skips an unavailable backend and times the rest."""
+        from elasticsearch import ConnectionError as ESConnectionError
+
+        out = io.StringIO()
+        with mock.patch("elasticsearch.dsl.Search.execute", side_effect=ESConnectionError("down")):
+            call_command("benchmark_search", user="testuser", queries="sunset,beach", runs=1, stdout=out)
+        self.assertIn("elasticsearch  unavailable", out.getvalue())
+        self.assertIn("database", out.getvalue())
+
+
+@override_settings(
+    MEDIA_MANAGER_SEARCH_BACKEND="media_manager.search.backends.ElasticsearchBackend",
+    MEDIA_MANAGER_SEARCH_FALLBACK_BACKEND="media_manager.search.backends.DatabaseBackend",
+)
+class SearchFacetTests(TempMediaRootMixin, APITestCase):
+    """Tests for facet counts and their per-user cache."""
+
+    AGGREGATIONS = {
+        "file_type": {"buckets": [{"key": "image", "doc_count": 2}]},
+        "extension": {"buckets": [{"key": ".jpg", "doc_count": 2}]},
+        "folder": {"buckets": []},
+        "tags": {"doc_count": 1, "names": {"buckets": [{"key": "travel", "doc_count": 1}]}},
+        "size": {"buckets": [{"key": "<1MB", "to": 1048576.0, "doc_count": 2}]},
+        "created_at": {"buckets": [{"key_as_string": "2024-06", "key": 1717200000000, "doc_count": 2}]},
+    }
+
+    def setUp(self):
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.folder = Folder.objects.create(name="Trips", owner=self.user)
+        self.photo = Media.objects.create(
+            file=SimpleUploadedFile("a.jpg", b"a"), title="Beach", file_type="image",
+            folder=self.folder, uploaded_by=self.user,
+        )
+        self.photo.tags.add(Tag.objects.create(name="travel", owner=self.user))
+        Media.objects.create(
+            file=SimpleUploadedFile("b.JPG", b"b"), title="Beach bar", file_type="image", uploaded_by=self.user,
+        )
+        Media.objects.create(
+            file=SimpleUploadedFile("c.mp4", b"c" * 2 * 1024 * 1024), title="Beach walk", file_type="video",
+            folder=self.folder, uploaded_by=self.user,
+        )
+        self.client.force_authenticate(user=self.user)
+        self.requests = []
+
+    def fake_execute(self, search, *args, **kwargs):
+        from elasticsearch.dsl.response import Response as ESResponse
+
+        body = search.to_dict()
+        self.requests.append(body)
+        raw = {"hits": {"total": {"value": 0, "relation": "eq"}, "hits": []}}
+        if "aggs" in body:
+            raw["aggregations"] = self.AGGREGATIONS
+        return ESResponse(search, raw)
+
+    def get_facets(self, **params):
+        params = {"q": "beach", "facets": "true", **params}
+        with mock.patch("elasticsearch.dsl.Search.execute", autospec=True, side_effect=self.fake_execute):
+            response = self.client.get("/api/media-manager/search/advanced/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["facets"]
+
+    def test_facets_computed_in_search_request_and_cached(self):
+        """Test aggregations ride on the search request and are cached until the user's index changes."""
+        facets = self.get_facets()
+        self.assertEqual(facets["file_type"], [{"value": "image", "count": 2}])
+        self.assertEqual(facets["tags"], [{"value": "travel", "count": 1}])
+        self.assertEqual(facets["created_at"], [{"value": "2024-06", "count": 2}])
+        self.assertEqual(
+            set(self.requests[0]["aggs"]), {"file_type", "extension", "folder", "tags", "size", "created_at"},
+        )
+
+        # Another page of the same query reuses the facets
+        self.assertEqual(self.get_facets(page_size=10), facets)
+        self.assertNotIn("aggs", self.requests[1])
+
+        search_cache.bump_generations([self.user.id])
+        self.get_facets(page_size=10)
+        self.assertIn("aggs", self.requests[2])
+
+    def test_database_facets(self):
+        """Test the database backend groups the filtered queryset the same way."""
+        facets = search_backends.DatabaseBackend().search(self.user, "beach", facets=True)["facets"]
+        self.assertEqual(facets["file_type"], [{"value": "image", "count": 2}, {"value": "video", "count": 1}])
+        self.assertEqual(facets["extension"], [{"value": ".jpg", "count": 2}, {"value": ".mp4", "count": 1}])
+        self.assertEqual(facets["folder"], [{"value": self.folder.pk, "label": "Trips", "count": 2}])
+        self.assertEqual(facets["tags"], [{"value": "travel", "count": 1}])
+        self.assertEqual([bucket["count"] for bucket in facets["size"]], [2, 1, 0, 0])
+        self.assertEqual(sum(bucket["count"] for bucket in facets["created_at"]), 3)
+
+    def test_facets_cached_per_backend(self):
+        """Test facets cached from Elasticsearch are not served by the database backend."""
+        self.get_facets()
+        facets = search_backends.DatabaseBackend().search(self.user, "beach", facets=True)["facets"]
+        self.assertEqual(facets["file_type"], [{"value": "image", "count": 2}, {"value": "video", "count": 1}])
+
+    @override_settings(ELASTICSEARCH_DSL_AUTOSYNC=True)
+    def test_flush_invalidates_owner_cache(self):
+        """Test writing a user's documents bumps their cache generation, deletes included."""
+        generation = search_cache.get_generation(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            search_queue.enqueue(Media, [self.photo.pk], "delete")
+        owner = mock.Mock(uploaded_by_id=self.user.id)
+        with mock.patch.object(MediaDocument, "bulk", return_value=(1, [])), \
+                mock.patch.object(MediaDocument, "mget", return_value=[owner]) as mget:
+            search_queue.flush()
+        mget.assert_called_once()
+        self.assertNotEqual(search_cache.get_generation(self.user.id), generation)
+
+
+@override_settings(
+    MEDIA_MANAGER_SEARCH_BACKEND="media_manager.search.backends.DatabaseBackend",
+    MEDIA_MANAGER_SEARCH_FALLBACK_BACKEND=None,
+)
+class SearchResultCacheTests(TempMediaRootMixin, APITestCase):
+    """Tests for the two-tier search result cache and its invalidation."""
+
+    def setUp(self):
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.tag = Tag.objects.create(name="travel", owner=self.user)
+        self.folder = Folder.objects.create(name="Trips", owner=self.user)
+        self.media = Media.objects.create(
+            file=SimpleUploadedFile("a.jpg", b"a"), title="Beach", uploaded_by=self.user,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def search(self):
+        with mock.patch.object(
+            search_backends.DatabaseBackend, "search", autospec=True,
+            side_effect=search_backends.DatabaseBackend.search,
+        ) as backend_search:
+            response = self.client.get("/api/media-manager/search/", {"q": "beach"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, backend_search.call_count
+
+    def test_repeated_search_is_served_from_cache(self):
+        """Test the local tier answers repeats and the shared tier refills it."""
+        first, calls = self.search()
+        self.assertEqual(calls, 1)
+        second, calls = self.search()
+        self.assertEqual(calls, 0)
+        self.assertEqual(second.data, first.data)
+
+        search_cache.local_cache().clear()
+        _, calls = self.search()
+        self.assertEqual(calls, 0)
+
+        stats = search_cache.cache_stats()["results"]
+        self.assertEqual((stats["local_hits"], stats["shared_hits"], stats["misses"]), (1, 1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3, places=3)
+
+    @override_settings(MEDIA_MANAGER_SEARCH_CACHE_GENERATION_TTL=60)
+    def test_local_hit_skips_shared_cache(self):
+        """Test a local hit needs neither the shared generation nor a shared stats write."""
+        self.search()
+        with mock.patch.object(search_cache, "shared_cache", side_effect=AssertionError("shared cache used")):
+            _, calls = self.search()
+        self.assertEqual(calls, 0)
+
+    def test_failed_stats_write_keeps_hit(self):
+        """Test an unreachable stats counter does not turn a hit into a miss."""
+        self.search()
+        search_cache._stats_flushed_at = 0.0
+        with mock.patch.object(search_cache.shared_cache(), "incr", side_effect=ConnectionError("down")):
+            _, calls = self.search()
+        self.assertEqual(calls, 0)
+
+    def test_writes_invalidate_cached_pages(self):
+        """Test media, tag, folder and tagging changes all drop the owner's pages."""
+        changes = [
+            lambda: Media.objects.filter(pk=self.media.pk).first().save(),
+            lambda: Tag.objects.get(pk=self.tag.pk).save(),
+            lambda: Folder.objects.get(pk=self.folder.pk).save(),
+            lambda: self.tag.media.add(self.media),
+        ]
+        for change in changes:
+            self.search()
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            _, calls = self.search()
+            self.assertEqual(calls, 1)
+
+    def test_other_users_unaffected(self):
+        """Test a write by another user keeps this user's pages cached."""
+        self.search()
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpass123")
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name="holiday", owner=other)
+        _, calls = self.search()
+        self.assertEqual(calls, 0)
+
+    def test_local_lru_bounds(self):
+        """Test the local tier evicts least recently used and expired entries."""
+        lru = search_cache.LocalLRU(max_entries=2)
+        lru.set("a", 1, 60)
+        lru.set("b", 2, 60)
+        lru.get("a")
+        lru.set("c", 3, 60)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual((lru.get("a"), lru.get("c")), (1, 3))
+        lru.set("d", 4, -1)
+        self.assertIsNone(lru.get("d"))
+
+    def test_health_reports_cache_stats(self):
+        """Test staff see per-namespace hit rates."""
+        self.search()
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/api/media-manager/search/health/")
+        self.assertEqual(response.data["cache"]["results"]["misses"], 1)
+
+
+def make_photo(seed, size=(1200, 800)):
+    """A JPEG with enough structure for a meaningful perceptual hash."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse(
+            (x, y, x + rng.randrange(100, 500), y + rng.randrange(100, 500)),
+            fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+        )
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def reencode(content, size, quality):
+    """Resized, recompressed copy of an image file."""
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(content)).resize(size).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_MANAGER_PROCESSING_WORKERS=0,
+    MEDIA_MANAGER_DEDUPLICATE_UPLOADS=False,
+)
+class SimilarityTests(TempMediaRootMixin, APITestCase):
+    """Tests for perceptual hashes and near-duplicate lookups."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            media = Media.objects.create(file=SimpleUploadedFile(name, content), uploaded_by=user or self.user)
+        media.refresh_from_db()
+        return media
+
+    def hashed(self, value, user=None):
+        """Media row with a given hash, without processing a file."""
+        return Media.objects.create(
+            file=SimpleUploadedFile("x.jpg", b"x"), uploaded_by=user or self.user, **hash_fields(value),
+        )
+
+    def test_reencoded_copy_is_close(self):
+        """Test resizing and recompressing flips only a few bits."""
+        original = make_photo(1)
+        media = self.upload("photo.jpg", original)
+        copy = self.upload("copy.jpg", reencode(original, (600, 400), 40))
+        other = self.upload("other.jpg", make_photo(2))
+
+        self.assertEqual(len(media.perceptual_hash), 16)
+        self.assertEqual(media.phash_0, parse_hash(media.perceptual_hash) >> 48)
+        self.assertLessEqual(hamming(parse_hash(media.perceptual_hash), parse_hash(copy.perceptual_hash)), 4)
+        self.assertGreater(hamming(parse_hash(media.perceptual_hash), parse_hash(other.perceptual_hash)), 11)
+
+    def test_non_images_are_not_hashed(self):
+        """Test documents keep an empty hash and are rejected by /similar/."""
+        media = self.upload("notes.txt", b"hello")
+        self.assertEqual(media.perceptual_hash, "")
+
+        response = self.client.get(f"/api/media-manager/media/{media.id}/similar/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_neighbours(self):
+        """Test chunk neighbourhoods enumerate every value within the radius."""
+        self.assertEqual(neighbours(0b1010, 0), [0b1010])
+        self.assertEqual(len(neighbours(0b1010, 1)), 17)
+        self.assertEqual(len(set(neighbours(0b1010, 2))), 1 + 16 + 120)
+
+    def test_similar_endpoint(self):
+        """Test matches are found through one chunk and sorted by distance."""
+        base = 0x0123456789ABCDEF
+        media = self.hashed(base)
+        # 5 bits apart, all in the first chunk: only the other chunks match exactly
+        near = self.hashed(base ^ 0x1F00000000000000)
+        # 1 bit in each chunk: found within radius 1 at max_distance >= 4
+        spread = self.hashed(base ^ 0x0001000100010001)
+        far = self.hashed(base ^ 0xFFFF0000FFFF0000)
+        self.hashed(base, user=User.objects.create_user(username="other", email="other@example.com", password="pass12345"))
+
+        response = self.client.get(f"/api/media-manager/media/{media.id}/similar/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["id"], row["distance"]) for row in response.data["results"]],
+            [(spread.id, 4), (near.id, 5)],
+        )
+        self.assertNotIn(far.id, [row["id"] for row in response.data["results"]])
+
+        response = self.client.get(f"/api/media-manager/media/{media.id}/similar/", {"max_distance": "3"})
+        self.assertEqual(response.data["results"], [])
+
+        response = self.client.get(f"/api/media-manager/media/{media.id}/similar/", {"max_distance": "40"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_duplicate_report(self):
+        """Test near-duplicates are grouped transitively, per user."""
+        base = 0x0123456789ABCDEF
+        first = [self.hashed(base), self.hashed(base ^ 0b11), self.hashed(base ^ 0b11 ^ (0b1 << 40))]
+        second = [self.hashed(0xFEDCBA9876543210), self.hashed(0xFEDCBA9876543210)]
+        self.hashed(0x0F0F0F0F0F0F0F0F)
+        self.hashed(base, user=User.objects.create_user(username="other", email="other@example.com", password="pass12345"))
+
+        self.assertEqual(duplicate_groups(self.user), [[m.id for m in first], [m.id for m in second]])
+        self.assertEqual(duplicate_groups(self.user, max_distance=0), [[m.id for m in second]])
+
+        response = self.client.get("/api/media-manager/media/duplicates/", {"limit": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual([row["id"] for row in response.data["groups"][0]], [m.id for m in first])
+
+
+@override_settings(MEDIA_MANAGER_DEFAULT_QUOTA=1000)
+class StorageQuotaTests(TempMediaRootMixin, APITestCase):
+    """Tests for per-user storage quotas."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def usage(self):
+        return quotas.get_usage(self.user.pk)
+
+    def upload(self, name, size):
+        file = SimpleUploadedFile(name, b"x" * size, content_type="text/plain")
+        return self.client.post("/api/media-manager/media/", {"file": file}, format="multipart")
+
+    def test_usage_follows_create_replace_and_delete(self):
+        """Test the counter moves with uploads, replacements and deletes."""
+        response = self.upload("a.txt", 300)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.usage(), {"limit": 1000, "used": 300, "reserved": 0, "available": 700})
+
+        media = Media.objects.get()
+        media.file = SimpleUploadedFile("b.txt", b"y" * 100)
+        media.save()
+        self.assertEqual(self.usage()["used"], 100)
+
+        # Trash counts until it is purged
+        self.client.delete(f"/api/media-manager/media/{media.id}/")
+        self.assertEqual(self.usage()["used"], 100)
+        trash.purge(before=timezone.now())
+        self.assertEqual(self.usage()["used"], 0)
+
+    def test_bulk_operations_update_usage(self):
+        """Test batch uploads and bulk deletes update usage once per batch."""
+        files = [SimpleUploadedFile(f"{i}.txt", b"z" * 200) for i in range(3)]
+        response = self.client.post("/api/media-manager/media/batch/", {"files": files}, format="multipart")
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(self.usage()["used"], 600)
+
+        response = self.client.post(
+            "/api/media-manager/media/bulk/",
+            {"action": "delete", "ids": list(Media.objects.values_list("id", flat=True)[:2])},
+            format="json",
+        )
+        self.assertEqual(self.usage()["used"], 600)
+        trash.purge(before=timezone.now())
+        self.assertEqual(self.usage()["used"], 200)
+
+    def test_upload_over_quota_is_rejected(self):
+        """Test uploads that do not fit get 413 and leave nothing behind."""
+        self.upload("a.txt", 600)
+        with mock.patch.object(MultiPartParser, "parse", autospec=True) as parse:
+            response = self.upload("b.txt", 600)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        parse.assert_not_called()
+        self.assertEqual(response.data["available"], 400)
+        self.assertEqual(Media.objects.count(), 1)
+
+        files = [SimpleUploadedFile(f"{i}.txt", b"z" * 150) for i in range(3)]
+        response = self.client.post("/api/media-manager/media/batch/", {"files": files}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # Batch files are reserved one by one: the third one does not fit
+        files = [SimpleUploadedFile(f"{i}.txt", b"z" * 150) for i in range(3)]
+        results = bulk.create_media_batch(self.user, files)
+        self.assertEqual([r["status"] for r in results], ["created", "created", "error"])
+        self.assertEqual(self.usage(), {"limit": 1000, "used": 900, "reserved": 0, "available": 100})
+
+    def test_upload_session_reserves_declared_size(self):
+        """Test chunked uploads hold their size until finalized or aborted."""
+        response = self.client.post(
+            "/api/media-manager/media/uploads/", {"filename": "big.bin", "size": 2000}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        response = self.client.post(
+            "/api/media-manager/media/uploads/", {"filename": "a.bin", "size": 800}, format="json"
+        )
+        self.assertEqual(self.usage()["reserved"], 800)
+        self.assertEqual(self.upload("b.txt", 300).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        self.client.delete(f"/api/media-manager/media/uploads/{response.data['id']}/")
+        self.assertEqual(self.usage()["reserved"], 0)
+
+    def test_first_reservations_race_for_the_row(self):
+        """Test a reservation fits when a concurrent request created the quota row first."""
+        get_or_create = StorageQuota.objects.get_or_create
+
+        def created_elsewhere(**kwargs):
+            StorageQuota.objects.create(user_id=self.user.pk, reserved=100)
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(StorageQuota.objects, "get_or_create", side_effect=created_elsewhere):
+            quotas.reserve(self.user.pk, 500)
+        self.assertEqual(self.usage()["reserved"], 600)
+
+        StorageQuota.objects.all().delete()
+        with mock.patch.object(StorageQuota.objects, "get_or_create", side_effect=created_elsewhere):
+            with self.assertRaises(quotas.QuotaExceeded):
+                quotas.reserve(self.user.pk, 950)
+        self.assertEqual(self.usage()["reserved"], 100)
+
+    def test_reconcile_quotas(self):
+        """Test the command recomputes drifted counters."""
+        self.upload("a.txt", 300)
+        StorageQuota.objects.filter(pk=self.user.pk).update(used=5, reserved=70)
+        other = User.objects.create_user(username="other", email="other@example.com", password="pass12345")
+        Media.objects.bulk_create([Media(file="x.txt", size=40, uploaded_by=other)])
+
+        out = io.StringIO()
+        call_command("reconcile_quotas", "--dry-run", stdout=out)
+        self.assertIn("2 quota counters would be corrected", out.getvalue())
+        self.assertEqual(self.usage()["used"], 5)
+
+        call_command("reconcile_quotas", stdout=io.StringIO())
+        self.assertEqual((self.usage()["used"], self.usage()["reserved"]), (300, 0))
+        self.assertEqual(quotas.get_usage(other.pk)["used"], 40)
+
+        response = self.client.get("/api/media-manager/media/stats/")
+        self.assertEqual(response.data["quota"]["available"], 700)
+
+
+class KeysetPaginationTests(TempMediaRootMixin, APITestCase):
+    """Tests for cursor pagination and ?fields= on list endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.folder = Folder.objects.create(name="Photos", owner=self.user)
+        created_at = timezone.now()
+        self.media = Media.objects.bulk_create([
+            Media(
+                file=f"media/{i}.jpg", title=f"Photo {i}", size=i * 10, file_type="image",
+                uploaded_by=self.user, folder=self.folder,
+            )
+            for i in range(5)
+        ])
+        # Two rows share a timestamp: the id breaks the tie
+        Media.objects.update(created_at=created_at)
+        Media.objects.filter(pk=self.media[0].pk).update(created_at=created_at - timezone.timedelta(days=1))
+
+    def collect(self, url, params):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [row["id"] for row in response.data["results"]]
+            params = {**params, "cursor": response.data["next_cursor"]}
+            url = url if response.data["next_cursor"] else None
+            pages += 1
+        return ids, pages
+
+    def test_pages_follow_created_at_then_id(self):
+        """Test every row is returned once, newest first, across pages."""
+        ids, pages = self.collect("/api/media-manager/media/", {"page_size": "2"})
+        expected = sorted((m.pk for m in self.media[1:]), reverse=True) + [self.media[0].pk]
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+        ids, _ = self.collect(f"/api/media-manager/folders/{self.folder.id}/media/", {"page_size": "3"})
+        self.assertEqual(ids, expected)
+
+    def test_pages_follow_ordering_param(self):
+        """Test ?ordering= picks the keyset column."""
+        ids, _ = self.collect("/api/media-manager/media/by_type/", {"type": "image", "ordering": "size", "page_size": "2"})
+        self.assertEqual(ids, [m.pk for m in self.media])
+
+        response = self.client.get("/api/media-manager/media/", {"cursor": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fields(self):
+        """Test ?fields= limits the rendered fields and the loaded columns."""
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/media-manager/media/", {"fields": "title,thumbnail", "page_size": "2"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "title", "thumbnail"})
+        self.assertIsNone(response.data["results"][0]["thumbnail"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/media-manager/media/", {"fields": "title,folder_name"})
+        self.assertEqual(response.data["results"][0]["folder_name"], "Photos")
+
+        response = self.client.get("/api/media-manager/media/", {"fields": "title,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_MANAGER_DEDUPLICATE_UPLOADS=False)
+class ZipDownloadTests(TempMediaRootMixin, APITestCase):
+    """Tests for streamed ZIP exports."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.root = Folder.objects.create(name="Trip", owner=self.user)
+        self.day = Folder.objects.create(name="Day 1", parent=self.root, owner=self.user)
+        self.photo = self.create("photo.jpg", make_image(size=(64, 64)), self.root)
+        self.notes = self.create("notes.txt", b"sunny " * 500, self.day)
+        self.copy = self.create("notes.txt", b"rainy " * 500, self.day)
+        self.create("elsewhere.txt", b"not exported", None)
+
+    def create(self, name, content, folder):
+        return Media.objects.create(file=SimpleUploadedFile(name, content), folder=folder, uploaded_by=self.user)
+
+    def read_zip(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+    def test_folder_download(self):
+        """Test the subtree is exported with its paths, stored or deflated by type."""
+        # The folder, then the whole file list
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/media-manager/folders/{self.root.id}/download.zip")
+        self.assertIn('attachment; filename="Trip.zip"', response["Content-Disposition"])
+        archive = self.read_zip(response)
+
+        self.assertEqual(archive.namelist(), ["Trip/photo.jpg", "Trip/Day 1/notes.txt", "Trip/Day 1/notes (2).txt"])
+        self.assertEqual(archive.getinfo("Trip/photo.jpg").compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(archive.getinfo("Trip/Day 1/notes.txt").compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.read("Trip/Day 1/notes (2).txt"), b"rainy " * 500)
+        self.assertIsNone(archive.testzip())
+
+        other = User.objects.create_user(username="other", email="other@example.com", password="pass12345")
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f"/api/media-manager/folders/{self.root.id}/download.zip")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_selection_download(self):
+        """Test a selection is exported under full folder paths."""
+        response = self.client.post(
+            "/api/media-manager/media/download.zip", {"ids": [self.photo.id, self.notes.id]}, format="json"
+        )
+        archive = self.read_zip(response)
+        self.assertEqual(sorted(archive.namelist()), ["Trip/Day 1/notes.txt", "Trip/photo.jpg"])
+
+        response = self.client.post(
+            "/api/media-manager/media/download.zip", {"filter": {"file_type": "video"}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_entry_names_of_deduplicated_files(self):
+        """Test blobs named by hash are exported under their uploaded name."""
+        with override_settings(MEDIA_MANAGER_DEDUPLICATE_UPLOADS=True):
+            beach = self.create("beach.jpg", make_image(size=(32, 32)), self.root)
+        self.assertTrue(beach.file.name.startswith("cas/"))
+        self.assertEqual(beach.original_filename, "beach.jpg")
+
+        response = self.client.post("/api/media-manager/media/download.zip", {"ids": [beach.id]}, format="json")
+        self.assertEqual(self.read_zip(response).namelist(), ["Trip/beach.jpg"])
+
+        # Rows stored before the name was kept fall back to the title
+        blob = f"cas/ab/cd/{'ab' * 32}.jpg"
+        self.assertEqual(Media(file=blob, title="Beach / sunset").get_filename(), "Beach _ sunset.jpg")
+        self.assertEqual(Media(file=blob, title="beach.JPG").get_filename(), "beach.JPG")
+        self.assertEqual(Media(file="uploads/2024/notes.txt", title="Notes").get_filename(), "notes.txt")
+
+    def test_zip64_entries(self):
+        """Test entries past the ZIP64 limit are written with ZIP64 records."""
+        with mock.patch("zipfile.ZIP64_LIMIT", 1000):
+            response = self.client.get(f"/api/media-manager/folders/{self.day.id}/download.zip")
+            archive = self.read_zip(response)
+            self.assertEqual(archive.read("Day 1/notes.txt"), b"sunny " * 500)
+            self.assertGreater(archive.getinfo("Day 1/notes.txt").extract_version, 20)
+
+
+@override_settings(MEDIA_MANAGER_PROCESSING_WORKERS=0)
+class ScrubMediaTests(TempMediaRootMixin, TestCase):
+    """Tests for the storage integrity scrubber."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+
+    def create_media(self, content):
+        return Media.objects.create(file=SimpleUploadedFile("notes.txt", content), uploaded_by=self.user)
+
+    def write_file(self, name, content=b"stray", age=0):
+        path = os.path.join(Media.file.field.storage.location, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(content)
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+
+    def test_walk_yields_files_in_name_order(self):
+        """Test the parallel walk matches plain string order and skips files it does not own."""
+        root = self.make_temp_dir()
+        owned = [
+            "cas/ab/cd/abcd.jpg",
+            "media/ab/cd/abcdef0123456789_a-b.txt",
+            "media/ab/cd/abcdef0123456789_a.txt",
+            "renditions/1-b/thumb.webp",
+            "renditions/1/thumb.webp",
+            "renditions/1/x/deep.webp",
+            "renditions/10/thumb.webp",
+        ]
+        foreign = ["cas/.incoming/tmp", "media/profile_pictures/me.jpg", "media/ab/cd/notes.txt", "other.txt"]
+        for name in owned + foreign:
+            os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+            open(os.path.join(root, name), "wb").close()
+
+        walked = [file.name for file in scrub.walk_storage(root, workers=3)]
+        self.assertEqual(walked, sorted(owned))
+
+    def test_report_and_repair(self):
+        """Test orphans, dangling rows and size mismatches are found and fixed."""
+        kept = self.create_media(b"kept")
+        missing = self.create_media(b"missing")
+        os.remove(missing.file.path)
+        resized = self.create_media(b"twelve bytes")
+        Media.objects.filter(pk=resized.pk).update(size=5)
+        quotas.add_usage({self.user.pk: -7})
+        MediaRendition.objects.create(
+            media=kept, name="thumb", format="webp", file="renditions/1/thumb.webp", width=1, height=1
+        )
+        self.write_file("media/ab/cd/abcdef0123456789_orphan.txt", age=7200)
+        self.write_file("media/ab/cd/abcdef0123456789_queued.txt", age=7200)
+        StorageDeletion.objects.create(name="media/ab/cd/abcdef0123456789_queued.txt")
+        self.write_file("media/ab/cd/abcdef0123456789_uploading.txt")
+
+        out = io.StringIO()
+        call_command("scrub_media", workers=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn("orphan media/ab/cd/abcdef0123456789_orphan.txt (5 bytes)", output)
+        self.assertNotIn("queued.txt", output)
+        self.assertNotIn("uploading.txt", output)
+        self.assertIn("1 orphaned files", output)
+        self.assertIn("2 rows with missing files, 1 size mismatches", output)
+        self.assertEqual(Media.objects.get(pk=resized.pk).size, 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("scrub_media", "--repair", workers=2, stdout=io.StringIO())
+        self.assertTrue(StorageDeletion.objects.filter(name="media/ab/cd/abcdef0123456789_orphan.txt").exists())
+        self.assertEqual(Media.objects.get(pk=resized.pk).size, 12)
+        self.assertFalse(MediaRendition.objects.exists())
+        self.assertTrue(Media.objects.filter(pk=missing.pk).exists())
+        self.assertEqual(quotas.get_usage(self.user.pk)["used"], 4 + 7 + 12)
+
+        call_command("scrub_media", "--repair", "--delete-dangling", workers=2, stdout=io.StringIO())
+        self.assertFalse(Media.objects.filter(pk=missing.pk).exists())
+        self.assertEqual(quotas.get_usage(self.user.pk)["used"], 4 + 12)
+
+    def test_other_apps_files_are_left_alone(self):
+        """Test files of other apps under MEDIA_ROOT survive a repair and the deletion worker."""
+        self.write_file("media/profile_pictures/me.jpg", age=7200)
+        self.write_file("media/posts/featured/cover.jpg", age=7200)
+        User.objects.filter(pk=self.user.pk).update(profile_picture="media/profile_pictures/me.jpg")
+        with override_settings(MEDIA_MANAGER_DEDUPLICATE_UPLOADS=False, MEDIA_MANAGER_UPLOAD_LAYOUT="folder"):
+            legacy = self.create_media(b"legacy")
+        os.remove(legacy.file.path)
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("scrub_media", "--repair", workers=2, stdout=out)
+        self.assertIn(f"missing {legacy.file.name}", out.getvalue())
+        self.assertNotIn("profile_pictures", out.getvalue())
+        self.assertNotIn("featured", out.getvalue())
+        self.assertFalse(StorageDeletion.objects.exists())
+
+        # Even a deletion queued by mistake keeps a file another app uses
+        StorageDeletion.objects.create(name="media/profile_pictures/me.jpg")
+        process_deletions()
+        storage = Media.file.field.storage
+        self.assertTrue(storage.exists("media/profile_pictures/me.jpg"))
+        self.assertTrue(storage.exists("media/posts/featured/cover.jpg"))
+
+
+@override_settings(MEDIA_MANAGER_PROCESSING_WORKERS=0)
+class TrashTests(TempMediaRootMixin, APITestCase):
+    """Tests for the media and folder trash."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.trip = Folder.objects.create(name="Trip", owner=self.user)
+        self.day = Folder.objects.create(name="Day 1", parent=self.trip, owner=self.user)
+        self.photo = self.create_media("photo.txt", self.trip)
+        self.notes = self.create_media("notes.txt", self.day)
+
+    def create_media(self, name, folder=None):
+        return Media.objects.create(
+            file=SimpleUploadedFile(name, name.encode()), folder=folder, uploaded_by=self.user
+        )
+
+    def listed_ids(self, url):
+        return [row["id"] for row in self.client.get(url).data["results"]]
+
+    def test_delete_moves_media_to_trash(self):
+        """Test deleted media leaves the live lists and can be restored."""
+        response = self.client.delete(f"/api/media-manager/media/{self.photo.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.listed_ids("/api/media-manager/media/"), [self.notes.id])
+        self.assertEqual(self.listed_ids("/api/media-manager/media/trash/"), [self.photo.id])
+        self.assertEqual(self.client.get(f"/api/media-manager/media/{self.photo.id}/").status_code, 404)
+        self.assertEqual(self.client.get("/api/media-manager/media/stats/").data["trash"], {"count": 1, "size": 9})
+
+        response = self.client.post(f"/api/media-manager/media/{self.photo.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["folder"], self.trip.id)
+        self.assertEqual(sorted(self.listed_ids("/api/media-manager/media/")), [self.photo.id, self.notes.id])
+        self.assertEqual(self.client.post(f"/api/media-manager/media/{self.photo.id}/restore/").status_code, 404)
+
+    def test_folder_trash_moves_media_to_root(self):
+        """Test trashing a folder keeps its media, at the root, unless asked otherwise."""
+        response = self.client.delete(f"/api/media-manager/folders/{self.trip.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Folder.objects.exists())
+        self.assertEqual(
+            sorted(Media.objects.values_list("pk", "folder_id")), [(self.photo.pk, None), (self.notes.pk, None)]
+        )
+        self.assertFalse(Media.all_objects.filter(deleted_at__isnull=False).exists())
+
+        response = self.client.post(f"/api/media-manager/folders/{self.trip.id}/restore/")
+        self.assertEqual(response.data["restored_media"], 0)
+        self.assertEqual(Media.objects.filter(folder__isnull=True).count(), 2)
+
+    def test_folder_trash_takes_subtree_and_restores_it(self):
+        """Test a folder trashed with its media takes subfolders and media along, and brings them back."""
+        self.client.delete(f"/api/media-manager/media/{self.notes.id}/")
+        self.notes.refresh_from_db()
+        response = self.client.delete(f"/api/media-manager/folders/{self.trip.id}/?with_media=1")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Folder.objects.exists())
+        self.assertFalse(Media.objects.exists())
+        trashed = self.client.get("/api/media-manager/folders/trash/").data
+        self.assertEqual([folder["id"] for folder in trashed], [self.trip.id])
+
+        # The name is free again, so restoring conflicts until it is renamed
+        other = self.client.post("/api/media-manager/folders/", {"name": "Trip"}, format="json")
+        self.assertEqual(other.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(f"/api/media-manager/folders/{self.trip.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        Folder.objects.filter(name="Trip").update(name="Other trip")
+
+        response = self.client.post(f"/api/media-manager/folders/{self.trip.id}/restore/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["restored_media"], 1)
+        self.assertTrue(Folder.objects.filter(pk=self.day.pk).exists())
+        # Media trashed on its own before the folder stays in the trash
+        self.assertEqual(list(Media.objects.values_list("pk", flat=True)), [self.photo.pk])
+        self.client.post(f"/api/media-manager/media/{self.notes.id}/restore/")
+        self.assertEqual(Media.objects.get(pk=self.notes.pk).folder_id, self.day.pk)
+
+    def test_purge_deletes_expired_trash(self):
+        """Test purge_trash hard-deletes trash past the retention period only."""
+        kept = self.create_media("kept.txt")
+        trash.trash_folder(self.trip, with_media=True)
+        trash.trash_media([kept.pk])
+        Media.all_objects.exclude(pk=kept.pk).update(deleted_at=timezone.now() - timezone.timedelta(days=31))
+        Folder.all_objects.update(deleted_at=timezone.now() - timezone.timedelta(days=31))
+        names = [self.photo.file.name, self.notes.file.name]
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("purge_trash", stdout=out)
+        self.assertIn("Purged 2 media and 2 folders", out.getvalue())
+        self.assertEqual(list(Media.all_objects.values_list("pk", flat=True)), [kept.pk])
+        self.assertFalse(Folder.all_objects.exists())
+        self.assertEqual(set(StorageDeletion.objects.values_list("name", flat=True)), set(names))
+        self.assertEqual(quotas.get_usage(self.user.pk)["used"], kept.size)
@@ -0,0 +1,217 @@
+"""
+On-demand image variants (width/format/quality) with a bounded disk cache.
+
+Variants are cached as files named after the source content hash and the
+transform parameters. The cache evicts least recently used files once it
+grows past its size cap; concurrent requests for the same variant render
+it only once (thread lock within a process, file lock across processes).
+"""
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+MIN_WIDTH, MAX_WIDTH = 16, 4096
+DEFAULT_QUALITY = 80
+
+
+def parse_variant(params):
+    """
+    Validate `w`, `fmt` and `q` query parameters.
+
+    Returns (width, fmt, quality); raises ValueError with a client message.
+    """
+    try:
+        width = int(params.get("w", ""))
+        quality = int(params.get("q", DEFAULT_QUALITY))
+    except ValueError:
+        raise ValueError("Parameters 'w' and 'q' must be integers")
+    fmt = params.get("fmt", "webp").lower()
+
+    if not MIN_WIDTH <= width <= MAX_WIDTH:
+        raise ValueError(f"Parameter 'w' must be between {MIN_WIDTH} and {MAX_WIDTH}")
+    if not 1 <= quality <= 100:
+        raise ValueError("Parameter 'q' must be between 1 and 100")
+    if fmt not in FORMATS:
+        raise ValueError(f"Parameter 'fmt' must be one of: {', '.join(FORMATS)}")
+    return width, fmt, quality
+
+
+def source_version(media):
+    """Stable identifier of the source bytes of a Media."""
+    if media.content_hash:
+        return media.content_hash
+    return hashlib.sha256(f"{media.file.name}:{media.size}".encode()).hexdigest()
+
+
+def variant_key(media, width, fmt, quality):
+    return f"{source_version(media)}-w{width}-q{quality}.{fmt}"
+
+
+def render_variant(source_path, output_path, width, fmt, quality):
+    """Resize `source_path` to `width` (never upscaling) and encode it."""
+    with Image.open(source_path) as image:
+        image.draft("RGB", (width, width * 4))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+
+        pil_format = FORMATS[fmt][0]
+        if pil_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+
+        options = {"quality": quality}
+        if pil_format == "JPEG":
+            options.update(optimize=True, progressive=True)
+        elif pil_format == "PNG":
+            options = {"optimize": True}
+        image.save(output_path, format=pil_format, **options)
+
+
+class VariantCache:
+    """Size-capped LRU cache of rendered files on local disk."""
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._size = None
+        self._size_guard = threading.Lock()
+
+    def path_for(self, key):
+        return self.root / key[:2] / key
+
+    def get(self, key):
+        """Return the cached path for `key` and mark it recently used."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_create(self, key, render):
+        """
+        Return the path for `key`, calling `render(output_path)` on a miss.
+
+        Only one caller renders a given key at a time; the others wait and
+        then reuse its output.
+        """
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        with self._key_lock(key):
+            path = self.get(key)
+            if path is not None:
+                return path
+
+            path = self.path_for(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            os.close(fd)
+            try:
+                render(temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        self._added(path.stat().st_size)
+        return path
+
+    @contextmanager
+    def _key_lock(self, key):
+        with self._locks_guard:
+            lock, users = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, users + 1)
+        try:
+            with lock, self._file_lock(Path(f"{self.path_for(key)}.lock")):
+                yield
+        finally:
+            with self._locks_guard:
+                lock, users = self._locks[key]
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
+
+    @contextmanager
+    def _file_lock(self, lock_path):
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _entries(self):
+        if not self.root.exists():
+            return
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith((".lock", ".tmp")):
+                    yield entry
+
+    def _added(self, nbytes):
+        with self._size_guard:
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in self._entries())
+            else:
+                self._size += nbytes
+            over_cap = self._size > self.max_bytes
+        if over_cap:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used files until the cache is 90% full."""
+        with self._file_lock(self.root / ".evict.lock"):
+            entries = sorted(
+                ((entry.stat(), entry.path) for entry in self._entries()),
+                key=lambda item: item[0].st_mtime,
+            )
+            total = sum(stat.st_size for stat, _ in entries)
+            target = self.max_bytes * 0.9
+            for stat, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    os.remove(path + ".lock")
+                except FileNotFoundError:
+                    pass
+                total -= stat.st_size
+        with self._size_guard:
+            self._size = total
+
+
+_variant_cache = None
+
+
+def get_variant_cache():
+    """Process-wide variant cache configured from settings."""
+    global _variant_cache
+    if _variant_cache is None:
+        _variant_cache = VariantCache(
+            getattr(settings, "MEDIA_MANAGER_VARIANT_CACHE_DIR", Path(settings.MEDIA_ROOT).parent / "tmp" / "variants"),
+            getattr(settings, "MEDIA_MANAGER_VARIANT_CACHE_MAX_SIZE", 2 * 1024 * 1024 * 1024),
+        )
+    return _variant_cache
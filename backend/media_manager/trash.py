@@ -0,0 +1,137 @@
+"""
+Trash for media and folders.
+
+Deleting only stamps `deleted_at`: the default managers (Media.objects,
+Folder.objects) hide trashed rows, so live queries skip them, and the list
+indexes are partial so trashed rows never enter their ranges. A folder is
+trashed with its subfolders under one timestamp, which is what restoring it
+brings back. Their media move to the root, as deleting a folder always did,
+unless the caller asks for them to be trashed along (`?with_media=1`).
+
+Trashed files keep counting towards the owner's quota. `manage.py
+purge_trash` hard-deletes trash older than MEDIA_MANAGER_TRASH_RETENTION_DAYS
+in batches through bulk.delete_media (one query per batch for rows, usage
+and index updates) and drains the storage deletion queue.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from media_manager import bulk
+from media_manager.models import Folder, Media
+from media_manager.search.cache import invalidate_on_commit
+from media_manager.search.indexing import delete_media_documents, index_media
+
+
+class NameConflict(Exception):
+    """Raised when a live folder took the name of the folder being restored."""
+
+
+def get_retention():
+    return timedelta(days=getattr(settings, "MEDIA_MANAGER_TRASH_RETENTION_DAYS", 30))
+
+
+def _trash(queryset, now):
+    media_ids = list(queryset.values_list("pk", flat=True))
+    if not media_ids:
+        return 0
+    invalidate_on_commit(queryset.values_list("uploaded_by_id", flat=True).distinct())
+    trashed = Media.objects.filter(pk__in=media_ids).update(deleted_at=now)
+    transaction.on_commit(lambda: delete_media_documents(media_ids))
+    return trashed
+
+
+def trash_media(media_ids):
+    """Move live media to the trash. Returns how many were trashed."""
+    with transaction.atomic():
+        return _trash(Media.objects.filter(pk__in=media_ids), timezone.now())
+
+
+def trash_folder(folder, with_media=False):
+    """
+    Move a folder and its subfolders to the trash. Their media are trashed
+    too `with_media`, and moved to the root otherwise. Returns the media count.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        folder_ids = folder.get_descendant_ids()
+        Folder.objects.filter(pk__in=folder_ids).update(deleted_at=now)
+        media = Media.objects.filter(folder_id__in=folder_ids)
+        if with_media:
+            return _trash(media, now)
+        return bulk.move_to_folder(list(media.values_list("pk", flat=True)), None)
+
+
+def restore_media(media):
+    """
+    Take a media out of the trash. Its folder is kept unless that is still
+    in the trash, in which case it returns to the root.
+    """
+    folder_id = media.folder_id
+    if folder_id and not Folder.objects.filter(pk=folder_id).exists():
+        folder_id = None
+    with transaction.atomic():
+        Media.all_objects.filter(pk=media.pk).update(deleted_at=None, folder_id=folder_id, updated_at=timezone.now())
+        index_media([media.pk])
+
+
+def restore_folder(folder):
+    """
+    Take a folder out of the trash with everything trashed along with it.
+    Returns the media count; raises NameConflict if a live folder took its
+    name meanwhile.
+    """
+    parent_id = folder.parent_id
+    if parent_id and not Folder.objects.filter(pk=parent_id).exists():
+        parent_id = None
+    # Checked here too: the unique constraint does not cover root folders (NULL parent)
+    if Folder.objects.filter(owner_id=folder.owner_id, parent_id=parent_id, name=folder.name).exists():
+        raise NameConflict(folder.name)
+    with transaction.atomic():
+        folder_ids = list(
+            Folder.all_objects.filter(pk__in=folder.get_descendant_ids(), deleted_at=folder.deleted_at)
+            .values_list("pk", flat=True)
+        )
+        Folder.all_objects.filter(pk=folder.pk).update(deleted_at=None, parent_id=parent_id)
+        Folder.all_objects.filter(pk__in=folder_ids).update(deleted_at=None)
+        media = Media.all_objects.filter(folder_id__in=folder_ids, deleted_at=folder.deleted_at)
+        media_ids = list(media.values_list("pk", flat=True))
+        media.update(deleted_at=None)
+        index_media(media_ids)
+    return len(media_ids)
+
+
+def get_usage(user):
+    """{"count", "size"} of the user's trashed media."""
+    usage = Media.all_objects.filter(uploaded_by=user, deleted_at__isnull=False).aggregate(
+        count=Count("id"), size=Sum("size")
+    )
+    return {"count": usage["count"], "size": usage["size"] or 0}
+
+
+def purge(batch_size=500, before=None):
+    """
+    Hard-delete one batch of trash older than the retention period (or
+    `before`). Media go first; folders once no expired media is left.
+    Returns (media deleted, folders deleted).
+    """
+    before = before or timezone.now() - get_retention()
+    media_ids = list(
+        Media.all_objects.filter(deleted_at__lt=before).order_by("deleted_at", "pk")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if media_ids:
+        return bulk.delete_media(media_ids), 0
+
+    folder_ids = list(
+        Folder.all_objects.filter(deleted_at__lt=before).order_by("deleted_at", "pk")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if not folder_ids:
+        return 0, 0
+    # Subfolders go with their parents; media still in them fall back to the root
+    _, deleted = Folder.all_objects.filter(pk__in=folder_ids).delete()
+    return 0, deleted.get(Folder._meta.label, 0)
@@ -0,0 +1,160 @@
+"""
+Chunked upload helpers.
+
+Chunks are streamed from the request body straight into a per-session
+temp file, so memory per upload stays bounded to the read block size.
+
+The session row is only locked to check the offset and claim the session
+(status "receiving"); the chunk is written after that transaction, so a
+slow client holds no database lock. Each claim pushes `expires_at` back;
+sessions left idle past it are removed by expire_sessions().
+"""
+import hashlib
+import os
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from media_manager import quotas
+from media_manager.models import UploadSession
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class ChecksumMismatch(Exception):
+    """Raised when received bytes do not match the declared checksum."""
+
+
+def get_chunk_size():
+    """Maximum number of bytes accepted per chunk request."""
+    return getattr(settings, "MEDIA_MANAGER_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+
+
+def get_max_upload_size():
+    """Maximum size of a single uploaded file."""
+    return getattr(settings, "MEDIA_MANAGER_MAX_UPLOAD_SIZE", 500 * 1024 * 1024)
+
+
+def get_session_ttl():
+    """How long a session may sit idle before it expires."""
+    return timedelta(seconds=getattr(settings, "MEDIA_MANAGER_UPLOAD_SESSION_TTL", 24 * 3600))
+
+
+def get_claim_timeout():
+    """After this long, a chunk write that never finished (crashed worker) no longer blocks the session."""
+    return timedelta(seconds=getattr(settings, "MEDIA_MANAGER_UPLOAD_CLAIM_TIMEOUT", 600))
+
+
+def is_busy(session):
+    """Whether another request is writing a chunk of the session."""
+    return session.status == "receiving" and session.updated_at > timezone.now() - get_claim_timeout()
+
+
+def begin_chunk(session):
+    """Claim a locked session for writing one chunk."""
+    session.status = "receiving"
+    session.expires_at = timezone.now() + get_session_ttl()
+    session.save(update_fields=["status", "expires_at", "updated_at"])
+
+
+def end_chunk(session, written=0):
+    """
+    Release the claim taken by begin_chunk(), advancing the offset by
+    `written` bytes. Does nothing if the claim was lost (timed out and
+    taken over, or the upload aborted).
+    """
+    claimed_at = session.updated_at
+    session.received_size += written
+    session.status = "open"
+    session.updated_at = timezone.now()
+    UploadSession.objects.filter(pk=session.pk, status="receiving", updated_at=claimed_at).update(
+        received_size=session.received_size, status="open", updated_at=session.updated_at,
+    )
+
+
+def get_temp_path(session):
+    """Path of the partial file backing an upload session."""
+    temp_dir = Path(
+        getattr(settings, "MEDIA_MANAGER_UPLOAD_TEMP_DIR", Path(settings.MEDIA_ROOT).parent / "tmp" / "uploads")
+    )
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    return temp_dir / f"{session.id}.part"
+
+
+def write_chunk(session, stream, offset, length, checksum=""):
+    """
+    Copy `length` bytes from `stream` into the session file at `offset`.
+
+    The chunk is hashed while it is written; on a checksum mismatch the
+    file is truncated back to `offset` so the client can resend it.
+    """
+    path = get_temp_path(session)
+    digest = hashlib.sha256()
+    remaining = length
+    mode = "r+b" if path.exists() else "w+b"
+
+    with open(path, mode) as fh:
+        fh.seek(offset)
+        while remaining > 0:
+            block = stream.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            fh.write(block)
+            digest.update(block)
+            remaining -= len(block)
+
+        written = length - remaining
+        if remaining or (checksum and digest.hexdigest() != checksum.lower()):
+            fh.truncate(offset)
+            if remaining:
+                raise ChecksumMismatch(f"Expected {length} bytes, received {written}.")
+            raise ChecksumMismatch("Chunk checksum does not match.")
+        fh.truncate(offset + written)
+
+    return written
+
+
+def file_sha256(path):
+    """Hash a file in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discard(session):
+    """Remove the partial file of a session, if any."""
+    try:
+        os.remove(get_temp_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def expire_sessions(batch_size=500, now=None):
+    """
+    Delete one batch of sessions idle past `expires_at`, with their temp
+    files and quota reservations. Returns the sessions deleted.
+    """
+    with transaction.atomic():
+        # Sessions being finalized are locked; they are not idle
+        sessions = list(
+            UploadSession.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=now or timezone.now())
+            .order_by("expires_at")[:batch_size]
+        )
+        if not sessions:
+            return []
+        UploadSession.objects.filter(pk__in=[session.pk for session in sessions]).delete()
+        reserved = Counter()
+        for session in sessions:
+            reserved[session.owner_id] += session.total_size
+        for user_id, size in reserved.items():
+            quotas.release(user_id, size)
+    for session in sessions:
+        discard(session)
+    return sessions
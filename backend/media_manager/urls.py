@@ -1,10 +1,14 @@
 from django.urls import path
 from media_manager.views import (
     MediaListCreateView, MediaDetailView, MediaByFolderView, MediaByTagView, MediaByTypeView,
-    MediaStatsView, MediaAddTagsView, MediaRemoveTagsView, MediaMoveToFolderView,
+    MediaStatsView, MediaAddTagsView, MediaRemoveTagsView, MediaMoveToFolderView, MediaRenderView,
+    MediaStreamView, MediaBatchUploadView, MediaBulkActionView, MediaSimilarView, MediaDuplicatesView,
+    MediaDownloadView, MediaTrashView, MediaRestoreView,
     FolderListCreateView, FolderDetailView, FolderTreeView, FolderChildrenView, FolderMediaView,
+    FolderDownloadView, FolderTrashView, FolderRestoreView,
     TagListCreateView, TagDetailView, TagMediaCountView,
-    MediaSearchView, MediaAdvancedSearchView
+    MediaSearchView, MediaAdvancedSearchView, MediaSuggestView, SearchQueueHealthView,
+    UploadSessionCreateView, UploadSessionDetailView, UploadSessionFinalizeView
 )
 
 app_name = "media_manager"
@@ -17,16 +21,33 @@ urlpatterns = [
     path("media/by_tag/", MediaByTagView.as_view(), name="media-by-tag"),
     path("media/by_type/", MediaByTypeView.as_view(), name="media-by-type"),
     path("media/stats/", MediaStatsView.as_view(), name="media-stats"),
+    path("media/batch/", MediaBatchUploadView.as_view(), name="media-batch-upload"),
+    path("media/bulk/", MediaBulkActionView.as_view(), name="media-bulk-action"),
+    path("media/duplicates/", MediaDuplicatesView.as_view(), name="media-duplicates"),
+    path("media/download.zip", MediaDownloadView.as_view(), name="media-download"),
+    path("media/trash/", MediaTrashView.as_view(), name="media-trash"),
     path("media/<int:pk>/add_tags/", MediaAddTagsView.as_view(), name="media-add-tags"),
     path("media/<int:pk>/remove_tags/", MediaRemoveTagsView.as_view(), name="media-remove-tags"),
     path("media/<int:pk>/move_to_folder/", MediaMoveToFolderView.as_view(), name="media-move-to-folder"),
+    path("media/<int:pk>/render/", MediaRenderView.as_view(), name="media-render"),
+    path("media/<int:pk>/stream/", MediaStreamView.as_view(), name="media-stream"),
+    path("media/<int:pk>/similar/", MediaSimilarView.as_view(), name="media-similar"),
+    path("media/<int:pk>/restore/", MediaRestoreView.as_view(), name="media-restore"),
+
+    # ========== CHUNKED UPLOAD ENDPOINTS ==========
+    path("media/uploads/", UploadSessionCreateView.as_view(), name="upload-session-create"),
+    path("media/uploads/<uuid:pk>/", UploadSessionDetailView.as_view(), name="upload-session-detail"),
+    path("media/uploads/<uuid:pk>/finalize/", UploadSessionFinalizeView.as_view(), name="upload-session-finalize"),
 
     # ========== FOLDER ENDPOINTS ==========
     path("folders/", FolderListCreateView.as_view(), name="folder-list-create"),
     path("folders/<int:pk>/", FolderDetailView.as_view(), name="folder-detail"),
     path("folders/tree/", FolderTreeView.as_view(), name="folder-tree"),
+    path("folders/trash/", FolderTrashView.as_view(), name="folder-trash"),
     path("folders/<int:pk>/children/", FolderChildrenView.as_view(), name="folder-children"),
     path("folders/<int:pk>/media/", FolderMediaView.as_view(), name="folder-media"),
+    path("folders/<int:pk>/download.zip", FolderDownloadView.as_view(), name="folder-download"),
+    path("folders/<int:pk>/restore/", FolderRestoreView.as_view(), name="folder-restore"),
 
     # ========== TAG ENDPOINTS ==========
     path("tags/", TagListCreateView.as_view(), name="tag-list-create"),
@@ -36,4 +57,6 @@ urlpatterns = [
     # ========== SEARCH ENDPOINTS ==========
     path("search/", MediaSearchView.as_view(), name="media-search"),
     path("search/advanced/", MediaAdvancedSearchView.as_view(), name="media-advanced-search"),
+    path("search/suggest/", MediaSuggestView.as_view(), name="media-suggest"),
+    path("search/health/", SearchQueueHealthView.as_view(), name="search-queue-health"),
 ]
\ No newline at end of file
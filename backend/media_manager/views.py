@@ -5,12 +5,19 @@ Converted from ViewSets to traditional Django CBVs
 
 from rest_framework import permissions, status, filters, generics
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
+from django.core.files import File
+from django.http import FileResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Count
 
-from media_manager.models import Media, Folder, Tag
+from media_manager.models import Media, Folder, Tag, UploadSession
 from media_manager.serializers import (
     MediaListSerializer,
     MediaDetailSerializer,
@@ -19,7 +26,16 @@ from media_manager.serializers import (
     FolderCreateSerializer,
     FolderNestedSerializer,
     TagSerializer,
+    UploadSessionSerializer,
+    UploadSessionCreateSerializer,
+    MediaBatchUploadSerializer,
+    MediaBulkActionSerializer,
+    MediaSelectionSerializer,
 )
+from media_manager import uploads, transforms, quotas, archives, trash
+from media_manager.delivery import serve_media
+from media_manager.pagination import KeysetPagination
+from media_manager import bulk
 
 
 # ============================================================================
@@ -41,40 +57,115 @@ class IsOwner(permissions.BasePermission):
 # MEDIA VIEWS
 # ============================================================================
 
-class MediaListCreateView(generics.ListCreateAPIView):
+def quota_exceeded_response(exc):
+    return Response(
+        {"error": str(exc), "available": exc.available},
+        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    )
+
+
+def check_content_length(request):
+    """
+    Reject a request whose body cannot fit in the user's quota before the
+    body is read. Raises QuotaExceeded.
+    """
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return
+    quotas.check(request.user.pk, length)
+
+
+class MediaListMixin:
+    """
+    Media list endpoints: keyset pages (media_manager/pagination.py) and
+    ?fields=id,title,thumbnail to render, and load, only those fields.
+    """
+    serializer_class = MediaListSerializer
+    pagination_class = KeysetPagination
+
+    def get_requested_fields(self):
+        value = self.request.query_params.get("fields", "")
+        requested = [field.strip() for field in value.split(",") if field.strip()]
+        unknown = set(requested) - set(MediaListSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({"fields": f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return requested
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == "GET":
+            context["fields"] = self.get_requested_fields()
+        return context
+
+    def filter_queryset(self, queryset):
+        """Select only the columns and relations the requested fields read."""
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_requested_fields() or MediaListSerializer.Meta.fields
+        columns = {"id"}
+        for field in fields:
+            columns.update(MediaListSerializer.SOURCES.get(field, (field,)))
+        related = {column.split("__")[0] for column in columns if "__" in column}
+        if related:
+            queryset = queryset.select_related(*related)
+        if {"renditions", "thumbnail"} & set(fields):
+            queryset = queryset.prefetch_related("renditions")
+        return queryset.only(*columns)
+
+
+class MediaListCreateView(MediaListMixin, generics.ListCreateAPIView):
     """
-    GET  /api/media/media/              - List all media
+    GET  /api/media/media/              - List all media (?orientation=, ?min_width=, ?min_height=)
+    GET  /api/media/media/?fields=id,title,thumbnail&cursor=...  - Selected fields, next page
     POST /api/media/media/              - Create/upload media
     """
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     parser_classes = (MultiPartParser, FormParser)
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["title", "description", "alt_text", "file_type"]
-    ordering_fields = ["created_at", "title", "size"]
+    ordering_fields = ["created_at", "title", "size", "captured_at", "width"]
     ordering = ["-created_at"]
 
     def get_queryset(self):
-        """Filter media by current user."""
-        return Media.objects.filter(
-            uploaded_by=self.request.user
-        ).select_related("folder", "uploaded_by").prefetch_related("tags")
+        """Filter media by current user and optional metadata filters."""
+        queryset = Media.objects.filter(uploaded_by=self.request.user)
+
+        params = self.request.query_params
+        if params.get("orientation"):
+            queryset = queryset.filter(orientation=params["orientation"])
+        for param, lookup in (("min_width", "width__gte"), ("min_height", "height__gte")):
+            value = params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: "Must be a positive integer."})
+                queryset = queryset.filter(**{lookup: int(value)})
+        return queryset
 
     def get_serializer_class(self):
         """Use different serializers based on action."""
         if self.request.method == "POST":
             return MediaCreateSerializer
-        return MediaListSerializer
+        return super().get_serializer_class()
+
+    def create(self, request, *args, **kwargs):
+        """Reject uploads over the storage quota, before the body when possible."""
+        try:
+            check_content_length(request)
+            return super().create(request, *args, **kwargs)
+        except quotas.QuotaExceeded as exc:
+            return quota_exceeded_response(exc)
 
     def perform_create(self, serializer):
         """Set uploaded_by to current user during creation."""
-        serializer.save(uploaded_by=self.request.user)
+        with quotas.reservation(self.request.user.pk, serializer.validated_data["file"].size):
+            serializer.save(uploaded_by=self.request.user)
 
 
 class MediaDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     GET    /api/media/media/{id}/      - Get media details
     PATCH  /api/media/media/{id}/      - Update media metadata
-    DELETE /api/media/media/{id}/      - Delete media
+    DELETE /api/media/media/{id}/      - Move media to the trash
     """
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     queryset = Media.objects.all()
@@ -83,15 +174,18 @@ class MediaDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         """Filter by current user."""
-        return Media.objects.filter(uploaded_by=self.request.user)
+        return Media.objects.filter(uploaded_by=self.request.user).prefetch_related("renditions")
+
+    def perform_destroy(self, instance):
+        """Trash instead of deleting; `manage.py purge_trash` removes it later."""
+        trash.trash_media([instance.pk])
 
 
-class MediaByFolderView(generics.ListAPIView):
+class MediaByFolderView(MediaListMixin, generics.ListAPIView):
     """
     GET /api/media/media/by_folder/?folder_id=1  - Get media by folder
     """
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = MediaListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     ordering = ["-created_at"]
 
@@ -110,15 +204,14 @@ class MediaByFolderView(generics.ListAPIView):
         return Media.objects.filter(
             uploaded_by=self.request.user,
             folder=folder
-        ).select_related("folder", "uploaded_by").prefetch_related("tags")
+        )
 
 
-class MediaByTagView(generics.ListAPIView):
+class MediaByTagView(MediaListMixin, generics.ListAPIView):
     """
     GET /api/media/media/by_tag/?tag_id=1  - Get media by tag
     """
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = MediaListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     ordering = ["-created_at"]
 
@@ -133,15 +226,14 @@ class MediaByTagView(generics.ListAPIView):
         return Media.objects.filter(
             uploaded_by=self.request.user,
             tags=tag
-        ).select_related("folder", "uploaded_by").prefetch_related("tags")
+        )
 
 
-class MediaByTypeView(generics.ListAPIView):
+class MediaByTypeView(MediaListMixin, generics.ListAPIView):
     """
     GET /api/media/media/by_type/?type=image  - Get media by type
     """
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = MediaListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     ordering = ["-created_at"]
 
@@ -154,7 +246,7 @@ class MediaByTypeView(generics.ListAPIView):
         return Media.objects.filter(
             uploaded_by=self.request.user,
             file_type=file_type
-        ).select_related("folder", "uploaded_by").prefetch_related("tags")
+        )
 
 
 class MediaStatsView(APIView):
@@ -166,13 +258,13 @@ class MediaStatsView(APIView):
     def get(self, request):
         """Get media statistics for current user."""
         queryset = Media.objects.filter(uploaded_by=request.user)
+        usage = quotas.get_usage(request.user.pk)
         
         stats = {
             "total_media": queryset.count(),
-            "total_size_mb": (
-                sum([m.size for m in queryset]) / (1024 * 1024)
-                if queryset.exists() else 0
-            ),
+            "total_size_mb": usage["used"] / (1024 * 1024),
+            "quota": usage,
+            "trash": trash.get_usage(request.user),
             "by_type": dict(
                 queryset.values("file_type")
                 .annotate(count=Count("id"))
@@ -245,6 +337,469 @@ class MediaMoveToFolderView(APIView):
         return Response(serializer.data)
 
 
+class MediaBatchUploadView(APIView):
+    """
+    POST /api/media/media/batch/  - Upload many files in one multipart request
+
+    Form fields: files (repeated), folder, tag_ids (repeated)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request):
+        """Store files concurrently and return one result per file."""
+        try:
+            check_content_length(request)
+        except quotas.QuotaExceeded as exc:
+            return quota_exceeded_response(exc)
+
+        serializer = MediaBatchUploadSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+
+        results = bulk.create_media_batch(
+            request.user,
+            serializer.validated_data["files"],
+            folder=serializer.validated_data.get("folder"),
+            tags=serializer.validated_data.get("tag_ids", []),
+        )
+        created = sum(1 for result in results if result["status"] == "created")
+        return Response(
+            {
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class MediaBulkActionView(APIView):
+    """
+    POST /api/media/media/bulk/  - Tag, untag, move or trash many media
+
+    Body: {"action": "add_tags", "ids": [1, 2]} or {"action": "delete", "filter": {"file_type": "video"}}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Apply the action with set-based queries and return a summary."""
+        serializer = MediaBulkActionSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = bulk.select_media(request.user, data)
+        media_ids = list(queryset.order_by().values_list("pk", flat=True))
+
+        action = data["action"]
+        if not media_ids:
+            affected = 0
+        elif action == "add_tags":
+            affected = bulk.add_tags(media_ids, data["tag_ids"])
+        elif action == "remove_tags":
+            affected = bulk.remove_tags(media_ids, data["tag_ids"])
+        elif action == "move":
+            affected = bulk.move_to_folder(media_ids, data["folder_id"])
+        else:
+            affected = trash.trash_media(media_ids)
+
+        return Response({
+            "action": action,
+            "matched": len(media_ids),
+            "affected": affected,
+        })
+
+
+class MediaDownloadView(APIView):
+    """
+    POST /api/media/media/download.zip  - Selected media as a streamed ZIP archive
+
+    Body: {"ids": [1, 2]} or {"filter": {"tag_id": 3}}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Stream the selected files, under their folder paths."""
+        serializer = MediaSelectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entries = archives.selection_entries(bulk.select_media(request.user, serializer.validated_data))
+        if not entries:
+            return Response(
+                {"error": "No media selected"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return archives.zip_response(entries, "media.zip")
+
+
+class MediaStreamView(generics.RetrieveAPIView):
+    """
+    GET /api/media/media/{id}/stream/             - Stream file (supports Range)
+    GET /api/media/media/{id}/stream/?download=1  - Download as attachment
+    """
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+
+    def get_queryset(self):
+        """Filter by current user."""
+        return Media.objects.filter(uploaded_by=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Serve the file with range and conditional request support."""
+        media = self.get_object()
+        if not media.file:
+            return Response({"error": "Media has no file"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return serve_media(request, media, as_attachment=request.query_params.get("download") == "1")
+        except FileNotFoundError:
+            return Response({"error": "File is missing from storage"}, status=status.HTTP_404_NOT_FOUND)
+
+
+class MediaRenderView(generics.RetrieveAPIView):
+    """
+    GET /api/media/media/{id}/render/?w=480&fmt=webp&q=80  - Resized image variant
+
+    Pass `v=<content_hash>` to get a response that is cacheable for a year.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+
+    def get_queryset(self):
+        """Filter by current user."""
+        return Media.objects.filter(uploaded_by=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Render (or reuse) the requested variant and stream it."""
+        media = self.get_object()
+        if media.file_type != "image" or not media.file:
+            return Response(
+                {"error": "Only image media can be rendered"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            width, fmt, quality = transforms.parse_variant(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = transforms.variant_key(media, width, fmt, quality)
+        etag = quote_etag(key)
+        if request.query_params.get("v") == transforms.source_version(media):
+            cache_control = "private, max-age=31536000, immutable"
+        else:
+            cache_control = "private, no-cache"
+
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+        else:
+            try:
+                fh = self.open_variant(media, key, width, fmt, quality)
+            except OSError:
+                return Response(
+                    {"error": "Image could not be decoded"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            response = FileResponse(fh, content_type=transforms.FORMATS[fmt][1])
+
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+    def open_variant(self, media, key, width, fmt, quality):
+        """Open the cached variant, rendering it on first request."""
+        cache = transforms.get_variant_cache()
+
+        def render(output_path):
+            transforms.render_variant(media.file.path, output_path, width, fmt, quality)
+
+        try:
+            return open(cache.get_or_create(key, render), "rb")
+        except FileNotFoundError:
+            # Evicted between lookup and open; render it again
+            return open(cache.get_or_create(key, render), "rb")
+
+
+class MediaSimilarView(APIView):
+    """
+    GET /api/media/media/{id}/similar/?max_distance=6  - Near-duplicates of an image
+    """
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+
+    def get(self, request, pk):
+        """Images of the current user that look like this one, closest first."""
+        from media_manager.search.results import load_media
+        from media_manager.similarity import MAX_DISTANCE, find_similar
+
+        media = get_object_or_404(Media, pk=pk, uploaded_by=request.user)
+        if not media.perceptual_hash:
+            return Response(
+                {"error": "Media has no perceptual hash (not a processed image)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            max_distance = int(request.query_params.get(
+                "max_distance", getattr(settings, "MEDIA_MANAGER_SIMILAR_MAX_DISTANCE", 6)
+            ))
+        except ValueError:
+            max_distance = -1
+        if not 0 <= max_distance <= MAX_DISTANCE:
+            return Response(
+                {"error": f"max_distance must be between 0 and {MAX_DISTANCE}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        matches = find_similar(media, max_distance)
+        rows = load_media([media_id for _, media_id in matches], request.user)
+        data = MediaListSerializer(
+            [rows[media_id] for _, media_id in matches], many=True, context={"request": request}
+        ).data
+        return Response({
+            "max_distance": max_distance,
+            "results": [
+                {**row, "distance": distance}
+                for (distance, _), row in zip(matches, data)
+            ],
+        })
+
+
+class MediaDuplicatesView(APIView):
+    """
+    GET /api/media/media/duplicates/?max_distance=3&limit=50  - Groups of near-duplicate images
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Report the current user's near-duplicate images, largest group first."""
+        from media_manager.search.results import load_media
+        from media_manager.similarity import MAX_DUPLICATE_DISTANCE, duplicate_groups
+
+        try:
+            max_distance = int(request.query_params.get("max_distance", MAX_DUPLICATE_DISTANCE))
+            limit = int(request.query_params.get("limit", 50))
+        except ValueError:
+            return Response(
+                {"error": "max_distance and limit must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 <= max_distance <= MAX_DUPLICATE_DISTANCE:
+            return Response(
+                {"error": f"max_distance must be between 0 and {MAX_DUPLICATE_DISTANCE}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit < 1:
+            return Response(
+                {"error": "limit must be a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        groups = duplicate_groups(request.user, max_distance)
+        shown = groups[:min(limit, 200)]
+        rows = load_media([media_id for ids in shown for media_id in ids], request.user)
+        return Response({
+            "count": len(groups),
+            "max_distance": max_distance,
+            "groups": [
+                MediaListSerializer(
+                    [rows[media_id] for media_id in ids], many=True, context={"request": request}
+                ).data
+                for ids in shown
+            ],
+        })
+
+
+class MediaTrashView(MediaListMixin, generics.ListAPIView):
+    """
+    GET /api/media/media/trash/  - Trashed media, most recently deleted first
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Media.all_objects.filter(uploaded_by=self.request.user, deleted_at__isnull=False).order_by("-deleted_at")
+
+
+class MediaRestoreView(APIView):
+    """
+    POST /api/media/media/{id}/restore/  - Take media out of the trash
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        """Restore into its folder, or the root if that folder is trashed too."""
+        media = get_object_or_404(Media.all_objects, pk=pk, uploaded_by=request.user, deleted_at__isnull=False)
+        trash.restore_media(media)
+        media = Media.objects.prefetch_related("renditions").get(pk=pk)
+        return Response(MediaDetailSerializer(media, context={"request": request}).data)
+
+
+# ============================================================================
+# CHUNKED UPLOAD VIEWS
+# ============================================================================
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """
+    POST /api/media/media/uploads/  - Start a resumable chunked upload
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = UploadSessionCreateSerializer
+
+    def create(self, request, *args, **kwargs):
+        """Create session and return its id, offset and chunk size."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Hold the declared size until the session is finalized or aborted
+        try:
+            quotas.reserve(request.user.pk, serializer.validated_data["size"])
+        except quotas.QuotaExceeded as exc:
+            return quota_exceeded_response(exc)
+        session = serializer.save()
+        return Response(
+            UploadSessionSerializer(session).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class UploadSessionDetailView(APIView):
+    """
+    GET    /api/media/media/uploads/{id}/               - Get upload offset (resume)
+    PUT    /api/media/media/uploads/{id}/?offset=0      - Upload a chunk (raw body)
+    DELETE /api/media/media/uploads/{id}/               - Abort upload
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        """Get current upload state."""
+        session = get_object_or_404(UploadSession, pk=pk, owner=request.user, expires_at__gt=timezone.now())
+        return Response(UploadSessionSerializer(session).data)
+
+    def put(self, request, pk):
+        """
+        Append a chunk at `offset`.
+
+        The optional `X-Chunk-Checksum` header carries the SHA-256 of the
+        chunk. The body is streamed to disk and never parsed into memory.
+        """
+        try:
+            offset = int(request.query_params.get("offset", ""))
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return Response(
+                {"error": "Query parameter 'offset' must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if length <= 0:
+            return Response(
+                {"error": "Content-Length header is required"},
+                status=status.HTTP_411_LENGTH_REQUIRED
+            )
+        if length > uploads.get_chunk_size():
+            return Response(
+                {"error": f"Chunk exceeds maximum of {uploads.get_chunk_size()} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        # Lock only to check the offset and claim the session; the chunk
+        # is written outside the transaction
+        with transaction.atomic():
+            session = get_object_or_404(
+                UploadSession.objects.select_for_update(),
+                pk=pk,
+                owner=request.user,
+                expires_at__gt=timezone.now()
+            )
+            if uploads.is_busy(session):
+                return Response(
+                    {"error": "Another chunk is being written", "offset": session.received_size},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if offset != session.received_size:
+                return Response(
+                    {"error": "Offset mismatch", "offset": session.received_size},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if offset + length > session.total_size:
+                return Response(
+                    {"error": "Chunk exceeds declared file size"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            uploads.begin_chunk(session)
+
+        try:
+            written = uploads.write_chunk(
+                session,
+                request.stream,
+                offset,
+                length,
+                checksum=request.META.get("HTTP_X_CHUNK_CHECKSUM", ""),
+            )
+        except uploads.ChecksumMismatch as exc:
+            uploads.end_chunk(session)
+            return Response(
+                {"error": str(exc), "offset": session.received_size},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except BaseException:
+            uploads.end_chunk(session)
+            raise
+
+        uploads.end_chunk(session, written)
+        return Response(UploadSessionSerializer(session).data)
+
+    def delete(self, request, pk):
+        """Abort upload and discard received bytes."""
+        session = get_object_or_404(UploadSession, pk=pk, owner=request.user)
+        uploads.discard(session)
+        session.delete()
+        quotas.release(session.owner_id, session.total_size)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionFinalizeView(APIView):
+    """
+    POST /api/media/media/uploads/{id}/finalize/  - Verify and create media
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        """
+        Verify whole-file checksum and create the Media row.
+
+        The session stays locked until it is deleted along with the new row,
+        so a concurrent finalize finds it gone instead of creating a copy.
+        """
+        with transaction.atomic():
+            session = get_object_or_404(
+                UploadSession.objects.select_for_update(),
+                pk=pk,
+                owner=request.user,
+                expires_at__gt=timezone.now()
+            )
+            if uploads.is_busy(session) or not session.is_complete:
+                return Response(
+                    {"error": "Upload is incomplete", "offset": session.received_size},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            path = uploads.get_temp_path(session)
+            expected = (request.data.get("checksum") or session.checksum).lower()
+            if expected and uploads.file_sha256(path) != expected:
+                return Response(
+                    {"error": "File checksum does not match"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            with open(path, "rb") as fh:
+                serializer = MediaCreateSerializer(
+                    data={**session.metadata, "file": File(fh, name=session.filename)},
+                    context={"request": request}
+                )
+                serializer.is_valid(raise_exception=True)
+                media = serializer.save(uploaded_by=request.user)
+
+            UploadSession.objects.filter(pk=session.pk).delete()
+            quotas.release(session.owner_id, session.total_size)
+            transaction.on_commit(lambda: uploads.discard(session))
+        return Response(
+            MediaDetailSerializer(media).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
 # ============================================================================
 # FOLDER VIEWS
 # ============================================================================
@@ -278,7 +833,8 @@ class FolderDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     GET    /api/media/folders/{id}/  - Get folder details
     PATCH  /api/media/folders/{id}/  - Update folder
-    DELETE /api/media/folders/{id}/  - Delete folder
+    DELETE /api/media/folders/{id}/               - Move folder and subfolders to the trash, media to the root
+    DELETE /api/media/folders/{id}/?with_media=1  - Trash their media along with them
     """
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     serializer_class = FolderSerializer
@@ -287,6 +843,9 @@ class FolderDetailView(generics.RetrieveUpdateDestroyAPIView):
         """Filter by current user."""
         return Folder.objects.filter(owner=self.request.user)
 
+    def perform_destroy(self, instance):
+        trash.trash_folder(instance, with_media=self.request.query_params.get("with_media") == "1")
+
 
 class FolderTreeView(APIView):
     """
@@ -326,12 +885,61 @@ class FolderChildrenView(generics.ListAPIView):
         return folder.children.all()
 
 
-class FolderMediaView(generics.ListAPIView):
+class FolderDownloadView(APIView):
+    """
+    GET /api/media/folders/{id}/download.zip  - Folder and subfolders as a streamed ZIP archive
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        """Stream every file below the folder, keeping the folder tree."""
+        folder = get_object_or_404(Folder, pk=pk, owner=request.user)
+        return archives.zip_response(archives.folder_entries(folder), f"{folder.name}.zip")
+
+
+class FolderTrashView(generics.ListAPIView):
+    """
+    GET /api/media/folders/trash/  - Trashed folders (not those trashed along with a parent)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = FolderSerializer
+
+    def get_queryset(self):
+        return (
+            Folder.all_objects.filter(owner=self.request.user, deleted_at__isnull=False)
+            .exclude(parent__deleted_at=F("deleted_at"))
+            .order_by("-deleted_at")
+        )
+
+
+class FolderRestoreView(APIView):
+    """
+    POST /api/media/folders/{id}/restore/  - Take a folder out of the trash with its contents
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        """Restore under its parent, or the root if that is trashed too."""
+        folder = get_object_or_404(Folder.all_objects, pk=pk, owner=request.user, deleted_at__isnull=False)
+        try:
+            restored = trash.restore_folder(folder)
+        except (trash.NameConflict, IntegrityError):
+            return Response(
+                {"error": "A folder with this name already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
+        folder = Folder.objects.get(pk=pk)
+        return Response({
+            "folder": FolderSerializer(folder, context={"request": request}).data,
+            "restored_media": restored,
+        })
+
+
+class FolderMediaView(MediaListMixin, generics.ListAPIView):
     """
     GET /api/media/folders/{id}/media/  - Get media in folder
     """
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = MediaListSerializer
 
     def get_queryset(self):
         """Get media in specific folder."""
@@ -355,6 +963,7 @@ class TagListCreateView(generics.ListCreateAPIView):
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = TagSerializer
+    pagination_class = KeysetPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["name"]
     ordering = ["name"]
@@ -401,136 +1010,116 @@ class TagMediaCountView(APIView):
 
 
 # ============================================================================
-# SEARCH VIEWS (Elasticsearch)
+# SEARCH VIEWS (media_manager/search/backends.py)
 # ============================================================================
 
+def search_response(request, query="", filters=None):
+    """
+    One page of search results from the configured search backend.
+
+    Query params: ?fields=title,file (default: every indexed field),
+    ?page_size=50 (max 500), ?cursor=<next_cursor of the previous page>
+    and ?facets=true for facet counts (search/facets.py).
+    """
+    from media_manager.search import backends, results
+
+    try:
+        source_fields, hydrated_fields = results.parse_fields(request.query_params.get("fields"))
+        size = results.parse_page_size(request.query_params.get("page_size"))
+        backend, page = backends.search(
+            request.user,
+            query,
+            filters,
+            source_fields=source_fields,
+            hydrated_fields=hydrated_fields,
+            size=size,
+            cursor=request.query_params.get("cursor"),
+            context={"request": request},
+            facets=request.query_params.get("facets", "").lower() in ("1", "true", "yes"),
+        )
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    except backends.SearchUnavailable:
+        return Response(
+            {"error": "Search is temporarily unavailable"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    return Response({**page, "backend": backend})
+
+
 class MediaSearchView(APIView):
     """
     GET /api/media/search/?q=sunset  - Basic full-text search
+    GET /api/media/search/?q=sunset&fields=title,file&cursor=...  - Selected fields, next page
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         """Search media using full-text search."""
-        try:
-            from media_manager.search.documents import MediaDocument
-        except ImportError:
-            return Response(
-                {"error": "Elasticsearch not configured"},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-        
         query = request.query_params.get("q", "").strip()
         if not query:
             return Response(
                 {"error": "Query parameter 'q' is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Search in Elasticsearch
-        search = MediaDocument.search().filter(
-            "term",
-            uploaded_by_id=request.user.id
-        ).query("multi_match", query=query, fields=[
-            "title", "description", "alt_text", "file_name"
-        ])
-        
-        results = search[:100].execute()
-        
-        # Get full objects from database
-        media_ids = [hit.id for hit in results.hits]
-        media_list = Media.objects.filter(
-            id__in=media_ids,
-            uploaded_by=request.user
-        )
-        
-        serializer = MediaDetailSerializer(media_list, many=True)
-        return Response({
-            "count": results.hits.total.value,
-            "results": serializer.data
-        })
+
+        return search_response(request, query)
 
 
 class MediaAdvancedSearchView(APIView):
     """
     GET /api/media/search/advanced/?q=photo&file_type=image&date_from=2024-01-01
-    Advanced search with multiple filters
+    GET /api/media/search/advanced/?orientation=landscape&width_from=1920&captured_at_from=2024-06-01
+    GET /api/media/search/advanced/?tags=travel&tags=2024&size_to=1048576
+    GET /api/media/search/advanced/?q=beach&facets=true  - Plus counts by type, tag, folder, extension, size, month
+    Advanced search with multiple filters; paginated like MediaSearchView
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         """Advanced search with filtering."""
+        from media_manager.search.backends import parse_filters
+
+        try:
+            filters = parse_filters(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return search_response(request, request.query_params.get("q", "").strip(), filters)
+
+
+class MediaSuggestView(APIView):
+    """
+    GET /api/media/search/suggest/?q=sun&limit=10  - Autocomplete ids and labels
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Suggest media while the user types."""
+        from media_manager.search.suggest import DEFAULT_LIMIT, MAX_LIMIT, suggest
+
         try:
-            from media_manager.search.documents import MediaDocument
-            from elasticsearch_dsl import Q as ES_Q
-        except ImportError:
+            limit = min(int(request.query_params.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            limit = 0
+        if limit < 1:
             return Response(
-                {"error": "Elasticsearch not configured"},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
+                {"error": "limit must be a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Start with user filter
-        search = MediaDocument.search().filter(
-            "term",
-            uploaded_by_id=request.user.id
-        )
-        
-        # Text search
-        query = request.query_params.get("q", "").strip()
-        if query:
-            search = search.query("multi_match", query=query, fields=[
-                "title", "description", "alt_text", "file_name"
-            ])
-        
-        # File type filter
-        file_type = request.query_params.get("file_type")
-        if file_type:
-            search = search.filter("term", file_type=file_type)
-        
-        # Date range filter
-        date_from = request.query_params.get("date_from")
-        date_to = request.query_params.get("date_to")
-        if date_from or date_to:
-            range_query = {}
-            if date_from:
-                range_query["gte"] = date_from
-            if date_to:
-                range_query["lte"] = date_to
-            search = search.filter("range", created_at=range_query)
-        
-        # Size range filter
-        size_from = request.query_params.get("size_from")
-        size_to = request.query_params.get("size_to")
-        if size_from or size_to:
-            range_query = {}
-            if size_from:
-                range_query["gte"] = int(size_from)
-            if size_to:
-                range_query["lte"] = int(size_to)
-            search = search.filter("range", file_size=range_query)
-        
-        # Tag filter
-        tags = request.query_params.getlist("tags")
-        if tags:
-            for tag in tags:
-                search = search.filter(
-                    "nested",
-                    path="tags",
-                    query=ES_Q("term", **{"tags.name": tag})
-                )
-        
-        # Execute search
-        results = search[:100].execute()
-        
-        # Get full objects from database
-        media_ids = [hit.id for hit in results.hits]
-        media_list = Media.objects.filter(
-            id__in=media_ids,
-            uploaded_by=request.user
-        )
-        
-        serializer = MediaDetailSerializer(media_list, many=True)
-        return Response({
-            "count": results.hits.total.value,
-            "results": serializer.data
-        })
\ No newline at end of file
+
+        return Response({"results": suggest(request.user, request.query_params.get("q", ""), limit)})
+
+
+class SearchQueueHealthView(APIView):
+    """
+    GET /api/media/search/health/  - Search index queue depth and lag, cache hit rates (staff only)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from media_manager.search.cache import cache_stats
+        from media_manager.search.queue import queue_stats
+
+        return Response({**queue_stats(), "cache": cache_stats()})